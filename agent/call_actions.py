@@ -1,8 +1,11 @@
 import logging
 import asyncio
+import dataclasses
 import json
+import types
+import uuid
 from typing import Annotated
-from livekit.agents.llm import FunctionContext
+from livekit.agents.llm import FunctionContext, ai_callable
 from livekit.api import RoomParticipantIdentity
 
 logger = logging.getLogger(__name__)
@@ -10,21 +13,64 @@ logger = logging.getLogger(__name__)
 class CallActions(FunctionContext):
     """
     Actions que l'agent peut effectuer pendant un appel téléphonique entrant
+    
+    Les descriptions des fonctions (noms, docstrings, arguments annotés) sont
+    construites une seule fois par classe: chaque appel ne fait que les
+    rattacher à sa propre instance.
     """
     
-    def __init__(self, api, participant, room):
+    @classmethod
+    def prepare_functions(cls):
+        """
+        Construit les descriptions des fonctions de la classe (au préchauffage du processus)
+        
+        Returns:
+            dict: FunctionInfo par nom, dont `callable` est la fonction non liée
+        """
+        functions = cls.__dict__.get("_function_templates")
+        if functions is None:
+            # Inspection faite par FunctionContext (mêmes validations), sur une instance vide
+            probe = cls.__new__(cls)
+            FunctionContext.__init__(probe)
+            functions = {
+                name: dataclasses.replace(info, callable=info.callable.__func__)
+                for name, info in probe.ai_functions.items()
+            }
+            cls._function_templates = functions
+        return functions
+    
+    def __init__(self, api, participant, room, store=None):
         """
         Initialisation des actions d'appel
         
         Args:
             api: Instance API LiveKit
-            participant: Participant SIP (appelant)
+            participant: Participant SIP (appelant), ou None s'il est rattaché plus tard
             room: Room LiveKit actuelle
+            store: CallStore du processus (None = informations seulement journalisées)
         """
-        super().__init__()
+        # Équivalent de FunctionContext.__init__ sans réinspecter les signatures
+        self._fncs = {
+            name: dataclasses.replace(info, callable=types.MethodType(info.callable, self))
+            for name, info in self.prepare_functions().items()
+        }
         self.api = api
-        self.participant = participant
         self.room = room
+        self.store = store
+        self.participant = None
+        self.caller_number = "Inconnu"
+        self.called_number = "Inconnu"
+        if participant is not None:
+            self.bind_participant(participant)
+    
+    def bind_participant(self, participant):
+        """
+        Rattache l'appelant aux actions (construites avant son arrivée)
+        
+        Args:
+            participant: Participant SIP (appelant)
+        """
+        self.participant = participant
         
         # Extraire des informations sur l'appelant
         self.caller_number = participant.attributes.get("sip.from", "Inconnu")
@@ -51,14 +97,14 @@ class CallActions(FunctionContext):
         except Exception as e:
             logger.error(f"Erreur lors du raccrochage: {e}")
     
-    @FunctionContext.ai_callable()
+    @ai_callable()
     async def end_call(self):
         """Called when the agent needs to end the call"""
         logger.info(f"Fin de l'appel avec {self.participant.identity}")
         await self.hangup()
         return "Call ended successfully"
     
-    @FunctionContext.ai_callable()
+    @ai_callable()
     async def transfer_to_human(self, 
                              reason: Annotated[str, "Reason for transferring to a human agent"] = None):
         """Called when the agent needs to transfer the call to a human agent"""
@@ -72,7 +118,7 @@ class CallActions(FunctionContext):
         # Simulation du transfert
         return "The call would be transferred to a human agent. This is a simulation."
     
-    @FunctionContext.ai_callable()
+    @ai_callable()
     async def collect_customer_info(self, 
                                  name: Annotated[str, "Customer name"] = None,
                                  email: Annotated[str, "Customer email"] = None,
@@ -89,12 +135,15 @@ class CallActions(FunctionContext):
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        # Dans une vraie implémentation, ces informations seraient enregistrées dans une base de données
         logger.info(f"Informations client: {json.dumps(customer_info)}")
         
+        # Écriture différée en base; une demande répétée à l'identique n'est enregistrée qu'une fois
+        if self.store is not None:
+            self.store.save_customer_info(self.room.name, self.caller_number, name=name, email=email, issue=issue)
+        
         return "Customer information has been collected and stored"
     
-    @FunctionContext.ai_callable()
+    @ai_callable()
     async def create_support_ticket(self, 
                                  issue: Annotated[str, "Description of the customer issue"] = None,
                                  priority: Annotated[int, "Priority level (1-5)"] = 3):
@@ -110,11 +159,12 @@ class CallActions(FunctionContext):
             "status": "open"
         }
         
-        # Dans une vraie implémentation, le ticket serait créé dans un système de gestion de tickets
         logger.info(f"Ticket de support créé: {json.dumps(ticket)}")
         
-        # Générer un numéro de ticket fictif
-        import random
-        ticket_number = f"TKT-{random.randint(10000, 99999)}"
+        # Numéro unique; une demande répétée renvoie le même ticket
+        if self.store is not None:
+            ticket_number = await self.store.create_ticket(self.room.name, self.caller_number, issue=issue, priority=priority)
+        else:
+            ticket_number = f"TKT-{uuid.uuid4().hex[:8].upper()}"
         
         return f"Support ticket {ticket_number} has been created"
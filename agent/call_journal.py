@@ -0,0 +1,342 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_process_journal = None
+_process_journal_ready = False
+
+# Taille maximale d'un texte journalisé (transcription, arguments, résultat)
+MAX_TEXT_CHARS = 2000
+
+
+def _truncate(value, max_chars=MAX_TEXT_CHARS):
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def journal_paths(directory, day, host):
+    """
+    Fichiers du journal d'une machine pour une journée
+
+    Returns:
+        tuple: (fichier des événements, fichier d'index)
+    """
+    base = os.path.join(directory, f"calls-{day}-{host}")
+    return f"{base}.jsonl", f"{base}.idx.jsonl"
+
+
+class CallJournal:
+    """
+    Journal append-only des appels (transcriptions, actions, cycle de vie)
+
+    Les événements sont mis en file par les appels sans jamais toucher le
+    disque; un thread dédié les écrit par lots dans un fichier JSON lines par
+    jour et par machine, et force la synchronisation (fsync) à intervalle
+    régulier. Un fichier d'index associe à chaque appel (room, appelant) la
+    position de son premier événement.
+
+    Tous les processus de l'agent (worker et jobs) ajoutent aux mêmes
+    fichiers: chaque lot est écrit sous un verrou exclusif (flock) du fichier
+    d'événements, de sorte que les lots ne s'entremêlent pas et que les
+    positions de l'index restent exactes.
+    """
+
+    def __init__(self, directory, flush_interval=0.2, fsync_interval=1.0, max_pending=10000):
+        """
+        Initialisation du journal
+
+        Args:
+            directory: Répertoire des fichiers du journal
+            flush_interval: Attente maximale (s) avant l'écriture d'un lot
+            fsync_interval: Intervalle minimal (s) entre deux fsync
+            max_pending: Nombre maximal d'événements en attente (au-delà ils sont perdus)
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._files = {}
+        self._host = socket.gethostname()
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="call-journal", daemon=True)
+        self._thread.start()
+        # Les événements encore en file sont écrits à la sortie du processus
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Construit le journal à partir des variables CALL_JOURNAL_*
+
+        Returns:
+            CallJournal ou None si CALL_JOURNAL_DIR n'est pas défini
+        """
+        directory = os.environ.get("CALL_JOURNAL_DIR")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            flush_interval=float(os.environ.get("CALL_JOURNAL_FLUSH_MS", "200")) / 1000,
+            fsync_interval=float(os.environ.get("CALL_JOURNAL_FSYNC_MS", "1000")) / 1000,
+            max_pending=int(os.environ.get("CALL_JOURNAL_MAX_PENDING", "10000")),
+        )
+
+    def open_call(self, room_name, caller_number):
+        """
+        Ouvre la trace d'un appel
+
+        Returns:
+            CallTrace
+        """
+        trace = CallTrace(self, room_name, caller_number)
+        trace.event("call_started")
+        return trace
+
+    def append(self, entry):
+        """Met un événement en file d'écriture (ne bloque jamais)"""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            deadline = time.monotonic() + self.flush_interval
+            # Regroupe les événements arrivés pendant la fenêtre d'écriture
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._closed = True
+                    break
+                batch.append(entry)
+            try:
+                self._write(batch)
+            except OSError as e:
+                logger.warning(f"Échec de l'écriture du journal des appels ({len(batch)} événements perdus): {e}")
+            if self._closed:
+                break
+        self._sync(force=True)
+        for events, index in self._files.values():
+            events.close()
+            index.close()
+        self._files.clear()
+
+    def _open_day(self, day):
+        files = self._files.get(day)
+        if files is None:
+            # Les fichiers des jours précédents sont fermés
+            for events, index in self._files.values():
+                events.flush()
+                os.fsync(events.fileno())
+                events.close()
+                index.close()
+            events_path, index_path = journal_paths(self.directory, day, self._host)
+            files = (open(events_path, "ab"), open(index_path, "ab"))
+            self._files = {day: files}
+        return files
+
+    def _write(self, batch):
+        by_day = {}
+        for entry in batch:
+            by_day.setdefault(time.strftime("%Y%m%d", time.localtime(entry["ts"])), []).append(entry)
+
+        for day, entries in by_day.items():
+            events, index = self._open_day(day)
+            fcntl.flock(events.fileno(), fcntl.LOCK_EX)
+            try:
+                self._write_locked(events, index, entries)
+            finally:
+                fcntl.flock(events.fileno(), fcntl.LOCK_UN)
+        self._sync()
+
+    def _write_locked(self, events, index, entries):
+        # Les autres processus ont pu écrire depuis le dernier lot: la position
+        # de départ est la taille actuelle du fichier, lue sous le verrou
+        offset = os.fstat(events.fileno()).st_size
+        lines = []
+        index_lines = []
+        for entry in entries:
+            line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            if entry["event"] in ("call_started", "call_ended"):
+                index_lines.append((json.dumps({
+                    "event": entry["event"],
+                    "room": entry["room"],
+                    "caller": entry["caller"],
+                    "ts": entry["ts"],
+                    "offset": offset,
+                }, ensure_ascii=False) + "\n").encode("utf-8"))
+            offset += len(line)
+            lines.append(line)
+        events.write(b"".join(lines))
+        index.write(b"".join(index_lines))
+        events.flush()
+        index.flush()
+
+    def _sync(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_fsync < self.fsync_interval:
+            return
+        self._last_fsync = now
+        for events, index in self._files.values():
+            os.fsync(events.fileno())
+            os.fsync(index.fileno())
+
+    def close(self):
+        """Écrit les événements en attente et ferme les fichiers"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class CallTrace:
+    """
+    Trace d'un appel dans le journal
+
+    Ne conserve que des compteurs: la mémoire utilisée ne dépend pas de la
+    durée de l'appel, les événements partant immédiatement vers le journal.
+    """
+
+    def __init__(self, journal, room_name, caller_number):
+        self.journal = journal
+        self.room_name = room_name
+        self.caller_number = caller_number
+        self.started_at = time.time()
+        self.counts = {}
+
+    def event(self, name, **fields):
+        """Ajoute un événement de l'appel au journal"""
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.journal.append({
+            "ts": time.time(),
+            "room": self.room_name,
+            "caller": self.caller_number,
+            "event": name,
+            **fields,
+        })
+
+    def attach(self, agent):
+        """Abonne la trace aux événements du VoicePipelineAgent"""
+        agent.on("user_speech_committed", lambda msg: self._on_message("user_turn", msg))
+        agent.on("agent_speech_committed", lambda msg: self._on_message("agent_turn", msg))
+        agent.on("agent_speech_interrupted", lambda msg: self._on_message("agent_interrupted", msg))
+        agent.on("function_calls_finished", self._on_function_calls_finished)
+
+    def _on_message(self, name, msg):
+        content = msg.content if isinstance(msg.content, str) else " ".join(
+            part for part in msg.content or [] if isinstance(part, str)
+        )
+        self.event(name, text=_truncate(content))
+
+    def _on_function_calls_finished(self, called_functions):
+        for called in called_functions:
+            fields = {
+                "name": called.call_info.function_info.name,
+                "arguments": _truncate(called.call_info.arguments),
+            }
+            if called.exception is not None:
+                fields["error"] = _truncate(str(called.exception))
+            else:
+                fields["result"] = _truncate(called.result)
+            self.event("tool_call", **fields)
+
+    def close(self, reason=None):
+        """Termine la trace de l'appel"""
+        self.event(
+            "call_ended",
+            reason=reason,
+            duration_s=round(time.time() - self.started_at, 1),
+            counts=dict(self.counts),
+        )
+
+
+def process_journal():
+    """
+    CallJournal unique du processus, construit par `CallJournal.from_env`
+
+    En mode AGENT_JOB_EXECUTOR=thread, `prewarm` est appelé pour chaque job:
+    le journal (thread d'écriture, fichiers, hook atexit) n'est créé qu'une
+    fois et partagé par les jobs du processus.
+
+    Returns:
+        CallJournal ou None si CALL_JOURNAL_DIR n'est pas défini
+    """
+    global _process_journal, _process_journal_ready
+    with _lock:
+        if not _process_journal_ready:
+            _process_journal = CallJournal.from_env()
+            _process_journal_ready = True
+    return _process_journal
+
+
+def find_calls(directory, room=None, caller=None):
+    """
+    Recherche des appels dans les index du journal
+
+    Args:
+        directory: Répertoire du journal
+        room: Nom de room recherché (optionnel)
+        caller: Numéro d'appelant recherché (optionnel)
+
+    Returns:
+        list: Entrées d'index (début d'appel) avec le chemin du fichier d'événements
+    """
+    found = []
+    for index_path in sorted(glob.glob(os.path.join(directory, "calls-*.idx.jsonl"))):
+        events_path = index_path[: -len(".idx.jsonl")] + ".jsonl"
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry["event"] != "call_started":
+                    continue
+                if room is not None and entry["room"] != room:
+                    continue
+                if caller is not None and entry["caller"] != caller:
+                    continue
+                found.append({**entry, "path": events_path})
+    return found
+
+
+def read_call(entry):
+    """
+    Lit les événements d'un appel à partir de son entrée d'index
+
+    Yields:
+        dict: Événements de l'appel, du début à la fin
+    """
+    with open(entry["path"], "rb") as f:
+        f.seek(entry["offset"])
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event.get("room") != entry["room"]:
+                continue
+            yield event
+            if event["event"] == "call_ended":
+                return
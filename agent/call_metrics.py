@@ -0,0 +1,300 @@
+import collections
+import contextlib
+import json
+import logging
+import threading
+import time
+
+from livekit.agents import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_process_stats = None
+
+
+class LatencyHistogram:
+    """
+    Distribution de latences bornée en mémoire (réservoir des derniers échantillons)
+    """
+
+    def __init__(self, max_samples=2048):
+        self._samples = collections.deque(maxlen=max_samples)
+        self.count = 0
+
+    def record(self, value):
+        self._samples.append(value)
+        self.count += 1
+
+    def percentiles(self):
+        """
+        Returns:
+            dict: Nombre d'échantillons et percentiles p50/p95/p99 en millisecondes
+        """
+        if not self._samples:
+            return {"count": 0}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "p50": round(ordered[int(last * 0.50)], 1),
+            "p95": round(ordered[int(last * 0.95)], 1),
+            "p99": round(ordered[int(last * 0.99)], 1),
+        }
+
+
+class ProcessLatencyStats:
+    """
+    Histogrammes de latence nommés, sûrs entre threads
+
+    L'instance du processus (`process_latency_stats`) agrège les appels qu'il
+    a traités: tous ceux du processus en mode AGENT_JOB_EXECUTOR=thread, un
+    seul en mode "process", où chaque job a son processus. L'agrégat de tous
+    les appels du worker se calcule sur les enregistrements de CALL_METRICS_FILE.
+    """
+
+    def __init__(self):
+        self._histograms = collections.defaultdict(LatencyHistogram)
+        self._lock = threading.Lock()
+
+    def record(self, name, value_ms):
+        with self._lock:
+            self._histograms[name].record(value_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: histogram.percentiles() for name, histogram in sorted(self._histograms.items())}
+
+
+def process_latency_stats():
+    """Histogrammes de latence uniques du processus, partagés par ses jobs (prewarm est appelé pour chacun)"""
+    global _process_stats
+    with _lock:
+        if _process_stats is None:
+            _process_stats = ProcessLatencyStats()
+    return _process_stats
+
+
+class CallLatencyRecorder:
+    """
+    Mesure, tour par tour, où passe la latence conversationnelle d'un appel
+
+    Pour chaque tour de parole de l'appelant sont relevés: fin de parole (VAD),
+    transcription finale (STT), premier token et fin de génération (LLM),
+    premier octet audio (TTS) et début de lecture. Les interruptions et la
+    durée des appels de fonctions (CallActions) sont également suivies.
+    """
+
+    def __init__(self, room_name, caller_number, process_stats, output_path=None):
+        """
+        Initialisation de l'enregistreur
+
+        Args:
+            room_name: Nom de la room de l'appel
+            caller_number: Numéro de l'appelant (sip.from)
+            process_stats: ProcessLatencyStats du processus (process_latency_stats)
+            output_path: Fichier JSON lines recevant un enregistrement par appel (optionnel)
+        """
+        self.room_name = room_name
+        self.caller_number = caller_number
+        self.process_stats = process_stats
+        self.output_path = output_path
+        self.started_at = time.time()
+        self.turns = []
+        self.interruptions = 0
+        self.tool_calls = []
+        self._call_stats = ProcessLatencyStats()
+        # Compteurs de l'appel qui ne sont pas des latences (ex: tokens économisés)
+        self.counters = collections.Counter()
+        self._turn = None
+        self._fnc_started_at = None
+        self.setup = None
+
+    def attach(self, agent):
+        """Abonne l'enregistreur aux événements du VoicePipelineAgent"""
+        agent.on("user_started_speaking", self._on_user_started_speaking)
+        agent.on("user_stopped_speaking", self._on_user_stopped_speaking)
+        agent.on("agent_started_speaking", self._on_agent_started_speaking)
+        agent.on("agent_speech_interrupted", self._on_agent_speech_interrupted)
+        agent.on("metrics_collected", self._on_metrics_collected)
+        agent.on("function_calls_collected", self._on_function_calls_collected)
+        agent.on("function_calls_finished", self._on_function_calls_finished)
+
+    def attach_tts(self, tts):
+        """Abonne l'enregistreur aux délais de premier audio du ClauseStreamingTTS (text_chunker)"""
+        tts.on("first_audio", self._on_first_audio)
+
+    def record(self, name, value_ms):
+        """Ajoute une mesure aux histogrammes de l'appel et du processus"""
+        self._call_stats.record(name, value_ms)
+        self.process_stats.record(name, value_ms)
+
+    def count(self, name, value=1):
+        """Ajoute une valeur à un compteur de l'appel (hors histogrammes de latence)"""
+        self.counters[name] += value
+
+    def _current_turn(self):
+        if self._turn is None:
+            self._turn = {"started_at": time.time()}
+            self.turns.append(self._turn)
+        return self._turn
+
+    def _on_user_started_speaking(self, *_):
+        self._turn = None
+        self._current_turn()
+
+    def _on_user_stopped_speaking(self, *_):
+        self._current_turn()["vad_end"] = time.time()
+
+    def _on_agent_started_speaking(self, *_):
+        turn = self._current_turn()
+        if "playout_start" in turn:
+            return
+        turn["playout_start"] = time.time()
+        if "vad_end" in turn:
+            turn["response_ms"] = round((turn["playout_start"] - turn["vad_end"]) * 1000, 1)
+            self.record("response", turn["response_ms"])
+
+    def _on_agent_speech_interrupted(self, *_):
+        self.interruptions += 1
+        self._current_turn()["interrupted"] = True
+
+    def _on_metrics_collected(self, collected):
+        # Seules les métriques rattachées à un tour en ouvrent un (pas celles du VAD, émises en continu)
+        if not isinstance(collected, (metrics.PipelineEOUMetrics, metrics.PipelineLLMMetrics, metrics.PipelineTTSMetrics)):
+            return
+        turn = self._current_turn()
+        if isinstance(collected, metrics.PipelineEOUMetrics):
+            turn["eou_ms"] = round(collected.end_of_utterance_delay * 1000, 1)
+            turn["stt_final_ms"] = round(collected.transcription_delay * 1000, 1)
+            self.record("eou", turn["eou_ms"])
+            self.record("stt_final", turn["stt_final_ms"])
+        elif isinstance(collected, metrics.PipelineLLMMetrics):
+            turn["llm_ttft_ms"] = round(collected.ttft * 1000, 1)
+            turn["llm_duration_ms"] = round(collected.duration * 1000, 1)
+            turn["prompt_tokens"] = collected.prompt_tokens
+            turn["completion_tokens"] = collected.completion_tokens
+            self.record("llm_ttft", turn["llm_ttft_ms"])
+            self.record("llm_duration", turn["llm_duration_ms"])
+        elif isinstance(collected, metrics.PipelineTTSMetrics):
+            # Seul le premier segment audio du tour compte pour le premier octet
+            turn.setdefault("tts_ttfb_ms", round(collected.ttfb * 1000, 1))
+            self.record("tts_ttfb", round(collected.ttfb * 1000, 1))
+
+    def _on_first_audio(self, timing):
+        # Délais mesurés depuis le premier texte reçu du LLM pour la réponse
+        turn = self._current_turn()
+        turn.setdefault("tts_first_chunk_ms", timing["first_chunk_ms"])
+        turn.setdefault("tts_first_audio_ms", timing["first_audio_ms"])
+        self.record("tts_first_chunk", timing["first_chunk_ms"])
+        self.record("tts_first_audio", timing["first_audio_ms"])
+
+    def _on_function_calls_collected(self, *_):
+        self._fnc_started_at = time.perf_counter()
+
+    def _on_function_calls_finished(self, called_functions):
+        if self._fnc_started_at is None:
+            return
+        # Les fonctions d'un même lot s'exécutent ensemble: chacune reçoit la durée du lot
+        duration_ms = round((time.perf_counter() - self._fnc_started_at) * 1000, 1)
+        self._fnc_started_at = None
+        for called in called_functions:
+            name = called.call_info.function_info.name
+            self.tool_calls.append({"name": name, "duration_ms": duration_ms})
+            self.record(f"tool.{name}", duration_ms)
+
+    def write_record(self):
+        """
+        Écrit l'enregistrement structuré de l'appel
+
+        Returns:
+            dict: Enregistrement de l'appel
+        """
+        record = {
+            "room": self.room_name,
+            "caller": self.caller_number,
+            "started_at": self.started_at,
+            "duration_s": round(time.time() - self.started_at, 1),
+            "turn_count": len(self.turns),
+            "interruptions": self.interruptions,
+            "setup": self.setup,
+            "tool_calls": self.tool_calls,
+            "counters": dict(self.counters),
+            "latency": self._call_stats.snapshot(),
+            "turns": self.turns,
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        logger.info(f"Métriques de l'appel: {line}")
+
+        if self.output_path:
+            try:
+                with open(self.output_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning(f"Impossible d'écrire les métriques dans {self.output_path}: {e}")
+
+        logger.info(f"Latences du processus: {json.dumps(self.process_stats.snapshot())}")
+        return record
+
+
+class SetupTimer:
+    """
+    Chronologie de la mise en place d'un appel, du début du job au premier audio
+
+    Les phases (connexion, attente de l'appelant, construction du pipeline...)
+    peuvent se chevaucher: la somme de leurs durées correspond à une mise en
+    place séquentielle, la fin du démarrage de l'agent au chemin critique réel.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.marks = {}
+
+    def _elapsed_ms(self, since=None):
+        return round((time.perf_counter() - (since or self.started)) * 1000, 1)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Mesure la durée d'un bloc de la mise en place"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self._elapsed_ms(start)
+            self.marks[f"{name}_done"] = self._elapsed_ms()
+
+    def mark(self, name):
+        """Relève l'instant (ms depuis le début du job) d'un événement de la mise en place"""
+        self.marks[name] = self._elapsed_ms()
+
+    def summary(self):
+        """
+        Returns:
+            dict: Durées des phases, instants relevés et temps gagné par le parallélisme (ms)
+        """
+        result = {"phases": dict(self.phases), "marks": dict(self.marks)}
+        started = self.marks.get("start_done")
+        if started is not None:
+            result["sequential_ms"] = round(sum(self.phases.values()), 1)
+            result["saved_ms"] = round(result["sequential_ms"] - started, 1)
+        first_audio = self.marks.get("first_audio")
+        sip = self.marks.get("sip_participant")
+        if sip is not None and first_audio is not None:
+            result["sip_to_first_audio_ms"] = round(first_audio - sip, 1)
+        return result
+
+    def attach(self, agent, recorder):
+        """Clôt la chronologie au premier audio de l'agent et l'ajoute aux métriques de l'appel"""
+
+        def on_agent_started_speaking(*_):
+            agent.off("agent_started_speaking", on_agent_started_speaking)
+            self.mark("first_audio")
+            recorder.setup = self.summary()
+            for name, duration_ms in self.phases.items():
+                recorder.record(f"setup.{name}", duration_ms)
+            if "sip_to_first_audio_ms" in recorder.setup:
+                recorder.record("setup.sip_to_first_audio", recorder.setup["sip_to_first_audio_ms"])
+            logger.info(f"Mise en place de l'appel: {json.dumps(recorder.setup)}")
+
+        agent.on("agent_started_speaking", on_agent_started_speaking)
@@ -0,0 +1,458 @@
+import asyncio
+import atexit
+import collections
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_process_store = None
+_process_store_ready = False
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    next_value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_info (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    room TEXT NOT NULL,
+    caller TEXT,
+    name TEXT,
+    email TEXT,
+    issue TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_number INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    room TEXT NOT NULL,
+    caller TEXT,
+    issue TEXT,
+    priority INTEGER,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS caller_profiles (
+    caller TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS customer_info_caller ON customer_info (caller, created_at);
+CREATE INDEX IF NOT EXISTS tickets_caller ON tickets (caller, status, ticket_number);
+"""
+
+INSERT_CUSTOMER_INFO = (
+    "INSERT OR IGNORE INTO customer_info (idempotency_key, room, caller, name, email, issue, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+INSERT_TICKET = (
+    "INSERT OR IGNORE INTO tickets (ticket_number, idempotency_key, room, caller, issue, priority, status, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+SELECT_CUSTOMER_INFO = (
+    "SELECT name, email, issue FROM customer_info WHERE caller = ? ORDER BY created_at DESC LIMIT ?"
+)
+SELECT_OPEN_TICKETS = (
+    "SELECT ticket_number, issue, priority FROM tickets WHERE caller = ? AND status = 'open' "
+    "ORDER BY ticket_number DESC LIMIT ?"
+)
+SELECT_CALLER_PROFILE = "SELECT profile, updated_at FROM caller_profiles WHERE caller = ?"
+UPSERT_CALLER_PROFILE = (
+    "INSERT INTO caller_profiles (caller, profile, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(caller) DO UPDATE SET profile = excluded.profile, updated_at = excluded.updated_at"
+)
+
+# Nombre d'enregistrements clients récents fusionnés pour reconstituer un profil
+PROFILE_HISTORY = 5
+
+# Premier numéro de ticket attribué sur une base neuve
+FIRST_TICKET_NUMBER = 10000
+
+
+def idempotency_key(room, tool, arguments):
+    """
+    Clé d'idempotence d'un appel d'outil: empreinte de (room, outil, arguments)
+
+    Une même demande répétée par le LLM pendant l'appel produit la même clé.
+    """
+    payload = json.dumps([room, tool, arguments], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def format_ticket_number(number):
+    return f"TKT-{number}"
+
+
+def _connect(path, check_same_thread=True):
+    connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=check_same_thread)
+    # WAL: les écritures d'un processus ne bloquent pas les lectures des autres
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def allocate_block(connection, name, size):
+    """
+    Réserve un bloc de numéros consécutifs dans la table des séquences
+
+    La réservation est une transaction IMMEDIATE: les processus qui partagent
+    la base obtiennent des blocs disjoints, croissants dans l'ordre des réservations.
+
+    Returns:
+        range: Numéros réservés
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute("SELECT next_value FROM sequences WHERE name = ?", (name,)).fetchone()
+        start = row[0] if row else FIRST_TICKET_NUMBER
+        connection.execute(
+            "INSERT INTO sequences (name, next_value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET next_value = excluded.next_value",
+            (name, start + size),
+        )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return range(start, start + size)
+
+
+def read_caller(connection, caller, max_tickets):
+    """
+    Reconstitue le profil d'un appelant à partir des informations clients et des tickets
+
+    Les derniers enregistrements clients sont fusionnés: chaque champ prend
+    la valeur renseignée la plus récente.
+
+    Returns:
+        dict: {"name", "email", "issue", "open_tickets": [{"ticket", "issue", "priority"}]}
+    """
+    customer_rows = connection.execute(SELECT_CUSTOMER_INFO, (caller, PROFILE_HISTORY)).fetchall()
+    ticket_rows = connection.execute(SELECT_OPEN_TICKETS, (caller, max_tickets)).fetchall()
+
+    profile = {"name": None, "email": None, "issue": None}
+    for row in customer_rows:
+        for field, value in zip(("name", "email", "issue"), row):
+            if profile[field] is None and value:
+                profile[field] = value
+    profile["open_tickets"] = [
+        {"ticket": format_ticket_number(number), "issue": issue, "priority": priority}
+        for number, issue, priority in ticket_rows
+    ]
+    return profile
+
+
+class CallStore:
+    """
+    Persistance locale (SQLite en mode WAL) des informations clients et des tickets
+
+    Les enregistrements sont mis en file et un thread dédié les écrit par
+    lots. Chaque numéro de ticket est tiré de la séquence de la base au moment
+    de la création, dans un thread (jamais sur la boucle d'événements): une
+    transaction IMMEDIATE de quelques centaines de microsecondes en mode WAL,
+    seule écriture attendue par l'action d'appel. Une demande répétée pendant
+    un appel (même room, même outil, mêmes arguments) renvoie le résultat déjà
+    attribué.
+
+    Garantie: un numéro n'est jamais attribué deux fois et les numéros croissent
+    dans l'ordre des réservations, tous processus confondus. Un ticket perdu
+    (file pleine, échec d'écriture) laisse un trou dans la numérotation.
+    """
+
+    def __init__(self, path, flush_interval=0.1, max_pending=10000, max_keys=10000):
+        """
+        Initialisation du stockage
+
+        Args:
+            path: Fichier SQLite (partagé par les processus de l'agent)
+            flush_interval: Attente maximale (s) avant l'écriture d'un lot
+            max_pending: Nombre maximal d'enregistrements en attente (au-delà ils sont perdus)
+            max_keys: Nombre de clés d'idempotence conservées en mémoire
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict()
+        self._reservations = {}
+        self._counters = collections.Counter()
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._sequence = None
+        self._sequence_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = _connect(path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+        self._thread = threading.Thread(target=self._run, name="call-store", daemon=True)
+        self._thread.start()
+        # Les enregistrements encore en file sont écrits à la sortie du processus
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Construit le stockage à partir des variables CALL_STORE_*
+
+        Returns:
+            CallStore ou None si CALL_STORE_PATH est vide
+        """
+        path = os.environ.get("CALL_STORE_PATH", "call_store.db")
+        if not path:
+            return None
+        return cls(
+            path,
+            flush_interval=float(os.environ.get("CALL_STORE_FLUSH_MS", "100")) / 1000,
+            max_pending=int(os.environ.get("CALL_STORE_MAX_PENDING", "10000")),
+        )
+
+    def save_customer_info(self, room, caller, name=None, email=None, issue=None):
+        """
+        Enregistre les informations d'un client
+
+        Returns:
+            bool: False si la même demande a déjà été enregistrée pendant l'appel
+        """
+        key = idempotency_key(room, "collect_customer_info", {"name": name, "email": email, "issue": issue})
+        with self._lock:
+            if key in self._results:
+                self._counters["duplicates"] += 1
+                return False
+            self._remember(key, True)
+        self._enqueue(("customer_info", (key, room, caller, name, email, issue, time.time())))
+        return True
+
+    async def create_ticket(self, room, caller, issue=None, priority=None):
+        """
+        Crée un ticket de support
+
+        Returns:
+            str: Numéro du ticket (le même pour une demande répétée pendant l'appel)
+        """
+        key = idempotency_key(room, "create_support_ticket", {"issue": issue, "priority": priority})
+        with self._lock:
+            number = self._results.get(key)
+            if number is not None:
+                self._counters["duplicates"] += 1
+                return format_ticket_number(number)
+            # Une demande répétée pendant la réservation attend le même numéro
+            reservation = self._reservations.get(key)
+            if reservation is not None:
+                self._counters["duplicates"] += 1
+            else:
+                row = (key, room, caller, issue, priority, "open", time.time())
+                reservation = self._reservations[key] = asyncio.ensure_future(self._reserve_ticket(key, row))
+        # L'annulation de l'outil n'interrompt pas la réservation, dont le ticket est enregistré
+        return format_ticket_number(await asyncio.shield(reservation))
+
+    async def _reserve_ticket(self, key, row):
+        try:
+            number = await asyncio.to_thread(self._reserve_number)
+        except BaseException:
+            with self._lock:
+                self._reservations.pop(key, None)
+            raise
+        with self._lock:
+            self._reservations.pop(key, None)
+            self._remember(key, number)
+        self._enqueue(("ticket", (number, *row)))
+        return number
+
+    def load_caller(self, caller, max_tickets=3):
+        """
+        Informations connues sur un appelant (lecture bloquante, à lancer hors de la boucle)
+
+        Les enregistrements encore en file d'écriture ne sont pas vus.
+
+        Returns:
+            dict: Profil reconstitué par `read_caller`
+        """
+        with self._reader_lock:
+            return read_caller(self._reader_connection(), caller, max_tickets)
+
+    def load_profile(self, caller, max_age):
+        """
+        Profil d'un appelant déjà calculé par un processus de l'agent (lecture bloquante)
+
+        La table caller_profiles est partagée par tous les processus: un appelant
+        qui rappelle est servi par une lecture sur clé primaire, quel que soit le
+        processus qui a traité son appel précédent.
+
+        Args:
+            caller: Numéro de l'appelant
+            max_age: Âge maximal (s) du profil enregistré
+
+        Returns:
+            dict ou None si absent ou trop ancien
+        """
+        with self._reader_lock:
+            row = self._reader_connection().execute(SELECT_CALLER_PROFILE, (caller,)).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def save_profile(self, caller, max_tickets=3, profile=None, on_saved=None):
+        """
+        Enregistre le profil d'un appelant dans la table partagée (par le thread d'écriture)
+
+        Sans profil fourni, il est recalculé par le thread d'écriture après les
+        enregistrements déjà en file: à la fin d'un appel, il inclut donc les
+        informations et tickets créés pendant l'appel.
+
+        Args:
+            caller: Numéro de l'appelant
+            max_tickets: Nombre maximal de tickets ouverts repris dans le profil
+            profile: Profil déjà lu (None = recalculé)
+            on_saved: Fonction appelée avec le profil enregistré (depuis le thread d'écriture)
+        """
+        self._enqueue(("profile", (caller, max_tickets, profile, on_saved)))
+
+    def _reader_connection(self):
+        # Appelé sous self._reader_lock
+        if self._reader is None:
+            self._reader = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        return self._reader
+
+    def stats(self):
+        """Compteurs du stockage (enregistrements et profils écrits, doublons évités, pertes)"""
+        return {
+            "pending": self._queue.qsize(),
+            "written": self._counters["written"],
+            "profiles": self._counters["profiles"],
+            "duplicates": self._counters["duplicates"],
+            "dropped": self._counters["dropped"],
+            "batches": self._counters["batches"],
+            "reserved": self._counters["reserved"],
+        }
+
+    def _remember(self, key, result):
+        self._results[key] = result
+        if len(self._results) > self.max_keys:
+            self._results.popitem(last=False)
+
+    def _reserve_number(self):
+        # Dans un thread: transaction IMMEDIATE sur la séquence partagée par les processus
+        with self._sequence_lock:
+            if self._sequence is None:
+                # Utilisée par les threads de asyncio.to_thread, sous self._sequence_lock
+                self._sequence = _connect(self.path, check_same_thread=False)
+            number = allocate_block(self._sequence, "ticket", 1).start
+        self._counters["reserved"] += 1
+        return number
+
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._counters["dropped"] += 1
+
+    def _run(self):
+        connection = _connect(self.path)
+        closing = False
+        while not closing:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Regroupe les enregistrements arrivés pendant la fenêtre d'écriture
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            try:
+                self._write(connection, batch)
+            except sqlite3.Error as e:
+                logger.warning(f"Échec de l'écriture dans {self.path} ({len(batch)} enregistrements perdus): {e}")
+        connection.close()
+
+    def _write(self, connection, batch):
+        rows = {"customer_info": [], "ticket": [], "profile": []}
+        for kind, row in batch:
+            rows[kind].append(row)
+
+        if not any(rows.values()):
+            return
+        saved = []
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(INSERT_CUSTOMER_INFO, rows["customer_info"])
+            connection.executemany(INSERT_TICKET, rows["ticket"])
+            # Profils recalculés après les insertions du lot, dans la même transaction
+            for caller, max_tickets, profile, on_saved in rows["profile"]:
+                if profile is None:
+                    profile = read_caller(connection, caller, max_tickets)
+                connection.execute(UPSERT_CALLER_PROFILE, (caller, json.dumps(profile, ensure_ascii=False), time.time()))
+                saved.append((on_saved, profile))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._counters["written"] += len(rows["customer_info"]) + len(rows["ticket"])
+        self._counters["profiles"] += len(rows["profile"])
+        self._counters["batches"] += 1
+
+        for on_saved, profile in saved:
+            if on_saved is None:
+                continue
+            try:
+                on_saved(profile)
+            except Exception as e:
+                logger.warning(f"Échec de la mise à jour d'un profil en mémoire: {e}")
+
+    def close(self):
+        """Écrit les enregistrements en attente et ferme la base"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+        with self._sequence_lock:
+            if self._sequence is not None:
+                self._sequence.close()
+                self._sequence = None
+
+
+def process_store():
+    """
+    CallStore unique du processus, construit par `CallStore.from_env`
+
+    En mode AGENT_JOB_EXECUTOR=thread, `prewarm` est appelé pour chaque job:
+    le stockage (thread d'écriture, connexions, hook atexit) n'est créé qu'une
+    fois et partagé par les jobs du processus.
+
+    Returns:
+        CallStore ou None si CALL_STORE_PATH est vide
+    """
+    global _process_store, _process_store_ready
+    with _lock:
+        if not _process_store_ready:
+            _process_store = CallStore.from_env()
+            _process_store_ready = True
+    return _process_store
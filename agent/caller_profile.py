@@ -0,0 +1,218 @@
+import asyncio
+import collections
+import logging
+import os
+import threading
+import time
+
+from livekit.agents.llm import ChatMessage
+
+from call_metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Valeur de sip.from lorsque le numéro de l'appelant est absent
+UNKNOWN_CALLER = "Inconnu"
+
+_lock = threading.Lock()
+_process_profiles = None
+_process_profiles_ready = False
+
+
+def profile_message(caller, profile):
+    """
+    Message système décrivant ce que l'on sait déjà de l'appelant
+
+    Returns:
+        str ou None si rien n'est connu
+    """
+    if not profile:
+        return None
+    known = [
+        f"{label}: {profile[field]}"
+        for field, label in (("name", "nom"), ("email", "email"), ("issue", "dernière demande"))
+        if profile.get(field)
+    ]
+    tickets = [
+        f"{ticket['ticket']} (priorité {ticket['priority']}): {ticket['issue'] or 'sans description'}"
+        for ticket in profile.get("open_tickets", [])
+    ]
+    if not known and not tickets:
+        return None
+
+    lines = [f"Informations connues sur l'appelant ({caller}), issues de ses appels précédents:"]
+    if known:
+        lines.append("; ".join(known) + ".")
+    if tickets:
+        lines.append("Tickets ouverts: " + "; ".join(tickets) + ".")
+    lines.append(
+        "Ne redemandez pas ces informations: faites-les simplement confirmer si nécessaire, "
+        "et rattachez la demande à un ticket ouvert plutôt que d'en créer un nouveau."
+    )
+    return "\n".join(lines)
+
+
+class CallerProfiles:
+    """
+    Profils des appelants lus dans le CallStore dès l'identification du participant SIP
+
+    La lecture se fait dans un thread, pendant le message de bienvenue; le
+    résultat est injecté dans le contexte du LLM avant la première question de
+    l'appelant. Les profils sont mis en cache sur deux niveaux, avec le même TTL:
+        - la table caller_profiles du CallStore, partagée par tous les processus
+          (en mode "process", chaque appel a son propre processus);
+        - la mémoire du processus (instance unique, `process_profiles`),
+          partagée par les jobs en mode "thread".
+    À la fin d'un appel, le profil est recalculé (informations et tickets de
+    l'appel compris) et remplace l'entrée des deux caches.
+    """
+
+    def __init__(self, store, ttl=300.0, max_entries=1000, max_tickets=3):
+        """
+        Initialisation du cache de profils
+
+        Args:
+            store: CallStore du processus
+            ttl: Durée de validité (s) d'un profil en mémoire
+            max_entries: Nombre maximal de profils en mémoire
+            max_tickets: Nombre maximal de tickets ouverts repris dans le profil
+        """
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_tickets = max_tickets
+        self._cache = collections.OrderedDict()
+        # Les jobs d'un worker en mode "thread" partagent le cache
+        self._lock = threading.Lock()
+        self._lookup_ms = LatencyHistogram()
+        self._counters = collections.Counter()
+
+    @classmethod
+    def from_env(cls, store):
+        """
+        Construit le cache à partir des variables CALLER_PROFILE_*
+
+        Returns:
+            CallerProfiles ou None si le stockage est désactivé ou CALLER_PROFILE=0
+        """
+        if store is None or os.environ.get("CALLER_PROFILE", "1") != "1":
+            return None
+        return cls(
+            store,
+            ttl=float(os.environ.get("CALLER_PROFILE_TTL", "300")),
+            max_entries=int(os.environ.get("CALLER_PROFILE_MAX_ENTRIES", "1000")),
+            max_tickets=int(os.environ.get("CALLER_PROFILE_MAX_TICKETS", "3")),
+        )
+
+    async def lookup(self, caller):
+        """
+        Profil d'un appelant (mémoire, sinon table partagée, sinon reconstitué en base)
+
+        Returns:
+            dict ou None si le numéro est inconnu ou la lecture a échoué
+        """
+        if not caller or caller == UNKNOWN_CALLER:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(caller)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(caller)
+                self._counters["hits"] += 1
+                return entry[1]
+
+        start = time.perf_counter()
+        try:
+            profile, shared = await asyncio.to_thread(self._load, caller)
+        except Exception as e:
+            self._counters["errors"] += 1
+            logger.warning(f"Lecture du profil de {caller} impossible: {e}")
+            return None
+        self._lookup_ms.record((time.perf_counter() - start) * 1000)
+        if shared:
+            self._counters["shared_hits"] += 1
+        else:
+            self._counters["misses"] += 1
+            # Profil reconstitué: mis à disposition des autres processus
+            self.store.save_profile(caller, self.max_tickets, profile=profile)
+
+        self._remember(caller, profile)
+        return profile
+
+    def refresh(self, caller):
+        """
+        Recalcule le profil d'un appelant à la fin de son appel
+
+        Le calcul est fait par le thread d'écriture du CallStore, après les
+        informations et tickets enregistrés pendant l'appel; le cache mémoire est
+        mis à jour dès que la table partagée l'est.
+        """
+        if not caller or caller == UNKNOWN_CALLER:
+            return
+        self.store.save_profile(caller, self.max_tickets, on_saved=lambda profile: self._remember(caller, profile))
+
+    def _load(self, caller):
+        # Dans un thread: table partagée, sinon reconstitution à partir des tables
+        profile = self.store.load_profile(caller, self.ttl)
+        if profile is not None:
+            return profile, True
+        return self.store.load_caller(caller, self.max_tickets), False
+
+    def _remember(self, caller, profile):
+        with self._lock:
+            self._cache[caller] = (time.monotonic() + self.ttl, profile)
+            self._cache.move_to_end(caller)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def inject(self, caller, chat_ctx):
+        """
+        Ajoute le profil de l'appelant au contexte du LLM, après les messages système
+
+        Returns:
+            bool: True si un profil a été injecté
+        """
+        message = profile_message(caller, await self.lookup(caller))
+        if message is None:
+            return False
+        messages = chat_ctx.messages
+        index = 0
+        while index < len(messages) and messages[index].role == "system":
+            index += 1
+        # Inséré dans l'en-tête système: conservé par le ContextCompactor
+        messages.insert(index, ChatMessage.create(role="system", text=message))
+        self._counters["injected"] += 1
+        return True
+
+    def stats(self):
+        """Succès des caches (mémoire, table partagée), profils injectés et temps de lecture en base (ms)"""
+        return {
+            "entries": len(self._cache),
+            "hits": self._counters["hits"],
+            "shared_hits": self._counters["shared_hits"],
+            "misses": self._counters["misses"],
+            "errors": self._counters["errors"],
+            "injected": self._counters["injected"],
+            "lookup_ms": self._lookup_ms.percentiles(),
+        }
+
+
+def process_profiles(store):
+    """
+    CallerProfiles unique du processus, construit par `CallerProfiles.from_env`
+
+    En mode AGENT_JOB_EXECUTOR=thread, `prewarm` est appelé pour chaque job:
+    le cache mémoire n'est créé qu'une fois et partagé par les jobs du processus.
+
+    Args:
+        store: CallStore du processus (process_store)
+
+    Returns:
+        CallerProfiles ou None si le stockage est désactivé ou CALLER_PROFILE=0
+    """
+    global _process_profiles, _process_profiles_ready
+    with _lock:
+        if not _process_profiles_ready:
+            _process_profiles = CallerProfiles.from_env(store)
+            _process_profiles_ready = True
+    return _process_profiles
@@ -0,0 +1,192 @@
+import asyncio
+import collections
+import logging
+
+from livekit.agents.llm import ChatContext, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Surcoût approximatif d'un message dans le format de chat OpenAI
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Fraction du budget à partir de laquelle le résumé des anciens tours est lancé
+SUMMARY_TRIGGER_RATIO = 0.75
+
+SUMMARY_PROMPT = (
+    "Tu résumes une conversation téléphonique entre un client et un assistant. "
+    "Conserve en quelques phrases, en français, les informations utiles pour la suite: "
+    "identité et coordonnées du client, sa demande, les tickets créés et les engagements pris. "
+    "Ne réponds que par le résumé."
+)
+
+
+def _message_text(msg):
+    if isinstance(msg.content, str):
+        text = msg.content
+    elif isinstance(msg.content, list):
+        text = " ".join(part for part in msg.content if isinstance(part, str))
+    else:
+        text = ""
+    for call in msg.tool_calls or []:
+        text += f" {call.function_info.name}({call.raw_arguments})"
+    return text
+
+
+def estimate_tokens(msg):
+    """
+    Estime le nombre de tokens d'un message (environ 4 caractères par token)
+
+    Args:
+        msg: ChatMessage à mesurer
+
+    Returns:
+        int: Nombre de tokens estimé
+    """
+    return len(_message_text(msg)) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextCompactor:
+    """
+    Maintient le contexte envoyé au LLM sous un budget de tokens
+
+    Le prompt système et les N derniers tours sont conservés tels quels; les
+    tours plus anciens sont remplacés par un résumé glissant, produit en tâche
+    de fond par le LLM pour ne pas ralentir le tour en cours. Un tour commence
+    à un message utilisateur, de sorte que les appels de fonctions et leurs
+    résultats ne sont jamais séparés.
+    """
+
+    def __init__(self, llm, token_budget=3000, keep_turns=6):
+        """
+        Initialisation du compacteur
+
+        Args:
+            llm: Instance LLM dédiée au résumé (pas celle de l'agent: ses métriques fausseraient llm_ttft)
+            token_budget: Budget de tokens du contexte envoyé au LLM
+            keep_turns: Nombre de derniers tours conservés mot pour mot
+        """
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self._summary = None
+        self._summarized_count = 0
+        self._summary_task = None
+        self._counters = collections.Counter()
+
+    def compact(self, chat_ctx, record=True):
+        """
+        Réduit sur place le contexte (copie propre au tour) passé au LLM
+
+        Args:
+            chat_ctx: ChatContext copié reçu par before_llm_cb
+            record: Compte ce passage dans les statistiques (False pour les requêtes spéculatives)
+
+        Returns:
+            int: Nombre de tokens économisés pour ce tour
+        """
+        messages = chat_ctx.messages
+        tokens_before = sum(estimate_tokens(msg) for msg in messages)
+        counters = self._counters if record else collections.Counter()
+        counters["turns"] += 1
+
+        system_count = 0
+        while system_count < len(messages) and messages[system_count].role == "system":
+            system_count += 1
+        head, rest = messages[:system_count], messages[system_count:]
+
+        # Début des N derniers tours (chaque tour commence par un message utilisateur)
+        user_indexes = [idx for idx, msg in enumerate(rest) if msg.role == "user"]
+        if len(user_indexes) <= self.keep_turns:
+            return 0
+        split = user_indexes[-self.keep_turns]
+        older, tail = rest[:split], rest[split:]
+
+        # Le résumé est préparé avant que le budget ne soit atteint
+        if tokens_before > self.token_budget * SUMMARY_TRIGGER_RATIO:
+            self._schedule_summary(older)
+        if tokens_before <= self.token_budget:
+            return 0
+
+        # Les messages déjà couverts par le résumé sont remplacés par celui-ci
+        covered = min(self._summarized_count, len(older))
+        uncovered = list(older[covered:])
+        summary = []
+        if self._summary and covered:
+            summary = [ChatMessage.create(
+                text=f"Résumé de la conversation précédente: {self._summary}",
+                role="system",
+            )]
+
+        def total(candidate):
+            return sum(estimate_tokens(msg) for msg in candidate)
+
+        # En attendant le résumé, les messages non résumés les plus anciens sont abandonnés
+        fixed = head + summary + tail
+        while uncovered and total(fixed + uncovered) > self.token_budget:
+            # Un tour abandonné l'est en entier pour ne pas orpheliner un résultat de fonction
+            uncovered.pop(0)
+            while uncovered and uncovered[0].role != "user":
+                uncovered.pop(0)
+
+        chat_ctx.messages[:] = head + summary + uncovered + tail
+        tokens_after = total(chat_ctx.messages)
+        saved = tokens_before - tokens_after
+
+        counters["compacted_turns"] += 1
+        counters["tokens_saved"] += saved
+        logger.debug(
+            f"Contexte compacté: {tokens_before} -> {tokens_after} tokens "
+            f"({saved} économisés, {len(older) - len(uncovered)} messages résumés ou retirés)"
+        )
+        return saved
+
+    def _schedule_summary(self, older):
+        if len(older) > self._summarized_count and self._summary_task is None:
+            self._summary_task = asyncio.create_task(self._summarize(list(older)))
+
+    async def _summarize(self, older):
+        try:
+            lines = [f"Résumé précédent: {self._summary}"] if self._summary else []
+            for msg in older[self._summarized_count:]:
+                text = _message_text(msg).strip()
+                if text:
+                    lines.append(f"{msg.role}: {text}")
+
+            prompt = ChatContext().append(role="system", text=SUMMARY_PROMPT)
+            prompt.append(role="user", text="\n".join(lines))
+
+            parts = []
+            stream = self.llm.chat(chat_ctx=prompt)
+            try:
+                async for chunk in stream:
+                    for choice in chunk.choices:
+                        if choice.delta.content:
+                            parts.append(choice.delta.content)
+            finally:
+                await stream.aclose()
+
+            if parts:
+                self._summary = "".join(parts).strip()
+                self._summarized_count = len(older)
+                self._counters["summaries"] += 1
+        except Exception as e:
+            logger.warning(f"Échec du résumé du contexte de conversation: {e}")
+        finally:
+            self._summary_task = None
+
+    def stats(self):
+        """Compteurs de compaction (tokens économisés par tour)"""
+        turns = self._counters["turns"]
+        return {
+            "token_budget": self.token_budget,
+            "turns": turns,
+            "compacted_turns": self._counters["compacted_turns"],
+            "summaries": self._counters["summaries"],
+            "tokens_saved": self._counters["tokens_saved"],
+            "tokens_saved_per_turn": round(self._counters["tokens_saved"] / turns, 1) if turns else 0.0,
+        }
+
+    async def aclose(self):
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            await asyncio.gather(self._summary_task, return_exceptions=True)
@@ -0,0 +1,311 @@
+import asyncio
+import math
+import os
+import random
+import time
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import APIConnectionError, llm, stt, tts, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+# Phrases reconnues par le faux STT, dans l'ordre des tours de parole
+DEFAULT_TRANSCRIPTS = [
+    "Bonjour, j'appelle au sujet de ma commande.",
+    "Elle devait arriver hier et je n'ai toujours rien reçu.",
+    "Pouvez-vous vérifier où elle en est?",
+    "D'accord, merci beaucoup pour votre aide.",
+]
+
+DEFAULT_RESPONSE = (
+    "Je comprends tout à fait votre situation. Je vérifie tout de suite l'état de votre commande. "
+    "Pouvez-vous me rappeler votre numéro de commande, s'il vous plaît?"
+)
+
+
+class LatencyDistribution:
+    """
+    Latence simulée: loi normale tronquée, à partir d'une spécification "moyenne:écart-type" en ms
+    """
+
+    def __init__(self, mean_ms, stddev_ms=0.0, min_ms=0.0):
+        self.mean_ms = mean_ms
+        self.stddev_ms = stddev_ms
+        self.min_ms = min_ms
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Args:
+            spec: "150" (fixe) ou "150:30" (moyenne:écart-type)
+        """
+        mean, _, stddev = spec.partition(":")
+        return cls(float(mean), float(stddev or 0.0))
+
+    def sample(self, rng):
+        """Tire une latence en secondes"""
+        if self.stddev_ms <= 0:
+            return max(self.min_ms, self.mean_ms) / 1000
+        return max(self.min_ms, rng.gauss(self.mean_ms, self.stddev_ms)) / 1000
+
+
+class FakeProviderConfig:
+    """Paramètres des faux fournisseurs (variables FAKE_*)"""
+
+    def __init__(
+        self,
+        seed=0,
+        stt_latency=None,
+        stt_interim_interval=0.15,
+        stt_energy_threshold=0.02,
+        stt_silence=0.3,
+        stt_failure_rate=0.0,
+        transcripts=None,
+        llm_ttft=None,
+        llm_tokens_per_s=60.0,
+        llm_chunk_tokens=1,
+        llm_failure_rate=0.0,
+        response=DEFAULT_RESPONSE,
+        tts_ttfb=None,
+        tts_chunk_ms=50,
+        tts_realtime_factor=4.0,
+        tts_chars_per_s=14.0,
+        tts_failure_rate=0.0,
+    ):
+        self.seed = seed
+        self.stt_latency = stt_latency or LatencyDistribution(150, 30)
+        self.stt_interim_interval = stt_interim_interval
+        self.stt_energy_threshold = stt_energy_threshold
+        self.stt_silence = stt_silence
+        self.stt_failure_rate = stt_failure_rate
+        self.transcripts = transcripts or DEFAULT_TRANSCRIPTS
+        self.llm_ttft = llm_ttft or LatencyDistribution(350, 80)
+        self.llm_tokens_per_s = llm_tokens_per_s
+        self.llm_chunk_tokens = llm_chunk_tokens
+        self.llm_failure_rate = llm_failure_rate
+        self.response = response
+        self.tts_ttfb = tts_ttfb or LatencyDistribution(200, 40)
+        self.tts_chunk_ms = tts_chunk_ms
+        self.tts_realtime_factor = tts_realtime_factor
+        self.tts_chars_per_s = tts_chars_per_s
+        self.tts_failure_rate = tts_failure_rate
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        transcripts = [line for line in env("FAKE_STT_TRANSCRIPTS", "").split("|") if line.strip()]
+        return cls(
+            seed=int(env("FAKE_SEED", "0")),
+            stt_latency=LatencyDistribution.parse(env("FAKE_STT_LATENCY_MS", "150:30")),
+            stt_interim_interval=float(env("FAKE_STT_INTERIM_MS", "150")) / 1000,
+            stt_silence=float(env("FAKE_STT_SILENCE_MS", "300")) / 1000,
+            stt_failure_rate=float(env("FAKE_STT_FAILURE_RATE", "0")),
+            transcripts=transcripts or None,
+            llm_ttft=LatencyDistribution.parse(env("FAKE_LLM_TTFT_MS", "350:80")),
+            llm_tokens_per_s=float(env("FAKE_LLM_TOKENS_PER_S", "60")),
+            llm_chunk_tokens=int(env("FAKE_LLM_CHUNK_TOKENS", "1")),
+            llm_failure_rate=float(env("FAKE_LLM_FAILURE_RATE", "0")),
+            response=env("FAKE_LLM_RESPONSE", DEFAULT_RESPONSE),
+            tts_ttfb=LatencyDistribution.parse(env("FAKE_TTS_TTFB_MS", "200:40")),
+            tts_chunk_ms=int(env("FAKE_TTS_CHUNK_MS", "50")),
+            tts_realtime_factor=float(env("FAKE_TTS_REALTIME_FACTOR", "4")),
+            tts_failure_rate=float(env("FAKE_TTS_FAILURE_RATE", "0")),
+        )
+
+    def rng(self, name):
+        """Générateur pseudo-aléatoire propre à un fournisseur (reproductible avec FAKE_SEED)"""
+        return random.Random(f"{self.seed}:{name}")
+
+
+def _maybe_fail(rng, rate, provider):
+    if rate > 0 and rng.random() < rate:
+        raise APIConnectionError(f"Échec simulé du fournisseur {provider}")
+
+
+class FakeSTT(stt.STT):
+    """
+    Faux STT en streaming: détecte les segments de parole par énergie et
+    renvoie les phrases configurées, avec transcriptions intermédiaires
+    """
+
+    def __init__(self, config=None):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=True, interim_results=True))
+        self.config = config or FakeProviderConfig.from_env()
+        self._rng = self.config.rng("stt")
+        self._turn = 0
+
+    def next_transcript(self):
+        text = self.config.transcripts[self._turn % len(self.config.transcripts)]
+        self._turn += 1
+        return text
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        await asyncio.sleep(self.config.stt_latency.sample(self._rng))
+        _maybe_fail(self._rng, self.config.stt_failure_rate, "stt")
+        return _speech_event(stt.SpeechEventType.FINAL_TRANSCRIPT, self.next_transcript())
+
+    def stream(self, *, language=None, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return _FakeSpeechStream(stt=self, conn_options=conn_options)
+
+
+def _speech_event(event_type, text=""):
+    alternatives = [stt.SpeechData(language="fr", text=text, confidence=1.0)] if text else []
+    return stt.SpeechEvent(type=event_type, alternatives=alternatives)
+
+
+class _FakeSpeechStream(stt.RecognizeStream):
+    def __init__(self, *, stt, conn_options):
+        super().__init__(stt=stt, conn_options=conn_options, sample_rate=16000)
+
+    async def _run(self):
+        config = self._stt.config
+        rng = self._stt._rng
+        speaking = False
+        speech_duration = 0.0
+        silence_duration = 0.0
+        last_interim = 0.0
+        transcript = None
+
+        async for frame in self._input_ch:
+            if isinstance(frame, self._FlushSentinel):
+                continue
+            samples = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32) / 32768.0
+            rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+            duration = frame.samples_per_channel / frame.sample_rate
+
+            if rms >= config.stt_energy_threshold:
+                if not speaking:
+                    _maybe_fail(rng, config.stt_failure_rate, "stt")
+                    speaking = True
+                    speech_duration = 0.0
+                    last_interim = 0.0
+                    transcript = self._stt.next_transcript()
+                    self._event_ch.send_nowait(_speech_event(stt.SpeechEventType.START_OF_SPEECH))
+                speech_duration += duration
+                silence_duration = 0.0
+                if speech_duration - last_interim >= config.stt_interim_interval:
+                    # Les mots « entendus » progressent avec la durée de parole
+                    last_interim = speech_duration
+                    words = transcript.split()
+                    count = max(1, min(len(words), int(speech_duration * 3)))
+                    self._event_ch.send_nowait(
+                        _speech_event(stt.SpeechEventType.INTERIM_TRANSCRIPT, " ".join(words[:count]))
+                    )
+            elif speaking:
+                silence_duration += duration
+                if silence_duration >= config.stt_silence:
+                    speaking = False
+                    await asyncio.sleep(config.stt_latency.sample(rng))
+                    self._event_ch.send_nowait(_speech_event(stt.SpeechEventType.FINAL_TRANSCRIPT, transcript))
+                    self._event_ch.send_nowait(_speech_event(stt.SpeechEventType.END_OF_SPEECH))
+
+
+class FakeLLM(llm.LLM):
+    """Faux LLM: premier token après une latence simulée, puis débit de tokens constant"""
+
+    def __init__(self, config=None):
+        super().__init__()
+        self.config = config or FakeProviderConfig.from_env()
+        self._rng = self.config.rng("llm")
+
+    def chat(
+        self,
+        *,
+        chat_ctx,
+        conn_options=DEFAULT_API_CONNECT_OPTIONS,
+        fnc_ctx=None,
+        temperature=None,
+        n=None,
+        parallel_tool_calls=None,
+        tool_choice=None,
+    ):
+        return _FakeLLMStream(self, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=conn_options)
+
+
+class _FakeLLMStream(llm.LLMStream):
+    async def _run(self):
+        config = self._llm.config
+        rng = self._llm._rng
+        request_id = utils.shortuuid()
+
+        await asyncio.sleep(config.llm_ttft.sample(rng))
+        _maybe_fail(rng, config.llm_failure_rate, "llm")
+
+        # Un mot (avec son espace) compte pour un token
+        tokens = [word + " " for word in config.response.split()]
+        chunk_size = max(1, config.llm_chunk_tokens)
+        delay = chunk_size / config.llm_tokens_per_s if config.llm_tokens_per_s > 0 else 0.0
+        for start in range(0, len(tokens), chunk_size):
+            if start:
+                await asyncio.sleep(delay)
+            self._event_ch.send_nowait(llm.ChatChunk(
+                request_id=request_id,
+                choices=[llm.Choice(
+                    delta=llm.ChoiceDelta(role="assistant", content="".join(tokens[start:start + chunk_size])),
+                    index=0,
+                )],
+            ))
+
+        prompt_tokens = sum(len(str(msg.content or "").split()) for msg in self._chat_ctx.messages)
+        self._event_ch.send_nowait(llm.ChatChunk(
+            request_id=request_id,
+            usage=llm.CompletionUsage(
+                completion_tokens=len(tokens),
+                prompt_tokens=prompt_tokens,
+                total_tokens=prompt_tokens + len(tokens),
+            ),
+        ))
+
+
+class FakeTTS(tts.TTS):
+    """
+    Faux TTS: premier octet après une latence simulée, puis une tonalité dont
+    la durée suit la longueur du texte, produite plus vite que le temps réel
+    """
+
+    def __init__(self, config=None, sample_rate=24000):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=sample_rate,
+            num_channels=1,
+        )
+        self.config = config or FakeProviderConfig.from_env()
+        self._rng = self.config.rng("tts")
+
+    def synthesize(self, text, *, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return _FakeChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class _FakeChunkedStream(tts.ChunkedStream):
+    async def _run(self):
+        config = self._tts.config
+        rng = self._tts._rng
+        request_id = utils.shortuuid()
+        sample_rate = self._tts.sample_rate
+
+        await asyncio.sleep(config.tts_ttfb.sample(rng))
+        _maybe_fail(rng, config.tts_failure_rate, "tts")
+
+        total_samples = int(len(self._input_text) / config.tts_chars_per_s * sample_rate)
+        chunk_samples = int(sample_rate * config.tts_chunk_ms / 1000)
+        chunk_delay = config.tts_chunk_ms / 1000 / config.tts_realtime_factor if config.tts_realtime_factor > 0 else 0.0
+        phase = 0
+        started = time.perf_counter()
+        for index, start in enumerate(range(0, total_samples, chunk_samples)):
+            # Rythme de production: realtime_factor fois plus vite que la lecture
+            wait = started + index * chunk_delay - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            count = min(chunk_samples, total_samples - start)
+            t = (np.arange(count) + phase) / sample_rate
+            pcm = (np.sin(2 * math.pi * 220 * t) * 8000).astype(np.int16)
+            phase += count
+            self._event_ch.send_nowait(tts.SynthesizedAudio(
+                request_id=request_id,
+                frame=rtc.AudioFrame(
+                    data=pcm.tobytes(),
+                    sample_rate=sample_rate,
+                    num_channels=1,
+                    samples_per_channel=count,
+                ),
+            ))
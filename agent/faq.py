@@ -0,0 +1,203 @@
+import collections
+import json
+import logging
+import math
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Formule de politesse retirée avant découpage ("s'il" n'est pas le pronom "il")
+_POLITENESS_RE = re.compile(r"\bs\W*il\W+vous\W+plait\b")
+
+# Mots trop fréquents pour discriminer les questions. Les pronoms sujets et le verbe
+# être sont conservés: ils distinguent "quelle heure est-il" de "à quelle heure êtes-vous ouverts"
+FRENCH_STOPWORDS = frozenset(
+    "a au aux avec ce ces cette c d de des du en et j l la le les leur "
+    "lui m ma mais me mes moi mon n ne nos notre ou par pas pour qu que qui s sa se ses "
+    "si son sur t ta te tes toi ton un une vos votre y bonjour merci svp plait".split()
+)
+
+
+def tokenize(text):
+    """
+    Découpe un texte en termes normalisés (minuscules, sans accents ni mots vides)
+
+    Args:
+        text: Texte à découper
+
+    Returns:
+        list: Termes retenus
+    """
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = _POLITENESS_RE.sub(" ", text)
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if token in FRENCH_STOPWORDS:
+            continue
+        # Racinisation minimale: pluriels en -s/-x
+        if len(token) > 3 and token[-1] in "sx":
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class FaqIndex:
+    """
+    Index TF-IDF creux des questions fréquentes, construit une fois par processus
+
+    Chaque entrée comporte plusieurs formulations de la question et une réponse
+    figée; une requête est comparée à toutes les formulations par similarité
+    cosinus via un index inversé. Les termes de la requête absents de la FAQ
+    comptent dans sa norme avec le poids du terme le plus rare: une question
+    hors sujet qui partage quelques mots avec la FAQ obtient un score faible.
+    """
+
+    def __init__(self, entries):
+        """
+        Initialisation de l'index
+
+        Args:
+            entries: Liste de dicts {"id", "questions": [...], "answer"}
+        """
+        self.entries = entries
+        documents = []
+        for entry_idx, entry in enumerate(entries):
+            for question in entry["questions"]:
+                documents.append((entry_idx, collections.Counter(tokenize(question))))
+
+        document_frequency = collections.Counter()
+        for _, terms in documents:
+            document_frequency.update(terms.keys())
+        count = len(documents)
+        self._idf = {
+            term: math.log((1 + count) / (1 + df)) + 1.0
+            for term, df in document_frequency.items()
+        }
+        # Poids d'un terme inconnu: celui du terme le plus rare de la FAQ
+        self._unknown_idf = max(self._idf.values(), default=1.0)
+
+        # Vocabulaire de chaque entrée (toutes formulations confondues)
+        self._vocabulary = [set() for _ in entries]
+        for entry_idx, terms in documents:
+            self._vocabulary[entry_idx].update(terms)
+
+        # Index inversé: terme -> [(formulation, poids normalisé)]
+        self._document_entries = [entry_idx for entry_idx, _ in documents]
+        self._postings = collections.defaultdict(list)
+        for doc_idx, (_, terms) in enumerate(documents):
+            for term, weight in self._weigh(terms).items():
+                self._postings[term].append((doc_idx, weight))
+
+    @classmethod
+    def load(cls, path):
+        """Charge l'index depuis un fichier JSON (liste d'entrées)"""
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        logger.info(f"{len(entries)} entrées FAQ chargées depuis {path}")
+        return cls(entries)
+
+    def _weigh(self, terms):
+        vector = {term: tf * self._idf.get(term, self._unknown_idf) for term, tf in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return {}
+        return {term: weight / norm for term, weight in vector.items()}
+
+    def search(self, text):
+        """
+        Cherche l'entrée la plus proche d'un texte
+
+        Args:
+            text: Transcription de l'appelant
+
+        Returns:
+            tuple: (entrée ou None, score cosinus entre 0 et 1,
+                part des termes de la requête présents dans l'entrée)
+        """
+        terms = collections.Counter(tokenize(text))
+        query = self._weigh(terms)
+        scores = collections.defaultdict(float)
+        for term, weight in query.items():
+            for doc_idx, doc_weight in self._postings.get(term, ()):
+                scores[doc_idx] += weight * doc_weight
+
+        if not scores:
+            return None, 0.0, 0.0
+        best_doc = max(scores, key=scores.get)
+        entry_idx = self._document_entries[best_doc]
+        coverage = sum(1 for term in terms if term in self._vocabulary[entry_idx]) / len(terms)
+        return self.entries[entry_idx], scores[best_doc], coverage
+
+
+class FaqFastPath:
+    """
+    Étape optionnelle avant le LLM: répond directement aux questions fréquentes
+
+    Le seuil de confiance et le taux de réponse sont exposés par `stats()`.
+    """
+
+    def __init__(self, index, threshold=0.6, min_coverage=0.8):
+        """
+        Initialisation de l'étape FAQ
+
+        Args:
+            index: FaqIndex chargé au préchauffage
+            threshold: Score cosinus minimal pour répondre sans le LLM
+            min_coverage: Part minimale des termes de la question présents dans l'entrée
+        """
+        self.index = index
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self._counters = collections.Counter()
+        self._scores = collections.deque(maxlen=512)
+
+    def match(self, text):
+        """
+        Retourne la réponse figée si la question est reconnue avec confiance
+
+        Args:
+            text: Transcription finale de l'appelant
+
+        Returns:
+            str ou None: Réponse à prononcer, None pour passer au LLM
+        """
+        entry, score, coverage = self.index.search(text)
+        self._counters["queries"] += 1
+        self._scores.append(score)
+
+        if entry is None or score < self.threshold:
+            logger.debug(f"FAQ: pas de correspondance (score {score:.2f} < {self.threshold})")
+            return None
+        # Question qui ne fait qu'effleurer l'entrée: "créer un ticket" n'est pas "suivre mon ticket"
+        if coverage < self.min_coverage:
+            self._counters["low_coverage"] += 1
+            logger.debug(f"FAQ: '{entry.get('id')}' écartée (couverture {coverage:.2f} < {self.min_coverage})")
+            return None
+
+        self._counters["hits"] += 1
+        self._counters[f"hits.{entry.get('id', '?')}"] += 1
+        logger.info(f"FAQ: réponse directe '{entry.get('id')}' (score {score:.2f})")
+        return entry["answer"]
+
+    def stats(self):
+        """Compteurs de l'étape FAQ (taux de réponse, distribution des scores)"""
+        queries = self._counters["queries"]
+        scores = sorted(self._scores)
+        return {
+            "threshold": self.threshold,
+            "min_coverage": self.min_coverage,
+            "queries": queries,
+            "hits": self._counters["hits"],
+            "low_coverage": self._counters["low_coverage"],
+            "hit_rate": round(self._counters["hits"] / queries, 3) if queries else 0.0,
+            "score_p50": round(scores[len(scores) // 2], 3) if scores else None,
+            "by_entry": {
+                key.split(".", 1)[1]: value
+                for key, value in self._counters.items()
+                if key.startswith("hits.")
+            },
+        }
@@ -1,13 +1,86 @@
 import asyncio
 import logging
+import time
 from livekit import rtc
 from livekit.api import RoomParticipantIdentity
 
 logger = logging.getLogger(__name__)
 
+# Valeurs de l'attribut sip.callStatus regroupées par état du cycle de vie
+RINGING_STATUSES = {"dialing", "ringing"}
+ACTIVE_STATUSES = {"active", "automation"}
+HANGUP_STATUSES = {"hangup"}
+
+
+def call_state_from_attributes(attributes):
+    """
+    État du cycle de vie d'un appel d'après les attributs SIP du participant
+    
+    Returns:
+        str: "ringing", "active" ou "hangup" (un participant sans statut est déjà en ligne)
+    """
+    status = attributes.get("sip.callStatus")
+    if status in HANGUP_STATUSES:
+        return "hangup"
+    if status in RINGING_STATUSES:
+        return "ringing"
+    return "active"
+
+
+class CallLifecycle:
+    """
+    Cycle de vie d'un appel SIP: états successifs et instants de transition
+    """
+    
+    __slots__ = ("identity", "caller_number", "called_number", "state", "transitions")
+    
+    def __init__(self, participant):
+        self.identity = participant.identity
+        self.caller_number = participant.attributes.get("sip.from", "Inconnu")
+        self.called_number = participant.attributes.get("sip.to", "Inconnu")
+        self.state = None
+        self.transitions = []
+    
+    def transition(self, state):
+        """
+        Passe dans un nouvel état (l'état hangup est définitif)
+        
+        Returns:
+            bool: True si l'état a changé
+        """
+        if state == self.state or self.state == "hangup":
+            return False
+        self.state = state
+        self.transitions.append((state, time.time()))
+        return True
+    
+    @property
+    def timestamps(self):
+        """Instant (epoch) de la première entrée dans chaque état"""
+        result = {}
+        for state, timestamp in self.transitions:
+            result.setdefault(state, timestamp)
+        return result
+    
+    def durations(self):
+        """Durées de sonnerie et de conversation (s), si les états ont été traversés"""
+        timestamps = self.timestamps
+        result = {}
+        if "ringing" in timestamps and "active" in timestamps:
+            result["ringing_s"] = round(timestamps["active"] - timestamps["ringing"], 3)
+        if "active" in timestamps and "hangup" in timestamps:
+            result["active_s"] = round(timestamps["hangup"] - timestamps["active"], 3)
+        return result
+
+
 class InboundCallHandler:
     """
     Classe gérant les appels entrants via SIP
+    
+    Le cycle de vie de chaque appel (sonnerie, en ligne, raccroché) suit les
+    événements de la room (attributs SIP, déconnexion), sans polling. Les
+    appels terminés sont retirés des registres et les tâches du gestionnaire
+    sont annulées à la fin de l'appel ou par `aclose`.
     """
     
     def __init__(self, api, room):
@@ -20,20 +93,133 @@ class InboundCallHandler:
         """
         self.api = api
         self.room = room
+        # Participants présents et appels SIP en cours, par identité
         self.participants = {}
+        self.calls = {}
+        self.completed_calls = 0
+        # Appels terminés: leurs attributs peuvent encore changer, ils ne sont plus suivis
+        self._finished = set()
+        # Futures résolues par les événements de la room (pas de polling)
+        self._sip_participant_waiters = []
+        self._disconnect_waiters = {}
+        # Tâches en cours, par identité d'appel (None: tâches du gestionnaire)
+        self._tasks = {}
+        self._listeners = []
         self.setup_room_listeners()
     
     def setup_room_listeners(self):
         """Configure les écouteurs d'événements de la room"""
-        @self.room.on("participant_connected")
-        def on_participant_connected(participant, *_):
-            logger.info(f"Participant connecté: {participant.identity}")
-            # Enregistrer le participant
-            self.participants[participant.identity] = participant
-            # Vérifier si c'est un participant SIP
+        self._listeners = [
+            ("participant_connected", self._on_participant_connected),
+            ("participant_attributes_changed", self._on_participant_attributes_changed),
+            ("participant_disconnected", self._on_participant_disconnected),
+            ("disconnected", self._on_room_disconnected),
+        ]
+        for event, callback in self._listeners:
+            self.room.on(event, callback)
+    
+    def _on_participant_connected(self, participant, *_):
+        logger.info(f"Participant connecté: {participant.identity}")
+        # Enregistrer le participant
+        self.participants[participant.identity] = participant
+        # Vérifier si c'est un participant SIP
+        if self.is_sip_participant(participant):
+            logger.info(f"Participant SIP détecté: {participant.identity}")
+            self.handle_sip_participant(participant)
+    
+    def _on_participant_attributes_changed(self, changed_attributes, participant):
+        if not self.is_sip_participant(participant) or participant.identity in self._finished:
+            return
+        # Les attributs SIP peuvent arriver après la connexion du participant
+        if participant.identity not in self.calls:
+            self.handle_sip_participant(participant)
+        else:
+            self._update_call_state(participant)
+    
+    def _on_participant_disconnected(self, participant, *_):
+        logger.info(f"Participant déconnecté: {participant.identity}")
+        self.participants.pop(participant.identity, None)
+        call = self.calls.get(participant.identity)
+        if call is not None:
+            call.transition("hangup")
+            self._finish_call(call)
+        self._resolve_disconnect_waiters(participant.identity, participant)
+    
+    def _on_room_disconnected(self, *_):
+        # La room est fermée: plus aucun participant ne reviendra
+        for call in list(self.calls.values()):
+            call.transition("hangup")
+            self._finish_call(call)
+        for identity in list(self._disconnect_waiters):
+            self._resolve_disconnect_waiters(identity, None)
+        self.participants.clear()
+    
+    def _resolve_sip_participant_waiters(self, participant):
+        """Réveille les coroutines en attente d'un participant SIP"""
+        waiters, self._sip_participant_waiters = self._sip_participant_waiters, []
+        for future in waiters:
+            if not future.done():
+                future.set_result(participant)
+    
+    def _resolve_disconnect_waiters(self, identity, result):
+        for future in self._disconnect_waiters.pop(identity, []):
+            if not future.done():
+                future.set_result(result)
+    
+    def find_sip_participant(self):
+        """
+        Cherche un participant SIP parmi les participants déjà présents
+        
+        Returns:
+            Le premier participant SIP trouvé, ou None
+        """
+        for participant in self.room.remote_participants.values():
             if self.is_sip_participant(participant):
-                logger.info(f"Participant SIP détecté: {participant.identity}")
-                self.handle_sip_participant(participant)
+                return participant
+        return None
+    
+    async def wait_for_sip_participant(self, timeout=30):
+        """
+        Attend qu'un participant SIP rejoigne la room
+        
+        Args:
+            timeout: Délai maximal d'attente en secondes
+            
+        Returns:
+            Le participant SIP, ou None si le délai est dépassé
+        """
+        participant = self.find_sip_participant()
+        if participant:
+            # Arrivé avant l'abonnement aux événements de la room: l'appel est
+            # enregistré ici pour que son suivi et ses tâches soient gérés
+            self.handle_sip_participant(participant)
+            return participant
+        
+        future = asyncio.get_running_loop().create_future()
+        self._sip_participant_waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if future in self._sip_participant_waiters:
+                self._sip_participant_waiters.remove(future)
+    
+    async def wait_for_disconnect(self, participant):
+        """
+        Attend la fin de l'appel: raccroché (sip.callStatus) ou participant parti de la room
+        
+        Args:
+            participant: Participant à surveiller
+        """
+        if participant.identity not in self.room.remote_participants:
+            return
+        if participant.identity in self._finished:
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        self._disconnect_waiters.setdefault(participant.identity, []).append(future)
+        await future
     
     def is_sip_participant(self, participant):
         """
@@ -46,7 +232,7 @@ class InboundCallHandler:
             bool: True si le participant est un appelant SIP
         """
         # On peut identifier les participants SIP par leurs attributs
-        return "sip.callStatus" in participant.attributes or "sip.from" in participant.attributes
+        return any(key.startswith("sip.") for key in participant.attributes)
     
     def handle_sip_participant(self, participant):
         """
@@ -55,56 +241,107 @@ class InboundCallHandler:
         Args:
             participant: Participant SIP à gérer
         """
+        if participant.identity in self._finished:
+            return
         logger.info(f"Traitement de l'appelant SIP: {participant.identity}")
-        # Démarrer la surveillance de l'état de l'appel
-        asyncio.create_task(self.monitor_call_status(participant))
+        call = self.calls.get(participant.identity)
+        if call is None:
+            call = self.calls[participant.identity] = CallLifecycle(participant)
+            logger.info(
+                f"Appel entrant de {call.caller_number} vers {call.called_number}",
+                extra={"room": self.room.name, "caller": call.caller_number, "called": call.called_number},
+            )
+            # Détail des attributs disponibles, en une seule ligne
+            logger.debug(f"Attributs du participant SIP: {dict(participant.attributes)}")
+        self._update_call_state(participant)
+        self._resolve_sip_participant_waiters(participant)
     
-    async def monitor_call_status(self, participant, check_interval=0.5):
+    def _update_call_state(self, participant):
+        """Applique l'état indiqué par sip.callStatus au cycle de vie de l'appel"""
+        call = self.calls[participant.identity]
+        state = call_state_from_attributes(participant.attributes)
+        if not call.transition(state):
+            return
+        logger.info(f"Appel {participant.identity}: {state}", extra={"room": self.room.name, "call_state": state})
+        if state == "hangup":
+            logger.info(f"L'appel avec {participant.identity} a été raccroché")
+            self._finish_call(call)
+            self._resolve_disconnect_waiters(participant.identity, participant)
+    
+    def _finish_call(self, call):
+        """Retire un appel terminé des registres et annule ses tâches"""
+        if self.calls.pop(call.identity, None) is None:
+            return
+        self._finished.add(call.identity)
+        self.completed_calls += 1
+        for task in self._tasks.pop(call.identity, set()):
+            task.cancel()
+        logger.info(
+            f"Fin de l'appel {call.identity}: {call.durations()}",
+            extra={
+                "room": self.room.name,
+                "caller": call.caller_number,
+                "transitions": {state: round(timestamp, 3) for state, timestamp in call.timestamps.items()},
+            },
+        )
+    
+    def create_task(self, coro, identity=None):
         """
-        Surveille l'état d'un appel entrant
+        Lance une tâche détenue par le gestionnaire
         
         Args:
-            participant: Participant SIP à surveiller
-            check_interval: Intervalle entre les vérifications en secondes
-        """
-        try:
-            logger.info(f"Début de la surveillance de l'appel pour {participant.identity}")
+            coro: Coroutine à exécuter
+            identity: Appel auquel la tâche est rattachée (annulée à la fin de l'appel)
             
-            # Obtenir et journaliser les métadonnées de l'appel
-            caller_number = participant.attributes.get("sip.from", "Inconnu")
-            called_number = participant.attributes.get("sip.to", "Inconnu")
-            
-            logger.info(f"Détails de l'appel entrant:")
-            logger.info(f"  De: {caller_number}")
-            logger.info(f"  Vers: {called_number}")
-            
-            # Journaliser tous les attributs disponibles
-            logger.info("Attributs du participant SIP:")
-            for key, value in participant.attributes.items():
-                logger.info(f"  {key}: {value}")
-            
-            # Surveiller l'état de l'appel
-            while True:
-                # Vérifier si le participant est toujours connecté
-                if participant.identity not in self.room.remote_participants:
-                    logger.info(f"Le participant {participant.identity} a quitté la room")
-                    return
-                
-                # Récupérer le participant à jour
-                participant = self.room.remote_participants.get(participant.identity)
-                
-                # Vérifier l'état de l'appel
-                call_status = participant.attributes.get("sip.callStatus")
-                
-                if call_status == "hangup":
-                    logger.info(f"L'appel avec {participant.identity} a été raccroché")
-                    return
-                
-                await asyncio.sleep(check_interval)
+        Returns:
+            asyncio.Task
+        """
+        task = asyncio.create_task(coro)
+        tasks = self._tasks.setdefault(identity, set())
+        tasks.add(task)
         
-        except Exception as e:
-            logger.error(f"Erreur lors de la surveillance de l'appel: {e}")
-            logger.exception("Détails de l'erreur:")
+        def _discard(done):
+            tasks.discard(done)
+            if not tasks and self._tasks.get(identity) is tasks:
+                del self._tasks[identity]
+        
+        task.add_done_callback(_discard)
+        return task
+    
+    def request_end_call(self, participant):
+        """Termine un appel depuis un contexte synchrone (tâche rattachée au gestionnaire)"""
+        return self.create_task(self.end_call(participant))
+    
+    def stats(self):
+        """Appels en cours par état, appels terminés et tâches en cours"""
+        states = {}
+        for call in self.calls.values():
+            states[call.state] = states.get(call.state, 0) + 1
+        return {
+            "active_calls": states,
+            "completed_calls": self.completed_calls,
+            "participants": len(self.participants),
+            "tasks": sum(len(tasks) for tasks in self._tasks.values()),
+        }
+    
+    async def aclose(self):
+        """Retire les écouteurs de la room, annule les tâches et libère les attentes"""
+        for event, callback in self._listeners:
+            self.room.off(event, callback)
+        self._listeners = []
+        tasks = [task for group in self._tasks.values() for task in group]
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in self._sip_participant_waiters:
+            if not future.done():
+                future.set_result(None)
+        self._sip_participant_waiters = []
+        for identity in list(self._disconnect_waiters):
+            self._resolve_disconnect_waiters(identity, None)
+        self.calls.clear()
+        self.participants.clear()
     
     async def end_call(self, participant):
         """
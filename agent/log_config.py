@@ -0,0 +1,294 @@
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+
+# Attributs standard d'un LogRecord, exclus des champs supplémentaires du JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_state = {}
+_state_lock = threading.Lock()
+
+
+def parse_mapping(spec):
+    """
+    Convertit une liste "nom=valeur,nom=valeur" en dictionnaire
+
+    Returns:
+        dict: Valeurs (chaînes) par nom
+    """
+    mapping = {}
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = part.partition("=")
+        if value:
+            mapping[name.strip()] = value.strip()
+    return mapping
+
+
+class JsonFormatter(logging.Formatter):
+    """Formate chaque enregistrement en une ligne JSON"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        # Champs passés via extra={...}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler dont les fichiers archivés sont compressés en gzip"""
+
+    def __init__(self, filename, max_bytes, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source, dest):
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne conserve qu'une fraction des enregistrements bavards de certains loggers
+
+    Les avertissements et erreurs sont toujours conservés; pour les niveaux
+    inférieurs, un enregistrement sur round(1 / taux) est gardé par logger.
+    """
+
+    def __init__(self, rates):
+        """
+        Args:
+            rates: Taux de conservation (0-1) par préfixe de nom de logger
+        """
+        super().__init__()
+        self.rates = rates
+        self._counters = {}
+
+    def _rate(self, name):
+        # Le préfixe le plus long correspondant au logger s'applique
+        best = None
+        for prefix in self.rates:
+            if (name == prefix or name.startswith(prefix + ".")) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.rates[best] if best is not None else 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        return count % max(1, round(1 / rate)) == 0
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler qui abandonne les enregistrements quand la file est pleine
+
+    Un disque lent ne doit jamais bloquer la boucle d'événements ou les
+    threads de requêtes: au pire des lignes de journal sont perdues, et leur
+    nombre est signalé dès que la file se libère.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Le message est calculé ici (les arguments peuvent être modifiés ensuite),
+        # mais l'exception est conservée pour le formatage JSON dans le thread d'écriture
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"{dropped} enregistrements de journal perdus (file d'écriture pleine)",
+            })
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+
+def _log_path(filename):
+    return os.path.join(os.environ.get("LOG_DIR", "."), filename)
+
+
+def _is_job_process():
+    # Processus de jobs et d'inférence LiveKit, démarrés par "spawn" depuis le worker.
+    # Le nom est déjà positionné pendant la réimportation du module principal
+    # (parent_process() ne l'est qu'ensuite)
+    return multiprocessing.current_process().name != "MainProcess"
+
+
+def _build_handlers(filename):
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    file_handler = CompressingRotatingFileHandler(
+        _log_path(filename),
+        max_bytes=int(float(os.environ.get("LOG_MAX_MB", "50")) * 1024 * 1024),
+        backup_count=int(os.environ.get("LOG_BACKUP_COUNT", "5")),
+    )
+    file_handler.setFormatter(JsonFormatter())
+    return [console, file_handler]
+
+
+def _start(filename):
+    log_queue = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "10000")))
+    listener = logging.handlers.QueueListener(log_queue, *_build_handlers(filename), respect_handler_level=False)
+    listener.start()
+    return log_queue, listener
+
+
+def _stop():
+    listener = _state.get("listener")
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _apply_levels(root):
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for name, level in parse_mapping(os.environ.get("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+
+def setup_logging(filename):
+    """
+    Configure le logging du processus: file d'attente et thread d'écriture dédié
+
+    Les enregistrements passent par une file bornée vers un thread qui écrit
+    la console (texte) et un fichier JSON lines avec rotation par taille et
+    compression gzip des archives. Variables d'environnement:
+        LOG_LEVEL: Niveau racine (défaut INFO)
+        LOG_LEVELS: Niveaux par module, ex: "livekit=WARNING,inbound_handler=DEBUG"
+        LOG_SAMPLE_RATES: Fraction conservée des messages < WARNING, ex: "livekit.agents=0.1"
+        LOG_DIR, LOG_MAX_MB, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE: Fichiers et file d'attente
+
+    Dans un processus de jobs LiveKit, seuls les niveaux sont appliqués: LiveKit
+    ajoute son propre handler qui transmet les enregistrements au worker, où ils
+    sont filtrés, échantillonnés et écrits une seule fois dans le fichier du worker.
+
+    Args:
+        filename: Nom du fichier de journal (ex: agent.log)
+
+    Returns:
+        logging.handlers.QueueListener: Thread d'écriture (arrêté automatiquement
+        à la sortie), None dans un processus de jobs
+    """
+    with _state_lock:
+        if "handler" in _state:
+            return _state["listener"]
+
+        if _is_job_process():
+            _apply_levels(logging.getLogger())
+            _state["handler"] = None
+            _state["listener"] = None
+            return None
+
+        log_queue, listener = _start(filename)
+
+        handler = DroppingQueueHandler(log_queue)
+        sample_rates = {name: float(rate) for name, rate in parse_mapping(os.environ.get("LOG_SAMPLE_RATES", "")).items()}
+        if sample_rates:
+            handler.addFilter(SamplingFilter(sample_rates))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        _apply_levels(root)
+
+        _state["handler"] = handler
+        _state["listener"] = listener
+        atexit.register(_stop)
+        return listener
+
+
+def keep_logging(cli_setup_logging):
+    """
+    Enveloppe le setup_logging du CLI LiveKit pour conserver cette configuration
+
+    `cli.run_app` appelle son propre setup_logging au démarrage du worker: il
+    ajoute un StreamHandler synchrone à la racine (lignes de console en double,
+    écriture bloquante) et impose son --log-level à la racine et aux loggers de
+    LiveKit. Après son appel, seuls le handler de file d'attente et les niveaux
+    LOG_LEVEL / LOG_LEVELS sont rétablis.
+
+    Args:
+        cli_setup_logging: livekit.agents.cli.cli.setup_logging
+
+    Returns:
+        Fonction de même signature à lui substituer
+    """
+    def setup(log_level, devmode):
+        loggers = logging.Logger.manager.loggerDict
+        before = {name: logger.level for name, logger in list(loggers.items()) if isinstance(logger, logging.Logger)}
+        cli_setup_logging(log_level, devmode)
+
+        with _state_lock:
+            handler = _state.get("handler")
+            if handler is None:
+                return
+            root = logging.getLogger()
+            for existing in list(root.handlers):
+                if existing is not handler:
+                    root.removeHandler(existing)
+            if handler not in root.handlers:
+                root.addHandler(handler)
+            # Loggers que le CLI a passés de NOTSET à son niveau: ils héritent de nouveau de la racine
+            cli_level = logging.getLevelName(log_level.upper()) if isinstance(log_level, str) else log_level
+            for name, level in before.items():
+                logger = loggers.get(name)
+                if level == logging.NOTSET and isinstance(logger, logging.Logger) and logger.level == cli_level:
+                    logger.setLevel(logging.NOTSET)
+            _apply_levels(root)
+
+    return setup
@@ -2,34 +2,88 @@ import asyncio
 import os
 import logging
 import json
-from livekit.agents import JobContext, WorkerOptions, cli
+import time
+from livekit.agents import JobContext, JobExecutorType, WorkerOptions, cli
+from livekit.agents.cli import cli as livekit_cli
 from livekit.agents.llm import ChatContext, ChatMessage
 from livekit.agents.pipeline import VoicePipelineAgent
 from livekit.agents import AutoSubscribe
-from livekit.plugins import deepgram, silero, openai, cartesia
 from dotenv import load_dotenv
 
 from call_actions import CallActions
+from call_journal import process_journal
+from call_metrics import CallLatencyRecorder, SetupTimer, process_latency_stats
+from call_store import process_store
+from caller_profile import process_profiles
+from context_budget import ContextCompactor
+from faq import FaqFastPath, FaqIndex
+from speculative_llm import InterimTapSTT, SpeculativeGenerator
+from vad_model import endpointing_settings_from_env, inference_stats, load_vad
+from worker_load import WorkerLoadMonitor
 from inbound_handler import InboundCallHandler
-
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('agent.log')
-    ]
-)
-logger = logging.getLogger(__name__)
+from log_config import keep_logging, setup_logging
+from pipeline_warmup import PipelineWarmer
+from tts_cache import CachedTTS, process_phrase_cache
+from text_chunker import ClauseStreamingTTS
+from turn_detector import LexicalTurnDetector
 
 # Chargement des variables d'environnement
 load_dotenv()
 
+# Configuration du logging (file d'attente et thread d'écriture, voir log_config.py)
+setup_logging('agent.log')
+# Le CLI de LiveKit reconfigure le logging au démarrage du worker: configuration rétablie ensuite
+livekit_cli.setup_logging = keep_logging(livekit_cli.setup_logging)
+logger = logging.getLogger(__name__)
+
+# Message de bienvenue (identique pour tous les appels, donc mis en cache)
+WELCOME_MESSAGE = (
+    "Bonjour, merci d'avoir appelé. Je suis l'assistant IA de l'entreprise. "
+    "Comment puis-je vous aider aujourd'hui?"
+)
+
+# Charge du worker (CPU des processus, retard de la boucle, appels actifs)
+load_monitor = WorkerLoadMonitor.from_env()
+
 def prewarm(proc):
     """Fonction de préchauffage pour charger les modèles IA à l'avance"""
+    warmer = PipelineWarmer.from_env()
+    
     # Préchargement du modèle VAD
-    proc.userdata["vad"] = silero.VAD.load()
+    start = time.perf_counter()
+    proc.userdata["vad"] = load_vad()
+    warmer.timings["vad"] = round((time.perf_counter() - start) * 1000, 1)
+    
+    # Cache audio des phrases (LRU en mémoire, partagé sur disque si TTS_CACHE_DIR est défini)
+    proc.userdata["phrase_cache"] = process_phrase_cache(WELCOME_MESSAGE)
+    
+    # Préchauffage des clients STT/LLM/TTS (connexions ouvertes au début du job, voir entrypoint)
+    proc.userdata["warmer"] = warmer
+    
+    # Histogrammes de latence agrégés sur les appels du processus
+    proc.userdata["latency_stats"] = process_latency_stats()
+    
+    # Descriptions des fonctions d'appel construites une fois pour tous les appels du processus
+    CallActions.prepare_functions()
+    
+    # Journal des appels (transcriptions, actions, cycle de vie), si configuré; un seul par processus
+    proc.userdata["journal"] = process_journal()
+    
+    # Informations clients et tickets (SQLite partagé, écriture en arrière-plan),
+    # un seul stockage par processus même si prewarm est appelé pour chaque job
+    proc.userdata["call_store"] = process_store()
+    
+    # Profils des appelants connus (cache TTL en mémoire devant le stockage), un seul par processus
+    proc.userdata["caller_profiles"] = process_profiles(proc.userdata["call_store"])
+    
+    # Index des questions fréquentes (réponses sans appel au LLM), si configuré
+    faq_file = os.environ.get("FAQ_FILE")
+    if faq_file:
+        proc.userdata["faq"] = FaqFastPath(
+            FaqIndex.load(faq_file),
+            threshold=float(os.environ.get("FAQ_THRESHOLD", "0.6")),
+            min_coverage=float(os.environ.get("FAQ_MIN_COVERAGE", "0.8")),
+        )
 
 async def entrypoint(ctx: JobContext):
     """Point d'entrée principal de l'agent pour les appels entrants"""
@@ -40,7 +94,7 @@ async def entrypoint(ctx: JobContext):
     # Initialisation du contexte de conversation
     initial_ctx = ChatContext().append(
         role="system",
-        content=(
+        text=(
             "Vous êtes un assistant téléphonique professionnel pour une entreprise. "
             "Vous parlez de manière naturelle et concise. "
             "Vous êtes poli et serviable. "
@@ -51,90 +105,227 @@ async def entrypoint(ctx: JobContext):
             "proposez de transférer l'appel à un agent humain."
         ),
     )
+    call_trace = None
+    inbound_handler = None
+    # Chronologie de la mise en place (connexion, attente de l'appelant, pipeline, premier audio)
+    setup_timer = SetupTimer()
 
     try:
-        # Connexion à la room LiveKit
-        await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+        # Connexion à la room lancée en premier: la mise en place du pipeline, qui ne
+        # dépend pas de l'appelant, se fait pendant l'aller-retour réseau
+        async def connect():
+            with setup_timer.phase("connect"):
+                await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
         
-        # Initialisation du gestionnaire d'appels entrants
-        inbound_handler = InboundCallHandler(ctx.api, ctx.room)
+        connect_task = asyncio.create_task(connect())
+        # Laisse partir la requête de connexion avant la construction du pipeline
+        await asyncio.sleep(0)
         
-        # Attendre qu'un participant SIP rejoigne
-        logger.info("En attente d'un participant SIP entrant...")
-        
-        # Fonction pour trouver un participant SIP parmi les participants existants
-        def find_sip_participant():
-            for participant in ctx.room.remote_participants.values():
-                if "sip." in str(participant.attributes):
-                    return participant
-            return None
+        with setup_timer.phase("prepare"):
+            # Ouverture des connexions aux fournisseurs pendant la connexion à la room
+            warmer = ctx.proc.userdata["warmer"]
+            warmer.warm()
+            # Sessions HTTP de la boucle du job fermées à son arrêt (mode "thread")
+            ctx.add_shutdown_callback(lambda: warmer.aclose())
+            
+            # Initialisation du gestionnaire d'appels entrants
+            inbound_handler = InboundCallHandler(ctx.api, ctx.room)
+            
+            # Actions d'appel construites avant l'arrivée de l'appelant, rattaché ensuite
+            call_actions = CallActions(
+                api=ctx.api,
+                participant=None,
+                room=ctx.room,
+                store=ctx.proc.userdata.get("call_store"),
+            )
         
-        # Vérifier s'il y a déjà un participant SIP dans la room
-        sip_participant = find_sip_participant()
+        faq = ctx.proc.userdata.get("faq")
         
-        if not sip_participant:
-            # Attendre un maximum de 30 secondes pour qu'un participant SIP rejoigne
-            timeout = 30
-            start_time = asyncio.get_event_loop().time()
+        with setup_timer.phase("pipeline"):
+            llm = warmer.llm()
+            
+            # Budget de tokens du contexte envoyé au LLM (résumé glissant des anciens tours).
+            # Instance dédiée: ses métriques ne se mêlent pas à celles des réponses de l'agent
+            compactor = ContextCompactor(
+                warmer.llm(),
+                token_budget=int(os.environ.get("CHAT_CTX_TOKEN_BUDGET", "3000")),
+                keep_turns=int(os.environ.get("CHAT_CTX_KEEP_TURNS", "6")),
+            )
+            
+            # Génération spéculative sur les transcriptions intermédiaires (optionnelle)
+            stt = warmer.stt()
+            speculator = None
+            if os.environ.get("SPECULATIVE_LLM", "0") == "1":
+                speculator = SpeculativeGenerator(
+                    warmer.llm(),
+                    prepare_ctx=lambda spec_ctx: compactor.compact(spec_ctx, record=False),
+                    stable_interims=int(os.environ.get("SPECULATIVE_STABLE_INTERIMS", "2")),
+                    min_words=int(os.environ.get("SPECULATIVE_MIN_WORDS", "3")),
+                    similarity=float(os.environ.get("SPECULATIVE_SIMILARITY", "0.9")),
+                )
+                stt = InterimTapSTT(stt, speculator.on_stt_event)
+            
+            async def before_llm(agent, chat_ctx):
+                """Répond directement aux questions fréquentes, sinon prépare le contexte du LLM"""
+                question = chat_ctx.messages[-1].content
+                if faq is not None and isinstance(question, str):
+                    answer = faq.match(question)
+                    if answer is not None:
+                        if speculator is not None:
+                            speculator.discard()
+                        # La réponse LLM est annulée: on consigne la question et on lit la réponse figée
+                        agent.chat_ctx.append(role="user", text=question)
+                        await agent.say(answer, allow_interruptions=True, add_to_chat_ctx=True)
+                        return False
+                
+                latency_recorder.count("context_tokens_saved", compactor.compact(chat_ctx))
+                
+                # Réponse déjà en cours de génération si l'hypothèse spéculative est confirmée
+                if speculator is not None:
+                    return speculator.take(chat_ctx)
+                return None
+            
+            # Détection de fin de tour locale (TURN_DETECTOR=1): validation anticipée des phrases complètes
+            turn_detector = LexicalTurnDetector.from_env()
+            endpointing = endpointing_settings_from_env()
+            if turn_detector is not None:
+                endpointing = turn_detector.endpointing_settings(endpointing, language=warmer.stt_language)
             
-            while asyncio.get_event_loop().time() - start_time < timeout:
-                sip_participant = find_sip_participant()
-                if sip_participant:
-                    break
-                await asyncio.sleep(0.5)
+            # TTS avec cache des phrases courantes, alimenté proposition par proposition
+            # (TTS_CHUNKING=1) pour démarrer l'audio dès la première proposition
+            tts = CachedTTS(warmer.tts(), ctx.proc.userdata["phrase_cache"])
+            if os.environ.get("TTS_CHUNKING", "1") == "1":
+                tts = ClauseStreamingTTS(tts)
             
-            if not sip_participant:
-                logger.warning("Aucun participant SIP n'a rejoint après le délai d'attente")
-                ctx.shutdown(reason="Aucun participant SIP")
-                return
+            # Initialisation de l'agent vocal avec les plugins spécifiés
+            # (les plugins réutilisent les sessions HTTP préchauffées du processus)
+            agent = VoicePipelineAgent(
+                vad=ctx.proc.userdata["vad"],
+                stt=stt,                               # Utilisation de Deepgram
+                llm=llm,                               # Utilisation d'OpenAI GPT-4o mini
+                tts=tts,                               # Utilisation de Cartesia
+                fnc_ctx=call_actions,                  # Actions d'appel disponibles pour le LLM
+                chat_ctx=initial_ctx,
+                allow_interruptions=True,
+                before_llm_cb=before_llm,
+                turn_detector=turn_detector,
+                **endpointing,                         # Délais de fin de tour (MIN/MAX_ENDPOINTING_DELAY)
+            )
         
-        logger.info(f"Participant SIP détecté: {sip_participant.identity}")
+        # Connexion à la room LiveKit
+        await connect_task
         
-        # Initialisation des actions d'appel
-        call_actions = CallActions(api=ctx.api, participant=sip_participant, room=ctx.room)
+        # Attendre un maximum de 30 secondes pour qu'un participant SIP rejoigne
+        logger.info("En attente d'un participant SIP entrant...")
+        with setup_timer.phase("sip_wait"):
+            sip_participant = await inbound_handler.wait_for_sip_participant(timeout=30)
         
-        # Initialisation de l'agent vocal avec les plugins spécifiés
-        agent = VoicePipelineAgent(
-            vad=ctx.proc.userdata["vad"],
-            stt=deepgram.STT(model="nova-2-general"),  # Utilisation de Deepgram
-            llm=openai.LLM(
-                model="gpt-4o-mini",               # Utilisation d'OpenAI GPT-4o mini
-                fnc_ctx=call_actions              # Actions d'appel disponibles pour le LLM
-            ),
-            tts=cartesia.TTS(model="sonic-2"),     # Utilisation de Cartesia
-            chat_ctx=initial_ctx,
-            allow_interruptions=True,
-        )
+        if not sip_participant:
+            logger.warning("Aucun participant SIP n'a rejoint après le délai d'attente")
+            await inbound_handler.aclose()
+            ctx.shutdown(reason="Aucun participant SIP")
+            return
+        
+        setup_timer.mark("sip_participant")
+        logger.info(f"Participant SIP détecté: {sip_participant.identity}")
+        
+        with setup_timer.phase("bind"):
+            call_actions.bind_participant(sip_participant)
+            
+            # Profil de l'appelant (informations et tickets ouverts) lu pendant le message
+            # de bienvenue et ajouté au contexte avant sa première question
+            profiles = ctx.proc.userdata.get("caller_profiles")
+            if profiles is not None:
+                inbound_handler.create_task(
+                    profiles.inject(call_actions.caller_number, agent.chat_ctx),
+                    sip_participant.identity,
+                )
+            
+            # Trace de l'appel dans le journal (écrite en tâche de fond, hors du chemin audio)
+            journal = ctx.proc.userdata.get("journal")
+            if journal is not None:
+                call_trace = journal.open_call(ctx.room.name, call_actions.caller_number)
+            
+            # Instrumentation des latences tour par tour
+            latency_recorder = CallLatencyRecorder(
+                room_name=ctx.room.name,
+                caller_number=call_actions.caller_number,
+                process_stats=ctx.proc.userdata["latency_stats"],
+                output_path=os.environ.get("CALL_METRICS_FILE"),
+            )
+            latency_recorder.attach(agent)
+            setup_timer.attach(agent, latency_recorder)
+            if isinstance(tts, ClauseStreamingTTS):
+                latency_recorder.attach_tts(tts)
+            if speculator is not None:
+                speculator.attach(agent)
+            if turn_detector is not None:
+                turn_detector.attach(agent)
+            if call_trace is not None:
+                call_trace.attach(agent)
         
         # Démarrage de l'agent avec le participant SIP
-        agent.start(ctx.room, sip_participant)
+        with setup_timer.phase("start"):
+            agent.start(ctx.room, sip_participant)
+        if call_trace is not None:
+            call_trace.event("agent_started", participant=sip_participant.identity)
         
-        # Message de bienvenue
-        welcome_message = (
-            "Bonjour, merci d'avoir appelé. Je suis l'assistant IA de l'entreprise. "
-            "Comment puis-je vous aider aujourd'hui?"
-        )
-        await agent.say(welcome_message, allow_interruptions=True)
+        # Message de bienvenue (rejoué depuis le cache après la première synthèse)
+        await agent.say(WELCOME_MESSAGE, allow_interruptions=True)
         
         # Attendre que l'appel soit terminé (le participant SIP quitte la room)
-        while sip_participant.identity in ctx.room.remote_participants:
-            await asyncio.sleep(1)
+        await inbound_handler.wait_for_disconnect(sip_participant)
         
         logger.info(f"Le participant SIP {sip_participant.identity} a quitté la room, fin de l'appel")
+        if call_trace is not None:
+            call_trace.close(reason="participant_disconnected")
+            call_trace = None
+        logger.info(f"Cycle de vie des appels: {json.dumps(inbound_handler.stats())}")
+        await inbound_handler.aclose()
+        await compactor.aclose()
+        latency_recorder.write_record()
+        logger.info(f"Statistiques du contexte: {json.dumps(compactor.stats())}")
+        if speculator is not None:
+            await speculator.aclose()
+            logger.info(f"Statistiques de spéculation: {json.dumps(speculator.stats())}")
+        if turn_detector is not None:
+            logger.info(f"Détection de fin de tour: {json.dumps(turn_detector.stats())}")
+        logger.info(f"Inférence VAD du processus: {json.dumps(inference_stats())}")
+        logger.info(f"Statistiques du cache TTS: {json.dumps(ctx.proc.userdata['phrase_cache'].stats())}")
+        logger.info(f"Connexions aux fournisseurs (ouvertes / reprises du pool): {json.dumps(warmer.connection_stats())}")
+        if call_actions.store is not None:
+            logger.info(f"Stockage des appels: {json.dumps(call_actions.store.stats())}")
+        if profiles is not None:
+            # Profil recalculé avec les informations et tickets de l'appel, pour le prochain appel
+            profiles.refresh(call_actions.caller_number)
+            logger.info(f"Profils des appelants: {json.dumps(profiles.stats())}")
+        if faq is not None:
+            logger.info(f"Statistiques FAQ: {json.dumps(faq.stats(), ensure_ascii=False)}")
         
     except Exception as e:
         logger.exception(f"Erreur dans l'entrypoint: {e}")
+        if call_trace is not None:
+            call_trace.close(reason=f"error: {e}")
+        if inbound_handler is not None:
+            # Écouteurs de la room retirés et tâches de l'appel annulées
+            await inbound_handler.aclose()
         ctx.shutdown(reason=f"Erreur: {e}")
 
 async def request_handler(req):
     """
     Gère les requêtes de dispatch d'agent
     - Vérifie si l'agent doit accepter cette requête
-    - Configurable selon des critères spécifiques
+    - Refuse la requête si le worker est trop chargé, pour que le dispatcher
+      la confie à un autre worker
     """
     logger.info(f"Nouvelle requête reçue: {req}")
     
-    # Accepter toutes les requêtes pour cet agent
+    accepted, reason = load_monitor.should_accept()
+    if not accepted:
+        logger.warning(f"Requête refusée, worker trop chargé: {reason}")
+        await req.reject()
+        return
+    
     await req.accept(
         name="Inbound Assistant",
         identity="inbound-agent"
@@ -146,6 +337,15 @@ if __name__ == "__main__":
             entrypoint_fnc=entrypoint,
             request_fnc=request_handler,
             prewarm_fnc=prewarm,
+            # Charge réelle du worker: au-delà du seuil, il ne reçoit plus d'appels
+            load_fnc=load_monitor.get_load,
+            load_threshold=load_monitor.load_threshold,
+            # En mode "thread", plusieurs appels partagent un processus (et le VAD par lots)
+            job_executor_type=(
+                JobExecutorType.THREAD
+                if os.environ.get("AGENT_JOB_EXECUTOR", "process") == "thread"
+                else JobExecutorType.PROCESS
+            ),
             # Nom de l'agent pour le dispatch explicite
             agent_name="inbound-agent",
         )
@@ -0,0 +1,226 @@
+import asyncio
+import collections
+import logging
+import os
+import time
+import weakref
+
+import aiohttp
+import httpx
+import openai as openai_client
+from livekit.plugins import cartesia, deepgram, openai
+
+from fake_plugins import FakeLLM, FakeProviderConfig, FakeSTT, FakeTTS
+
+logger = logging.getLogger(__name__)
+
+# Hôtes contactés par les plugins STT/LLM/TTS
+PROVIDER_HOSTS = {
+    "deepgram": "api.deepgram.com",
+    "openai": "api.openai.com",
+    "cartesia": "api.cartesia.ai",
+}
+
+
+class _LoopClients:
+    """
+    Clients HTTP rattachés à une boucle d'événements
+
+    Compte, par hôte, les connexions ouvertes et celles reprises du pool: une
+    requête d'un plugin qui reprend la connexion du préchauffage n'en ouvre pas.
+    """
+
+    def __init__(self):
+        self.connections = collections.defaultdict(collections.Counter)
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_aiohttp_request)
+        trace.on_connection_create_end.append(self._on_aiohttp_connection("created"))
+        trace.on_connection_reuseconn.append(self._on_aiohttp_connection("reused"))
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(ttl_dns_cache=300, keepalive_timeout=120),
+            trace_configs=[trace],
+        )
+        self.openai_http = httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=15.0, read=5.0, write=5.0, pool=5.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=120),
+            event_hooks={"request": [self._on_httpx_request]},
+        )
+        self.openai = openai_client.AsyncClient(max_retries=0, http_client=self.openai_http)
+        self.warm_task = None
+
+    async def _on_aiohttp_request(self, session, context, params):
+        context.host = params.url.host
+
+    def _on_aiohttp_connection(self, outcome):
+        async def callback(session, context, params):
+            self.connections[getattr(context, "host", None)][outcome] += 1
+        return callback
+
+    async def _on_httpx_request(self, request):
+        # Extension "trace" de httpcore: une connexion TCP n'est établie que si le pool n'en avait pas
+        counters = self.connections[request.url.host]
+        opened = False
+
+        async def trace(event, info):
+            nonlocal opened
+            if event == "connection.connect_tcp.complete":
+                opened = True
+                counters["created"] += 1
+            elif event.endswith(".send_request_headers.started") and not opened:
+                counters["reused"] += 1
+
+        request.extensions["trace"] = trace
+
+    async def aclose(self):
+        if self.warm_task is not None and not self.warm_task.done():
+            self.warm_task.cancel()
+        await self.http_session.close()
+        await self.openai_http.aclose()
+
+
+class PipelineWarmer:
+    """
+    Préchauffe les clients des plugins STT (Deepgram), LLM (OpenAI) et TTS (Cartesia)
+
+    Les sessions HTTP et pools de connexions sont rattachés à la boucle
+    d'événements du job: chaque job ayant sa propre boucle (exécuteurs
+    "process" comme "thread"), ils ne servent qu'à un appel. Le préchauffage
+    ouvre les connexions TLS (résolution DNS comprise) pendant la connexion à
+    la room et l'attente de l'appelant; les premières requêtes des plugins
+    les reprennent du pool. `connection_stats` indique, par hôte, les
+    connexions ouvertes et reprises, pour vérifier ce gain.
+    """
+
+    def __init__(
+        self,
+        warmup_requests=True,
+        stt_model="nova-2-general",
+        stt_language="fr",
+        llm_model="gpt-4o-mini",
+        tts_model="sonic-2",
+        fake_config=None,
+    ):
+        """
+        Initialisation du préchauffage
+
+        Args:
+            warmup_requests: Envoie une requête légère à chaque fournisseur pour ouvrir la connexion TLS
+            stt_model: Modèle Deepgram
+            stt_language: Langue de reconnaissance Deepgram (aussi celle des transcriptions transmises à l'agent)
+            llm_model: Modèle OpenAI
+            tts_model: Modèle Cartesia
+            fake_config: FakeProviderConfig pour utiliser les faux fournisseurs (benchmarks hors ligne)
+        """
+        self.warmup_requests = warmup_requests
+        self.stt_model = stt_model
+        self.stt_language = stt_language
+        self.llm_model = llm_model
+        self.tts_model = tts_model
+        self.fake_config = fake_config
+        self.timings = {}
+        self._clients = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_env(cls):
+        """Construit le préchauffage à partir de PREWARM_WARMUP_REQUESTS, STT_LANGUAGE et PIPELINE_PROVIDERS"""
+        fake = os.environ.get("PIPELINE_PROVIDERS", "live") == "fake"
+        return cls(
+            warmup_requests=os.environ.get("PREWARM_WARMUP_REQUESTS", "1") == "1",
+            stt_language=os.environ.get("STT_LANGUAGE", "fr"),
+            fake_config=FakeProviderConfig.from_env() if fake else None,
+        )
+
+    def warm(self):
+        """
+        Démarre le préchauffage asynchrone sur la boucle courante
+
+        À appeler le plus tôt possible dans l'entrypoint: les connexions
+        s'ouvrent pendant la connexion à la room et l'attente de l'appelant.
+
+        Returns:
+            asyncio.Task: Tâche de préchauffage (partagée si déjà lancée)
+        """
+        clients = self._loop_clients()
+        if clients.warm_task is None:
+            if self.fake_config is not None:
+                clients.warm_task = asyncio.create_task(asyncio.sleep(0, result=self.timings))
+                return clients.warm_task
+            clients.warm_task = asyncio.create_task(self._warm(clients))
+        return clients.warm_task
+
+    def stt(self):
+        """Crée le plugin Deepgram sur la session HTTP partagée"""
+        if self.fake_config is not None:
+            return FakeSTT(self.fake_config)
+        # Sans langue, Deepgram reconnaît en "en-US" et l'annonce dans chaque transcription
+        return deepgram.STT(model=self.stt_model, language=self.stt_language, http_session=self._loop_clients().http_session)
+
+    def llm(self):
+        """Crée le plugin OpenAI sur le client HTTP partagé"""
+        if self.fake_config is not None:
+            return FakeLLM(self.fake_config)
+        return openai.LLM(model=self.llm_model, client=self._loop_clients().openai)
+
+    def tts(self):
+        """Crée le plugin Cartesia sur la session HTTP partagée"""
+        if self.fake_config is not None:
+            return FakeTTS(self.fake_config)
+        return cartesia.TTS(model=self.tts_model, http_session=self._loop_clients().http_session)
+
+    def connection_stats(self):
+        """
+        Connexions aux fournisseurs des clients de la boucle courante
+
+        Returns:
+            dict: Par hôte, connexions ouvertes ("created") et reprises du pool ("reused")
+        """
+        clients = self._clients.get(asyncio.get_running_loop())
+        if clients is None:
+            return {}
+        return {host: dict(counters) for host, counters in clients.connections.items()}
+
+    async def aclose(self):
+        """
+        Ferme les clients HTTP de la boucle courante
+
+        À appeler à l'arrêt du job: en mode "thread", chaque job a sa propre
+        boucle, dont les sessions resteraient sinon ouvertes après la fin.
+        """
+        clients = self._clients.pop(asyncio.get_running_loop(), None)
+        if clients is not None:
+            await clients.aclose()
+
+    def _loop_clients(self):
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            start = time.perf_counter()
+            clients = self._clients[loop] = _LoopClients()
+            self.timings["http_clients"] = round((time.perf_counter() - start) * 1000, 1)
+        return clients
+
+    async def _warm(self, clients):
+        if not self.warmup_requests:
+            return self.timings
+
+        async def timed(name, request):
+            start = time.perf_counter()
+            try:
+                await request
+            except Exception as e:
+                logger.warning(f"Requête de préchauffage {name} échouée: {e}")
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+        async def head_aiohttp(host):
+            async with clients.http_session.head(f"https://{host}/") as resp:
+                await resp.read()
+
+        # Le statut importe peu: seule compte l'ouverture de la connexion TLS dans le pool
+        await asyncio.gather(
+            timed("deepgram", head_aiohttp(PROVIDER_HOSTS["deepgram"])),
+            timed("cartesia", head_aiohttp(PROVIDER_HOSTS["cartesia"])),
+            timed("openai", clients.openai_http.head(f"https://{PROVIDER_HOSTS['openai']}/v1/models")),
+        )
+        logger.info(f"Préchauffage du pipeline terminé (ms): {self.timings}")
+        return self.timings
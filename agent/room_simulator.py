@@ -0,0 +1,98 @@
+import asyncio
+import itertools
+import logging
+
+from livekit import rtc
+
+logger = logging.getLogger(__name__)
+
+_sids = itertools.count(1)
+
+
+class FakeParticipant:
+    """Participant distant simulé (identité, attributs, type)"""
+
+    def __init__(self, identity, attributes=None, kind=rtc.ParticipantKind.PARTICIPANT_KIND_SIP):
+        self.sid = f"PA_sim{next(_sids)}"
+        self.identity = identity
+        self.name = identity
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.metadata = ""
+        self.track_publications = {}
+
+
+class FakeRoom(rtc.EventEmitter):
+    """
+    Room LiveKit simulée en mémoire
+
+    Expose la partie de rtc.Room utilisée par l'entrypoint, InboundCallHandler
+    et CallActions (name, remote_participants, événements) et permet de
+    déclencher les événements de participants de manière synchrone.
+    """
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.sid = f"RM_sim{next(_sids)}"
+        self.remote_participants = {}
+        self.connection_state = rtc.ConnectionState.CONN_CONNECTED
+
+    def isconnected(self):
+        return self.connection_state == rtc.ConnectionState.CONN_CONNECTED
+
+    def join(self, participant):
+        """Ajoute un participant et émet participant_connected"""
+        self.remote_participants[participant.identity] = participant
+        self.emit("participant_connected", participant)
+        return participant
+
+    def update_attributes(self, identity, changes):
+        """Modifie les attributs d'un participant et émet participant_attributes_changed"""
+        participant = self.remote_participants[identity]
+        participant.attributes.update(changes)
+        self.emit("participant_attributes_changed", dict(changes), participant)
+
+    def leave(self, identity):
+        """Retire un participant et émet participant_disconnected"""
+        participant = self.remote_participants.pop(identity, None)
+        if participant is not None:
+            self.emit("participant_disconnected", participant)
+        return participant
+
+    async def disconnect(self):
+        self.connection_state = rtc.ConnectionState.CONN_DISCONNECTED
+        self.emit("disconnected", rtc.DisconnectReason.CLIENT_INITIATED)
+
+
+class FakeRoomService:
+    """Service room de l'API LiveKit simulé (remove_participant)"""
+
+    def __init__(self):
+        self.rooms = {}
+        self.removed = 0
+
+    async def remove_participant(self, request):
+        room = self.rooms.get(request.room)
+        if room is None or room.leave(request.identity) is None:
+            raise LookupError(f"Participant {request.identity} introuvable dans la room {request.room}")
+        self.removed += 1
+
+
+class FakeLiveKitAPI:
+    """API LiveKit simulée, à passer là où l'entrypoint passe ctx.api"""
+
+    def __init__(self):
+        self.room = FakeRoomService()
+
+    def create_room(self, name):
+        """Crée une room simulée rattachée à cette API"""
+        room = FakeRoom(name)
+        self.room.rooms[name] = room
+        return room
+
+    def delete_room(self, name):
+        self.room.rooms.pop(name, None)
+
+    async def aclose(self):
+        self.room.rooms.clear()
@@ -0,0 +1,303 @@
+import asyncio
+import collections
+import difflib
+import logging
+import re
+
+from livekit.agents import APIConnectOptions, stt
+from livekit.agents import llm as agents_llm
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+from context_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def _normalize(text):
+    return " ".join(_PUNCTUATION_RE.sub(" ", text.lower()).split())
+
+
+def transcript_similarity(a, b):
+    """
+    Similarité entre deux transcriptions, sans tenir compte de la casse ni de la ponctuation
+
+    Returns:
+        float: Ratio entre 0 et 1
+    """
+    return difflib.SequenceMatcher(None, _normalize(a), _normalize(b)).ratio()
+
+
+class InterimTapSTT(stt.STT):
+    """
+    STT qui transmet les événements du STT réel à un observateur
+
+    Permet de suivre les transcriptions intermédiaires de Deepgram, que le
+    VoicePipelineAgent n'expose pas.
+    """
+
+    def __init__(self, wrapped, on_event):
+        """
+        Args:
+            wrapped: Instance STT réelle (ex: deepgram.STT)
+            on_event: Fonction appelée avec chaque SpeechEvent
+        """
+        super().__init__(capabilities=wrapped.capabilities)
+        self.wrapped = wrapped
+        self.on_event = on_event
+        self.wrapped.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return await self.wrapped.recognize(buffer, language=language, conn_options=conn_options)
+
+    def stream(self, *, language=None, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return _TappedSpeechStream(
+            self.wrapped.stream(language=language, conn_options=conn_options),
+            self.on_event,
+        )
+
+    async def aclose(self):
+        await self.wrapped.aclose()
+
+
+class _TappedSpeechStream:
+    """Mandataire d'un SpeechStream qui observe chaque événement au passage"""
+
+    def __init__(self, wrapped, on_event):
+        self._wrapped = wrapped
+        self._on_event = on_event
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        ev = await self._wrapped.__anext__()
+        try:
+            self._on_event(ev)
+        except Exception:
+            logger.exception("Erreur dans l'observateur de transcription")
+        return ev
+
+
+class _Speculation:
+    """Génération LLM lancée sur une hypothèse de transcription, mise en mémoire au fil de l'eau"""
+
+    def __init__(self, hypothesis, stream, prompt_tokens):
+        self.hypothesis = hypothesis
+        self.stream = stream
+        self.prompt_tokens = prompt_tokens
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._updated = asyncio.Event()
+        self._task = asyncio.create_task(self._consume())
+
+    async def _consume(self):
+        try:
+            async for chunk in self.stream:
+                self.chunks.append(chunk)
+                self._updated.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._updated.set()
+
+    @property
+    def completion_tokens(self):
+        # Un delta de contenu correspond à peu près à un token
+        return sum(1 for chunk in self.chunks for choice in chunk.choices if choice.delta.content)
+
+    async def replay(self):
+        """Rejoue les morceaux déjà reçus puis ceux qui arrivent encore"""
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._updated.clear()
+            if index < len(self.chunks) or self.done:
+                continue
+            await self._updated.wait()
+
+    async def cancel(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self.stream.aclose()
+
+
+class _ReplayLLMStream(agents_llm.LLMStream):
+    """LLMStream remis au VoicePipelineAgent lorsqu'une spéculation est validée"""
+
+    def __init__(self, llm, *, chat_ctx, fnc_ctx, speculation):
+        super().__init__(llm, chat_ctx=chat_ctx, fnc_ctx=fnc_ctx, conn_options=APIConnectOptions(max_retry=0))
+        self._speculation = speculation
+
+    async def _run(self):
+        try:
+            async for chunk in self._speculation.replay():
+                for choice in chunk.choices:
+                    if choice.delta.tool_calls:
+                        self._function_calls_info.extend(choice.delta.tool_calls)
+                self._event_ch.send_nowait(chunk)
+        finally:
+            await self._speculation.cancel()
+
+
+class SpeculativeGenerator:
+    """
+    Démarre la génération LLM sur une transcription intermédiaire stable
+
+    Dès que l'hypothèse de Deepgram est stable (ou qu'un segment final arrive),
+    une requête LLM est lancée sans attendre la fin de l'endpointing. Quand le
+    tour est validé, la transcription finale est comparée à l'hypothèse: si
+    elles sont assez proches la génération spéculative est utilisée, sinon elle
+    est annulée et le LLM est interrogé normalement.
+    """
+
+    def __init__(self, llm, prepare_ctx=None, stable_interims=2, min_words=3, similarity=0.9):
+        """
+        Initialisation de la spéculation
+
+        Args:
+            llm: Instance LLM dédiée aux requêtes spéculatives
+            prepare_ctx: Fonction appliquée au contexte avant envoi (ex: compaction)
+            stable_interims: Nombre de transcriptions intermédiaires identiques avant de spéculer
+            min_words: Nombre minimal de mots de l'hypothèse
+            similarity: Similarité minimale entre hypothèse et transcription finale
+        """
+        self.llm = llm
+        self.prepare_ctx = prepare_ctx
+        self.stable_interims = stable_interims
+        self.min_words = min_words
+        self.similarity = similarity
+        self._agent = None
+        self._finals = []
+        self._last_interim = None
+        self._stable_count = 0
+        self._speculation = None
+        self._counters = collections.Counter()
+
+    def attach(self, agent):
+        """Associe la spéculation à l'agent (contexte et fonctions courants)"""
+        self._agent = agent
+
+    def on_stt_event(self, ev):
+        """Observe les événements du STT (à brancher via InterimTapSTT)"""
+        if not ev.alternatives:
+            return
+        text = ev.alternatives[0].text.strip()
+        if not text:
+            return
+
+        if ev.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+            self._finals.append(text)
+            self._last_interim = None
+            self._stable_count = 0
+            self._maybe_start(" ".join(self._finals))
+        elif ev.type == stt.SpeechEventType.INTERIM_TRANSCRIPT:
+            if text == self._last_interim:
+                self._stable_count += 1
+            else:
+                self._last_interim = text
+                self._stable_count = 1
+            if self._stable_count >= self.stable_interims:
+                self._maybe_start(" ".join(self._finals + [text]))
+
+    def _maybe_start(self, hypothesis):
+        if self._agent is None or len(hypothesis.split()) < self.min_words:
+            return
+        if self._speculation is not None:
+            if _normalize(self._speculation.hypothesis) == _normalize(hypothesis):
+                return
+            self._counters["restarts"] += 1
+            self._discard(self._speculation)
+
+        chat_ctx = self._agent.chat_ctx.copy()
+        chat_ctx.append(role="user", text=hypothesis)
+        if self.prepare_ctx is not None:
+            self.prepare_ctx(chat_ctx)
+
+        stream = self.llm.chat(chat_ctx=chat_ctx, fnc_ctx=self._agent.fnc_ctx)
+        prompt_tokens = sum(estimate_tokens(msg) for msg in chat_ctx.messages)
+        self._speculation = _Speculation(hypothesis, stream, prompt_tokens)
+        self._counters["attempts"] += 1
+        logger.debug(f"Génération spéculative lancée sur: {hypothesis!r}")
+
+    def _discard(self, speculation):
+        if speculation is self._speculation:
+            self._speculation = None
+        self._counters["wasted_prompt_tokens"] += speculation.prompt_tokens
+        self._counters["wasted_completion_tokens"] += speculation.completion_tokens
+        asyncio.create_task(speculation.cancel())
+
+    def take(self, chat_ctx):
+        """
+        Valide ou annule la spéculation pour le tour qui vient d'être confirmé
+
+        Args:
+            chat_ctx: Contexte reçu par before_llm_cb (dernier message = transcription finale)
+
+        Returns:
+            LLMStream à utiliser pour la réponse, ou None pour la génération normale
+        """
+        speculation, self._speculation = self._speculation, None
+        self.reset()
+        if speculation is None:
+            return None
+
+        final_text = chat_ctx.messages[-1].content
+        score = transcript_similarity(speculation.hypothesis, final_text) if isinstance(final_text, str) else 0.0
+        if score < self.similarity or speculation.error is not None:
+            self._counters["misses"] += 1
+            self._discard(speculation)
+            logger.debug(f"Spéculation rejetée (similarité {score:.2f})")
+            return None
+
+        self._counters["hits"] += 1
+        logger.debug(f"Spéculation validée (similarité {score:.2f}, {len(speculation.chunks)} morceaux déjà reçus)")
+        return _ReplayLLMStream(
+            self._agent.llm,
+            chat_ctx=chat_ctx,
+            fnc_ctx=self._agent.fnc_ctx,
+            speculation=speculation,
+        )
+
+    def reset(self):
+        """Oublie les transcriptions du tour courant"""
+        self._finals = []
+        self._last_interim = None
+        self._stable_count = 0
+
+    def discard(self):
+        """Annule la spéculation en cours (ex: réponse fournie par la FAQ)"""
+        self.reset()
+        if self._speculation is not None:
+            self._discard(self._speculation)
+
+    def stats(self):
+        """Compteurs de spéculation (taux de réussite, tokens gaspillés)"""
+        decided = self._counters["hits"] + self._counters["misses"]
+        return {
+            "attempts": self._counters["attempts"],
+            "restarts": self._counters["restarts"],
+            "hits": self._counters["hits"],
+            "misses": self._counters["misses"],
+            "hit_rate": round(self._counters["hits"] / decided, 3) if decided else 0.0,
+            "wasted_prompt_tokens": self._counters["wasted_prompt_tokens"],
+            "wasted_completion_tokens": self._counters["wasted_completion_tokens"],
+        }
+
+    async def aclose(self):
+        speculation, self._speculation = self._speculation, None
+        if speculation is not None:
+            await speculation.cancel()
@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import os
+import re
+import time
+import unicodedata
+
+from livekit.agents import tokenize, tts, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+# Ponctuation suivie d'un espace (éventuellement après guillemet ou parenthèse fermante):
+# "3,5", "12.50" ou "14:30" ne sont donc jamais coupés
+_BOUNDARY_RE = re.compile(r"(?P<punct>[.!?…;:,]+)[»\"')\]]*(?=\s)")
+
+# Fins de phrase; les autres signes (virgule, deux-points) ne séparent que des propositions
+_MAJOR_PUNCTUATION = set(".!?…;")
+
+# Abréviations suivies d'un point qui ne terminent pas la phrase
+ABBREVIATIONS = {
+    "m", "mm", "mme", "mmes", "mlle", "mlles", "dr", "pr", "me", "st", "ste", "av", "bd",
+    "tel", "n", "no", "cf", "ex", "p", "env", "fig", "vol", "art", "chap",
+}
+
+_LAST_WORD_RE = re.compile(r"(\w+)\W*$")
+
+
+def _is_abbreviation(text, index):
+    """Indique si le point en position `index` suit une abréviation ou une initiale ("J. Dupont")"""
+    match = _LAST_WORD_RE.search(text[:index])
+    if match is None:
+        return False
+    word = match.group(1)
+    if len(word) == 1 and word.isupper():
+        return True
+    normalized = "".join(c for c in unicodedata.normalize("NFD", word.lower()) if unicodedata.category(c) != "Mn")
+    return normalized in ABBREVIATIONS
+
+
+def _boundaries(text):
+    """
+    Positions de coupure possibles dans un texte
+
+    Yields:
+        tuple: (position après la ponctuation, True pour une fin de phrase)
+    """
+    for match in _BOUNDARY_RE.finditer(text):
+        punct = match.group("punct")
+        if punct == "." and _is_abbreviation(text, match.start()):
+            continue
+        yield match.end(), punct[-1] in _MAJOR_PUNCTUATION
+
+
+def _word_cut(text, limit):
+    """
+    Dernier espace avant `limit` qui ne sépare pas deux groupes de chiffres
+
+    "1 000 euros" ou "06 12 34 56 78" ne sont ainsi jamais coupés au milieu.
+    """
+    for index in range(min(limit, len(text) - 1), 0, -1):
+        if text[index].isspace() and not (text[index - 1].isdigit() and text[index + 1].isdigit()):
+            return index
+    return None
+
+
+def next_cut(text, first, options):
+    """
+    Position où couper le texte en attente, ou None s'il faut attendre la suite
+
+    Args:
+        text: Texte reçu du LLM et non encore envoyé au TTS
+        first: True pour le premier fragment de la réponse
+        options: ChunkerOptions
+    """
+    if first:
+        min_chars, max_chars = options.first_min_chars, options.first_max_chars
+    else:
+        min_chars, max_chars = options.min_chars, options.max_chars
+
+    last_minor = None
+    for end, major in _boundaries(text):
+        if end > max_chars:
+            break
+        if end < min_chars:
+            continue
+        # Le premier fragment part dès la première proposition (virgule comprise)
+        if major or first:
+            return end
+        last_minor = end
+
+    if len(text) <= max_chars:
+        return None
+    # Seuil de longueur atteint: coupure à la dernière proposition, sinon entre deux mots
+    return last_minor or _word_cut(text, max_chars)
+
+
+def split_clauses(text, first, options):
+    """
+    Découpe le texte en attente en fragments prêts pour le TTS
+
+    Returns:
+        tuple: (fragments, reste du texte en attente)
+    """
+    chunks = []
+    while True:
+        cut = next_cut(text, first and not chunks, options)
+        if cut is None:
+            return chunks, text
+        chunk = text[:cut].strip()
+        if chunk:
+            chunks.append(chunk)
+        text = text[cut:].lstrip()
+
+
+class ChunkerOptions:
+    """Seuils de découpage du texte envoyé au TTS (en caractères)"""
+
+    def __init__(self, first_min_chars=8, first_max_chars=60, min_chars=40, max_chars=220):
+        self.first_min_chars = first_min_chars
+        self.first_max_chars = first_max_chars
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_env(cls):
+        """Construit les seuils à partir des variables TTS_CHUNK_*"""
+        return cls(
+            first_min_chars=int(os.environ.get("TTS_CHUNK_FIRST_MIN_CHARS", "8")),
+            first_max_chars=int(os.environ.get("TTS_CHUNK_FIRST_MAX_CHARS", "60")),
+            min_chars=int(os.environ.get("TTS_CHUNK_MIN_CHARS", "40")),
+            max_chars=int(os.environ.get("TTS_CHUNK_MAX_CHARS", "220")),
+        )
+
+
+class ClauseTokenizer(tokenize.SentenceTokenizer):
+    """
+    Découpage du texte en propositions pour le TTS, adapté au français
+
+    La première proposition d'un segment est libérée dès qu'une ponctuation
+    (virgule comprise) ou le seuil de longueur est atteint; la suite est
+    regroupée en phrases complètes. Les nombres ("3,5", "1 000", "14:30"),
+    les abréviations ("M.", "Mme.") et la ponctuation française précédée
+    d'une espace ("Bonjour !") sont respectés.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or ChunkerOptions()
+
+    def tokenize(self, text, *, language=None):
+        chunks, rest = split_clauses(text, True, self.options)
+        return chunks + [rest.strip()] if rest.strip() else chunks
+
+    def stream(self, *, language=None):
+        return ClauseStream(self.options)
+
+
+class ClauseStream(tokenize.SentenceStream):
+    """Flux de propositions: le texte du LLM est poussé au fil de l'eau"""
+
+    def __init__(self, options):
+        super().__init__()
+        self._options = options
+        self._buf = ""
+        self._first = True
+        self._segment_id = utils.shortuuid()
+
+    def push_text(self, text):
+        self._check_not_closed()
+        chunks, self._buf = split_clauses(self._buf + text, self._first, self._options)
+        for chunk in chunks:
+            self._send(chunk)
+
+    def flush(self):
+        self._check_not_closed()
+        self._send(self._buf)
+        self._buf = ""
+        self._first = True
+        self._segment_id = utils.shortuuid()
+
+    def end_input(self):
+        self.flush()
+        self._do_close()
+
+    async def aclose(self):
+        self._do_close()
+
+    def _send(self, text):
+        text = text.strip()
+        if text:
+            self._first = False
+            self._event_ch.send_nowait(tokenize.TokenData(token=text, segment_id=self._segment_id))
+
+
+class ClauseStreamingTTS(tts.TTS):
+    """
+    TTS qui reçoit le texte du LLM découpé en propositions
+
+    Pour un TTS en streaming (Cartesia), chaque proposition est poussée puis
+    envoyée aussitôt sur la même connexion: l'audio démarre après la première
+    proposition au lieu de la première phrase de dix mots. Pour un TTS sans
+    streaming, chaque proposition est synthétisée séparément (et passe par
+    le cache de phrases), la suivante étant lancée pendant la lecture.
+
+    L'événement "first_audio" est émis une fois par réponse avec les délais
+    (ms) entre le premier texte reçu, le premier fragment envoyé et le
+    premier audio.
+    """
+
+    def __init__(self, wrapped, tokenizer=None):
+        """
+        Initialisation du TTS
+
+        Args:
+            wrapped: TTS réel (ex: CachedTTS autour de cartesia.TTS)
+            tokenizer: ClauseTokenizer (par défaut: seuils TTS_CHUNK_*)
+        """
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=True),
+            sample_rate=wrapped.sample_rate,
+            num_channels=wrapped.num_channels,
+        )
+        self.wrapped = wrapped
+        self.tokenizer = tokenizer or ClauseTokenizer(ChunkerOptions.from_env())
+        self.wrapped.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    def synthesize(self, text, *, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return self.wrapped.synthesize(text, conn_options=conn_options)
+
+    def stream(self, *, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return _ClauseSynthesizeStream(tts=self, conn_options=conn_options)
+
+    async def aclose(self):
+        await self.wrapped.aclose()
+
+
+class _ClauseSynthesizeStream(tts.SynthesizeStream):
+    """Flux de synthèse alimenté proposition par proposition"""
+
+    def __init__(self, *, tts, conn_options):
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._clauses = tts.tokenizer.stream()
+        self._text_at = None
+        self._chunk_at = None
+        self._reported = False
+
+    async def _metrics_monitor_task(self, event_aiter):
+        # Les métriques sont émises par le TTS réel
+        pass
+
+    def _on_audio(self, audio):
+        if not self._reported and self._text_at is not None:
+            self._reported = True
+            now = time.perf_counter()
+            self._tts.emit("first_audio", {
+                "first_chunk_ms": round((self._chunk_at - self._text_at) * 1000, 1),
+                "first_audio_ms": round((now - self._text_at) * 1000, 1),
+            })
+        self._event_ch.send_nowait(audio)
+
+    async def _forward_input(self):
+        async for data in self._input_ch:
+            if isinstance(data, self._FlushSentinel):
+                self._clauses.flush()
+                continue
+            if self._text_at is None:
+                self._text_at = time.perf_counter()
+            self._clauses.push_text(data)
+        self._clauses.end_input()
+
+    async def _run(self):
+        wrapped = self._tts.wrapped
+        synthesize = self._synthesize_streamed if wrapped.capabilities.streaming else self._synthesize_chunked
+        tasks = [
+            asyncio.create_task(self._forward_input()),
+            asyncio.create_task(synthesize(wrapped)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await utils.aio.gracefully_cancel(*tasks)
+
+    async def _synthesize_streamed(self, wrapped):
+        inner = wrapped.stream(conn_options=self._conn_options)
+
+        async def _push():
+            async for ev in self._clauses:
+                self._chunk_at = self._chunk_at or time.perf_counter()
+                inner.push_text(ev.token + " ")
+                # Le flush fait partir la proposition sans attendre la fin de phrase
+                inner.flush()
+            inner.end_input()
+
+        push_task = asyncio.create_task(_push())
+        try:
+            async for audio in inner:
+                self._on_audio(audio)
+            await push_task
+        finally:
+            await utils.aio.gracefully_cancel(push_task)
+            await inner.aclose()
+
+    async def _synthesize_chunked(self, wrapped):
+        pending = asyncio.Queue()
+
+        async def _start():
+            # La synthèse démarre à la création du flux: la proposition suivante
+            # est produite pendant la lecture de la précédente
+            async for ev in self._clauses:
+                self._chunk_at = self._chunk_at or time.perf_counter()
+                pending.put_nowait(wrapped.synthesize(ev.token, conn_options=self._conn_options))
+            pending.put_nowait(None)
+
+        start_task = asyncio.create_task(_start())
+        stream = None
+        try:
+            while (stream := await pending.get()) is not None:
+                last_audio = None
+                async for audio in stream:
+                    if last_audio is not None:
+                        self._on_audio(last_audio)
+                    last_audio = audio
+                if last_audio is not None:
+                    last_audio.is_final = True
+                    self._on_audio(last_audio)
+                await stream.aclose()
+            await start_task
+        finally:
+            await utils.aio.gracefully_cancel(start_task)
+            if stream is not None:
+                await stream.aclose()
+            while not pending.empty():
+                queued = pending.get_nowait()
+                if queued is not None:
+                    await queued.aclose()
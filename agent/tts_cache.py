@@ -0,0 +1,484 @@
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+import wave
+
+from livekit import rtc
+from livekit.agents import tokenize, tts, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+# Durée des trames rejouées depuis le cache
+FRAME_DURATION_MS = 50
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_process_cache = None
+
+
+def normalize_text(text):
+    """
+    Normalise un texte avant calcul de la clé de cache
+
+    Les variantes d'espaces, d'apostrophes et de formes Unicode d'une même
+    phrase partagent ainsi la même entrée.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\u2019", "'").replace("\u00a0", " ")
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def phrase_key(text, voice, model, sample_rate):
+    """
+    Calcule la clé de cache d'une phrase synthétisée
+
+    Args:
+        text: Texte prononcé
+        voice: Voix utilisée par le TTS
+        model: Modèle TTS
+        sample_rate: Fréquence d'échantillonnage de l'audio
+
+    Returns:
+        str: Empreinte SHA-256 des paramètres
+    """
+    payload = json.dumps([text, voice, model, sample_rate], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedPhrase:
+    """
+    Audio PCM 16 bits d'une phrase déjà synthétisée
+    """
+
+    def __init__(self, pcm, sample_rate, num_channels):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Assemble les trames produites par le TTS en une seule phrase"""
+        first = frames[0]
+        pcm = b"".join(bytes(frame.data) for frame in frames)
+        return cls(pcm, first.sample_rate, first.num_channels)
+
+    @property
+    def nbytes(self):
+        return len(self.pcm)
+
+    def frames(self):
+        """Découpe l'audio en trames prêtes à être jouées dans la room"""
+        samples_per_channel = self.sample_rate * FRAME_DURATION_MS // 1000
+        chunk_size = samples_per_channel * self.num_channels * 2
+        for offset in range(0, len(self.pcm), chunk_size):
+            chunk = self.pcm[offset:offset + chunk_size]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+
+class PhraseAudioCache:
+    """
+    Cache LRU de l'audio des phrases synthétisées, borné en mémoire
+
+    Les phrases enregistrées via `register` (ex: message d'accueil) ne sont
+    jamais évincées et, si un répertoire est configuré, sont persistées en WAV
+    puis relues par memory-mapping: synthétisées une seule fois pour la machine,
+    leurs pages sont partagées entre tous les processus. Chaque processus ne
+    traitant qu'un appel en mode "process", c'est ce qui permet au message
+    d'accueil d'être servi sans TTS d'un appel à l'autre.
+
+    Les autres phrases courtes (réponses du LLM) ne sont gardées qu'en mémoire,
+    dans le LRU du processus: l'espace disque reste borné par les phrases
+    enregistrées.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=32 * 1024 * 1024, max_chars=120):
+        """
+        Initialisation du cache
+
+        Args:
+            cache_dir: Répertoire de persistance des phrases enregistrées (None = mémoire seule)
+            max_bytes: Taille maximale de l'audio conservé par le LRU
+            max_chars: Longueur maximale d'une phrase mise en cache à la volée
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._phrases = collections.OrderedDict()
+        self._registered = set()
+        self._pinned = set()
+        self._size = 0
+        self._counters = collections.Counter()
+        # Les jobs d'un processus en mode "thread" partagent le cache (process_phrase_cache)
+        self._lock = threading.RLock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Construit le cache à partir des variables TTS_CACHE_* (TTS_CACHE_DIR vide = mémoire seule)"""
+        return cls(
+            cache_dir=os.environ.get("TTS_CACHE_DIR", "tts_cache") or None,
+            max_bytes=int(float(os.environ.get("TTS_CACHE_MAX_MB", "32")) * 1024 * 1024),
+            max_chars=int(os.environ.get("TTS_CACHE_MAX_CHARS", "120")),
+        )
+
+    def register(self, *texts):
+        """Déclare des phrases fixes, toujours mises en cache et jamais évincées"""
+        self._registered.update(normalize_text(text) for text in texts)
+
+    def is_registered(self, text):
+        return text in self._registered
+
+    def is_cacheable(self, text):
+        """Indique si un texte normalisé doit passer par le cache"""
+        return text in self._registered or 0 < len(text) <= self.max_chars
+
+    def preload(self):
+        """Mappe en mémoire les phrases enregistrées déjà persistées sur disque, dans la limite du LRU"""
+        if not self.cache_dir:
+            return 0
+
+        count = 0
+        with self._lock:
+            for filename in os.listdir(self.cache_dir):
+                key, ext = os.path.splitext(filename)
+                if ext != ".wav" or key in self._phrases:
+                    continue
+                if self._size >= self.max_bytes:
+                    break
+                phrase = self._read(key)
+                if phrase:
+                    self._pinned.add(key)
+                    self._store(key, phrase)
+                    count += 1
+        logger.info(f"{count} phrases chargées depuis le cache TTS {self.cache_dir}")
+        return count
+
+    def get(self, key, pin=False):
+        """
+        Retourne une phrase en cache
+
+        Args:
+            key: Clé calculée par `phrase_key`
+            pin: Protège l'entrée contre l'éviction (phrases enregistrées)
+
+        Returns:
+            CachedPhrase ou None si la phrase n'a jamais été synthétisée
+        """
+        with self._lock:
+            phrase = self._phrases.get(key)
+            if phrase is not None:
+                self._phrases.move_to_end(key)
+                self._counters["memory_hits"] += 1
+            elif self.cache_dir and pin:
+                # Seules les phrases enregistrées sont persistées
+                phrase = self._read(key)
+                if phrase is not None:
+                    self._counters["disk_hits"] += 1
+                    self._store(key, phrase)
+
+            if phrase is None:
+                self._counters["misses"] += 1
+                return None
+
+            if pin:
+                self._pinned.add(key)
+            self._counters["hits"] += 1
+            self._counters["bytes_served"] += phrase.nbytes
+            return phrase
+
+    def put(self, key, phrase, pin=False):
+        """Ajoute une phrase au cache; une phrase épinglée est aussi persistée si un répertoire est configuré"""
+        with self._lock:
+            if pin:
+                self._pinned.add(key)
+            self._store(key, phrase)
+            self._counters["bytes_stored"] += phrase.nbytes
+        if self.cache_dir and pin:
+            self._write(key, phrase)
+
+    def stats(self):
+        """Compteurs du cache, pour dimensionner TTS_CACHE_MAX_MB"""
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            "entries": len(self._phrases),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self._counters["hits"],
+            "memory_hits": self._counters["memory_hits"],
+            "disk_hits": self._counters["disk_hits"],
+            "misses": self._counters["misses"],
+            "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+            "evictions": self._counters["evictions"],
+            "bytes_served": self._counters["bytes_served"],
+            "bytes_stored": self._counters["bytes_stored"],
+        }
+
+    def _store(self, key, phrase):
+        previous = self._phrases.pop(key, None)
+        if previous is not None:
+            self._size -= previous.nbytes
+        self._phrases[key] = phrase
+        self._size += phrase.nbytes
+        self._evict()
+
+    def _evict(self):
+        # Parcours du moins récemment utilisé au plus récent, en sautant les phrases épinglées
+        for key in list(self._phrases):
+            if self._size <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self._size -= self._phrases.pop(key).nbytes
+            self._counters["evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                with wave.open(f, "rb") as wav:
+                    sample_rate = wav.getframerate()
+                    num_channels = wav.getnchannels()
+                    data_size = wav.getnframes() * num_channels * wav.getsampwidth()
+                if data_size == 0:
+                    return None
+                # Le mapping est partagé entre processus via le cache de pages du noyau
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, wave.Error) as e:
+            logger.warning(f"Fichier de cache TTS illisible ({key}): {e}")
+            return None
+
+        # Le bloc de données est le dernier du fichier (écrit par `_write`)
+        pcm = memoryview(mapped)[len(mapped) - data_size:]
+        return CachedPhrase(pcm, sample_rate, num_channels)
+
+    def _write(self, key, phrase):
+        try:
+            # Écriture atomique: plusieurs processus partagent le même répertoire
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f, wave.open(f, "wb") as wav:
+                wav.setnchannels(phrase.num_channels)
+                wav.setsampwidth(2)
+                wav.setframerate(phrase.sample_rate)
+                wav.writeframes(phrase.pcm)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Impossible de persister la phrase {key} dans le cache TTS: {e}")
+
+
+def process_phrase_cache(*registered):
+    """
+    PhraseAudioCache unique du processus, construit par `PhraseAudioCache.from_env`
+
+    En mode AGENT_JOB_EXECUTOR=thread, `prewarm` est appelé pour chaque job: le
+    LRU des réponses est alors partagé par les appels successifs du processus.
+    En mode "process", seules les phrases persistées sur disque survivent à l'appel.
+
+    Args:
+        registered: Phrases fixes à enregistrer (ex: message d'accueil)
+
+    Returns:
+        PhraseAudioCache
+    """
+    global _process_cache
+    with _lock:
+        if _process_cache is None:
+            _process_cache = PhraseAudioCache.from_env()
+            _process_cache.preload()
+        _process_cache.register(*registered)
+    return _process_cache
+
+
+class CachedTTS(tts.TTS):
+    """
+    TTS qui rejoue depuis le cache les phrases déjà synthétisées et délègue le reste
+
+    En streaming (réponses du LLM), le texte est découpé en phrases, délimitées
+    aussi par chaque flush: une phrase courte déjà prononcée (confirmation,
+    formule de politesse) est rejouée depuis le cache, les autres sont
+    synthétisées par le TTS réel puis enregistrées.
+    """
+
+    def __init__(self, wrapped, cache):
+        """
+        Initialisation du TTS avec cache
+
+        Args:
+            wrapped: Instance TTS réelle (ex: cartesia.TTS)
+            cache: PhraseAudioCache du processus
+        """
+        super().__init__(
+            capabilities=wrapped.capabilities,
+            sample_rate=wrapped.sample_rate,
+            num_channels=wrapped.num_channels,
+        )
+        self.wrapped = wrapped
+        self.cache = cache
+        self.tokenizer = tokenize.basic.SentenceTokenizer()
+        self.wrapped.on("metrics_collected", lambda metrics: self.emit("metrics_collected", metrics))
+
+    def cache_key(self, text):
+        """Clé de cache d'un texte pour la voix et le modèle du TTS réel"""
+        opts = getattr(self.wrapped, "_opts", None)
+        return phrase_key(
+            text,
+            getattr(opts, "voice", None),
+            getattr(opts, "model", None),
+            self.sample_rate,
+        )
+
+    def synthesize(self, text, *, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        text = normalize_text(text)
+        if not self.cache.is_cacheable(text):
+            return self.wrapped.synthesize(text, conn_options=conn_options)
+        return _CachedChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+    def stream(self, *, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        return _CachedSynthesizeStream(tts=self, conn_options=conn_options)
+
+    async def aclose(self):
+        await self.wrapped.aclose()
+
+
+class _CachedChunkedStream(tts.ChunkedStream):
+    """Flux de synthèse servi depuis le cache, ou enregistré au premier passage"""
+
+    async def _run(self):
+        request_id = utils.shortuuid()
+        cache = self._tts.cache
+        key = self._tts.cache_key(self._input_text)
+        pin = cache.is_registered(self._input_text)
+        phrase = cache.get(key, pin=pin)
+
+        if phrase is not None:
+            for frame in phrase.frames():
+                self._event_ch.send_nowait(tts.SynthesizedAudio(request_id=request_id, frame=frame))
+            return
+
+        # Premier passage: on synthétise et on enregistre les trames
+        frames = []
+        stream = self._tts.wrapped.synthesize(self._input_text, conn_options=self._conn_options)
+        try:
+            async for audio in stream:
+                frames.append(audio.frame)
+                self._event_ch.send_nowait(tts.SynthesizedAudio(request_id=request_id, frame=audio.frame))
+        finally:
+            await stream.aclose()
+
+        if frames:
+            cache.put(key, CachedPhrase.from_frames(frames), pin=pin)
+            logger.info(f"Phrase mise en cache TTS: {self._input_text[:40]!r}")
+
+
+class _CachedSynthesizeStream(tts.SynthesizeStream):
+    """Flux de synthèse phrase par phrase, chaque phrase servie depuis le cache ou enregistrée"""
+
+    def __init__(self, *, tts, conn_options):
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._sentences = tts.tokenizer.stream()
+
+    async def _metrics_monitor_task(self, event_aiter):
+        # Les métriques sont émises par le TTS réel
+        pass
+
+    async def _forward_input(self):
+        async for data in self._input_ch:
+            if isinstance(data, self._FlushSentinel):
+                self._sentences.flush()
+                continue
+            self._sentences.push_text(data)
+        self._sentences.end_input()
+
+    def _open(self, text):
+        """
+        Source audio d'une phrase, ouverte dès sa réception
+
+        Returns:
+            tuple: (texte, clé de cache ou None, phrase en cache ou None, flux du TTS réel ou None)
+        """
+        cache = self._tts.cache
+        key = None
+        if cache.is_cacheable(text):
+            key = self._tts.cache_key(text)
+            phrase = cache.get(key, pin=cache.is_registered(text))
+            if phrase is not None:
+                return text, key, phrase, None
+
+        wrapped = self._tts.wrapped
+        if wrapped.capabilities.streaming:
+            # Un flux par phrase: la fin de son audio est connue, elle peut être enregistrée
+            stream = wrapped.stream(conn_options=self._conn_options)
+            stream.push_text(text)
+            stream.end_input()
+        else:
+            stream = wrapped.synthesize(text, conn_options=self._conn_options)
+        return text, key, None, stream
+
+    async def _run(self):
+        pending = asyncio.Queue()
+
+        async def _start():
+            # La synthèse d'une phrase démarre à sa réception, pendant la lecture des précédentes
+            async for ev in self._sentences:
+                text = normalize_text(ev.token)
+                if text:
+                    pending.put_nowait(self._open(text))
+            pending.put_nowait(None)
+
+        tasks = [asyncio.create_task(self._forward_input()), asyncio.create_task(_start())]
+        source = None
+        try:
+            while (source := await pending.get()) is not None:
+                await self._play(*source)
+            await asyncio.gather(*tasks)
+        finally:
+            await utils.aio.gracefully_cancel(*tasks)
+            if source is not None and source[3] is not None:
+                await source[3].aclose()
+            while not pending.empty():
+                queued = pending.get_nowait()
+                if queued is not None and queued[3] is not None:
+                    await queued[3].aclose()
+
+    async def _play(self, text, key, phrase, stream):
+        request_id = utils.shortuuid()
+        if phrase is not None:
+            frames = list(phrase.frames())
+        else:
+            frames = []
+            try:
+                async for audio in stream:
+                    # Chaque trame est transmise dès réception, sauf la dernière (marquée finale)
+                    if frames:
+                        self._event_ch.send_nowait(tts.SynthesizedAudio(request_id=request_id, frame=frames[-1]))
+                    frames.append(audio.frame)
+            finally:
+                await stream.aclose()
+            if frames and key is not None:
+                self._tts.cache.put(key, CachedPhrase.from_frames(frames), pin=self._tts.cache.is_registered(text))
+                logger.info(f"Phrase mise en cache TTS: {text[:40]!r}")
+            frames = frames[-1:]
+
+        for index, frame in enumerate(frames):
+            self._event_ch.send_nowait(
+                tts.SynthesizedAudio(request_id=request_id, frame=frame, is_final=index == len(frames) - 1)
+            )
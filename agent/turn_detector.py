@@ -0,0 +1,244 @@
+import asyncio
+import collections
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+
+from call_metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Mots après lesquels une phrase française est presque toujours incomplète
+CONTINUATION_WORDS = {
+    "et", "mais", "ou", "donc", "or", "car", "ni", "que", "qu", "qui", "quoi", "dont", "si", "quand",
+    "comme", "parce", "puisque", "lorsque", "alors", "pour", "avec", "sans", "dans", "sur", "sous",
+    "chez", "vers", "par", "de", "du", "des", "d", "le", "la", "les", "l", "un", "une", "au", "aux",
+    "a", "mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses", "votre", "vos", "notre", "nos",
+    "ce", "cet", "cette", "ces", "je", "j", "tu", "il", "elle", "on", "nous", "vous", "ils", "elles",
+    "me", "m", "te", "se", "s", "ne", "n", "y", "en", "est", "suis", "ai", "avez", "etait", "c",
+    "plus", "tres", "aussi", "encore", "enfin", "bon",
+}
+
+# Hésitations qui annoncent une suite
+FILLER_WORDS = {"euh", "heu", "hum", "hmm", "ben", "bah", "beh", "voila", "genre"}
+
+# Réponses courtes qui constituent un tour complet
+CLOSING_PHRASES = {
+    "oui", "non", "d accord", "ok", "okay", "merci", "merci beaucoup", "tres bien", "parfait",
+    "c est tout", "au revoir", "bonne journee", "exactement", "tout a fait", "bien sur", "ca marche",
+    "pas du tout", "c est ca", "non merci", "oui merci",
+}
+
+QUESTION_WORDS = {"pourquoi", "comment", "combien", "quand", "ou", "quel", "quelle", "quels", "quelles", "est-ce"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_DIGITS_END_RE = re.compile(r"\d[\d\s]*$")
+
+# Poids du modèle logistique (ajustés à la main sur des transcriptions d'appels)
+WEIGHTS = {
+    "bias": -0.2,
+    "terminal_punctuation": 2.4,
+    "question_mark": 0.6,
+    "trailing_comma": -1.8,
+    "ellipsis": -2.2,
+    "continuation_word": -3.0,
+    "filler_word": -2.5,
+    "closing_phrase": 2.6,
+    "question_word": 0.3,
+    "answers_agent_question": 0.9,
+    "trailing_digits": -1.6,
+    "very_short": -0.4,
+}
+
+
+def _strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def _is_french(language):
+    return language is None or language.lower().startswith("fr")
+
+
+def _message_text(msg):
+    if msg is None:
+        return ""
+    if isinstance(msg.content, str):
+        return msg.content
+    if isinstance(msg.content, list):
+        return " ".join(part for part in msg.content if isinstance(part, str))
+    return ""
+
+
+def extract_features(text, previous_agent_text=""):
+    """
+    Caractéristiques lexicales de complétude d'un énoncé
+
+    Args:
+        text: Transcription de l'appelant pour le tour en cours
+        previous_agent_text: Dernière réplique de l'agent
+
+    Returns:
+        dict: Valeurs des caractéristiques (0 ou 1)
+    """
+    stripped = text.strip()
+    words = _WORD_RE.findall(_strip_accents(stripped.lower()))
+    last_word = words[-1] if words else ""
+    phrase = " ".join(words)
+    terminal = stripped.endswith((".", "!", "?")) and not stripped.endswith("...")
+    return {
+        "bias": 1.0,
+        "terminal_punctuation": float(terminal),
+        "question_mark": float(stripped.endswith("?")),
+        "trailing_comma": float(stripped.endswith((",", ";", ":", "-"))),
+        "ellipsis": float(stripped.endswith(("...", "…"))),
+        # La ponctuation finale du STT l'emporte ("où elle en est ?")
+        "continuation_word": float(last_word in CONTINUATION_WORDS and not terminal),
+        "filler_word": float(last_word in FILLER_WORDS),
+        "closing_phrase": float(phrase in CLOSING_PHRASES),
+        "question_word": float(bool(words) and words[0] in QUESTION_WORDS),
+        "answers_agent_question": float(previous_agent_text.strip().endswith("?") and 0 < len(words) <= 6),
+        "trailing_digits": float(bool(_DIGITS_END_RE.search(stripped))),
+        "very_short": float(len(words) <= 2 and phrase not in CLOSING_PHRASES),
+    }
+
+
+def end_of_turn_probability(text, previous_agent_text=""):
+    """Probabilité que l'appelant ait terminé son tour (régression logistique lexicale)"""
+    features = extract_features(text, previous_agent_text)
+    score = sum(WEIGHTS[name] * value for name, value in features.items())
+    return 1.0 / (1.0 + math.exp(-score))
+
+
+class LexicalTurnDetector:
+    """
+    Détecteur de fin de tour local (CPU, sans modèle externe) pour VoicePipelineAgent
+
+    Branché via VoicePipelineAgent(turn_detector=...), il est consulté après
+    la fin de parole détectée par le VAD. Selon la probabilité de complétude
+    de la transcription, le tour est validé après l'un de trois délais:
+        - confiant (p >= confident_threshold): délai court (min_endpointing_delay de l'agent)
+        - incertain: délai habituel (`normal_delay`), la prédiction attend elle-même ce délai
+        - phrase inachevée (p < unlikely_threshold): max_endpointing_delay de l'agent
+    """
+
+    def __init__(self, confident_threshold=0.85, unlikely_threshold=0.25, normal_delay=0.5, early_delay=0.2):
+        """
+        Initialisation du détecteur
+
+        Args:
+            confident_threshold: Probabilité au-delà de laquelle le tour est validé au plus tôt
+            unlikely_threshold: Probabilité en deçà de laquelle l'agent attend max_endpointing_delay
+            normal_delay: Délai total (s) appliqué dans la zone incertaine
+            early_delay: min_endpointing_delay passé à l'agent (délai des tours jugés complets)
+        """
+        self.confident_threshold = confident_threshold
+        self._unlikely_threshold = unlikely_threshold
+        self.normal_delay = normal_delay
+        self.early_delay = early_delay
+        self._inference = LatencyHistogram()
+        self._counters = collections.Counter()
+        self._pending = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Construit le détecteur à partir des variables TURN_DETECTOR_*
+
+        Returns:
+            LexicalTurnDetector ou None si TURN_DETECTOR n'est pas activé
+        """
+        if os.environ.get("TURN_DETECTOR", "0") != "1":
+            return None
+        return cls(
+            confident_threshold=float(os.environ.get("TURN_DETECTOR_CONFIDENT", "0.85")),
+            unlikely_threshold=float(os.environ.get("TURN_DETECTOR_UNLIKELY", "0.25")),
+            normal_delay=float(os.environ.get("MIN_ENDPOINTING_DELAY", "0.5")),
+            early_delay=float(os.environ.get("TURN_DETECTOR_EARLY_DELAY", "0.2")),
+        )
+
+    def endpointing_settings(self, settings, language=None):
+        """
+        Délais à passer au VoicePipelineAgent: le délai minimal devient celui des tours complets
+
+        Si la langue du STT n'est pas prise en charge, l'agent n'appelle jamais le
+        détecteur: les délais d'origine sont conservés, sans quoi chaque tour serait
+        validé après le délai court.
+
+        Args:
+            settings: Délais d'origine (min/max_endpointing_delay)
+            language: Langue annoncée par le STT dans ses transcriptions
+        """
+        if not _is_french(language):
+            logger.warning(f"Détecteur de fin de tour inactif: langue du STT {language!r} non prise en charge")
+            return dict(settings)
+        return {**settings, "min_endpointing_delay": self.early_delay}
+
+    # Interface attendue par VoicePipelineAgent (turn_detector)
+
+    def unlikely_threshold(self, language=None):
+        return self._unlikely_threshold
+
+    def supports_language(self, language=None):
+        supported = _is_french(language)
+        if not supported:
+            # Tour validé sans prédiction: visible dans stats()
+            self._counters["unsupported_language"] += 1
+        return supported
+
+    async def predict_end_of_turn(self, chat_ctx):
+        start = time.perf_counter()
+        messages = chat_ctx.messages
+        text = _message_text(messages[-1]) if messages else ""
+        previous_agent = next((_message_text(msg) for msg in reversed(messages[:-1]) if msg.role == "assistant"), "")
+        probability = end_of_turn_probability(text, previous_agent)
+        elapsed = time.perf_counter() - start
+        self._inference.record(elapsed * 1_000_000)
+
+        if probability >= self.confident_threshold:
+            tier = "early"
+        elif probability < self._unlikely_threshold:
+            tier = "long"
+        else:
+            tier = "normal"
+        self._counters[tier] += 1
+        self._pending = tier
+        logger.debug(f"Fin de tour {tier} (p={probability:.2f}) pour: {text[-60:]!r}")
+
+        if tier == "normal":
+            # L'agent retranche tout le temps passé ici (attente comprise) de son délai
+            # minimal: attendre normal_delay ici donne un délai total de normal_delay
+            await asyncio.sleep(max(0.0, self.normal_delay - elapsed))
+        return probability
+
+    # Mesure de la précision: une décision est fausse si l'appelant reprend la parole
+    # avant que l'agent ne réponde
+
+    def attach(self, agent):
+        """Abonne le détecteur aux événements de l'agent pour mesurer la précision des décisions"""
+        agent.on("user_started_speaking", self._on_user_started_speaking)
+        agent.on("agent_started_speaking", self._on_agent_started_speaking)
+
+    def _on_user_started_speaking(self, *_):
+        if self._pending is not None:
+            self._counters[f"{self._pending}_continued"] += 1
+            self._pending = None
+
+    def _on_agent_started_speaking(self, *_):
+        self._pending = None
+
+    def stats(self):
+        """Répartition des décisions, taux de reprise de parole et temps d'inférence (µs)"""
+        result = {"inference_us": self._inference.percentiles()}
+        for tier in ("early", "normal", "long"):
+            count = self._counters[tier]
+            continued = self._counters[f"{tier}_continued"]
+            result[tier] = {
+                "count": count,
+                "continued": continued,
+                "continued_rate": round(continued / count, 3) if count else 0.0,
+            }
+        result["unsupported_language"] = self._counters["unsupported_language"]
+        return result
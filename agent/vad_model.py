@@ -0,0 +1,523 @@
+import collections
+import dataclasses
+import importlib.resources
+import logging
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+import onnxruntime
+import psutil
+from livekit.plugins import silero
+
+from call_metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_model_bytes = None
+_shared_session = None
+_batch_scheduler = None
+_thread_budget = None
+
+# Temps d'inférence par fenêtre (µs), tous flux VAD du processus confondus
+_inference_timings = LatencyHistogram()
+
+# Fenêtre d'inférence du modèle Silero v5 à 16 kHz (32 ms) et contexte précédent
+WINDOW_SIZE_SAMPLES = 512
+CONTEXT_SIZE_SAMPLES = 64
+
+
+def vad_settings_from_env():
+    """
+    Paramètres du VAD Silero utilisés par l'agent (variables VAD_*)
+
+    Returns:
+        dict: Arguments nommés de silero.VAD.load
+    """
+    return {
+        "min_speech_duration": float(os.environ.get("VAD_MIN_SPEECH_DURATION", "0.05")),
+        "min_silence_duration": float(os.environ.get("VAD_MIN_SILENCE_DURATION", "0.55")),
+        "prefix_padding_duration": float(os.environ.get("VAD_PREFIX_PADDING_DURATION", "0.5")),
+        "activation_threshold": float(os.environ.get("VAD_ACTIVATION_THRESHOLD", "0.5")),
+        "sample_rate": int(os.environ.get("VAD_SAMPLE_RATE", "16000")),
+    }
+
+
+def endpointing_settings_from_env():
+    """
+    Délais de fin de tour du VoicePipelineAgent (variables MIN/MAX_ENDPOINTING_DELAY)
+
+    Returns:
+        dict: Arguments nommés min_endpointing_delay et max_endpointing_delay
+    """
+    return {
+        "min_endpointing_delay": float(os.environ.get("MIN_ENDPOINTING_DELAY", "0.5")),
+        "max_endpointing_delay": float(os.environ.get("MAX_ENDPOINTING_DELAY", "6.0")),
+    }
+
+
+def shared_model_enabled():
+    return os.environ.get("VAD_SHARED_MODEL", "0") == "1"
+
+
+def batching_enabled():
+    return os.environ.get("VAD_BATCHING", "0") == "1"
+
+
+def model_bytes():
+    """
+    Octets du modèle ONNX Silero, lus une seule fois par processus
+
+    LiveKit démarre les processus de jobs par "spawn": rien n'est hérité du
+    worker, chaque processus lit le fichier et construit sa propre session.
+    """
+    global _model_bytes
+    with _lock:
+        if _model_bytes is None:
+            resource = importlib.resources.files("livekit.plugins.silero.resources").joinpath("silero_vad.onnx")
+            _model_bytes = resource.read_bytes()
+    return _model_bytes
+
+
+def parse_cpu_list(spec):
+    """
+    Convertit une liste de cœurs au format "0-3,6" en ensemble d'indices
+
+    Returns:
+        set: Indices des cœurs (vide si la liste est vide)
+    """
+    cpus = set()
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+class ThreadBudget:
+    """
+    Budget de threads onnxruntime des sessions VAD d'un processus de job
+
+    Avec un processus par appel, les threads de chaque session s'additionnent
+    sur l'hôte: le budget fixe les threads par session, plafonne le total des
+    sessions vivantes du processus et peut restreindre le processus à une liste
+    de cœurs. Les threads d'une session sont rendus quand elle est libérée
+    (fin du job qui la détenait, voir `new_session`).
+    """
+
+    def __init__(self, intra_op_threads=1, inter_op_threads=1, process_cap=0, cpu_affinity=None):
+        """
+        Initialisation du budget
+
+        Args:
+            intra_op_threads: Threads intra-opérateur demandés par session
+            inter_op_threads: Threads inter-opérateurs par session
+            process_cap: Total maximal de threads intra-opérateur du processus (0 = pas de limite)
+            cpu_affinity: Cœurs autorisés pour le processus (ensemble d'indices, optionnel)
+        """
+        self.intra_op_threads = max(1, intra_op_threads)
+        self.inter_op_threads = max(1, inter_op_threads)
+        self.process_cap = process_cap
+        self.cpu_affinity = cpu_affinity or None
+        self.allocated = 0
+        self.sessions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Construit le budget à partir des variables VAD_*_THREADS, VAD_PROCESS_THREAD_CAP et VAD_CPU_AFFINITY"""
+        return cls(
+            intra_op_threads=int(os.environ.get("VAD_INTRA_OP_THREADS", "1")),
+            inter_op_threads=int(os.environ.get("VAD_INTER_OP_THREADS", "1")),
+            process_cap=int(os.environ.get("VAD_PROCESS_THREAD_CAP", "0")),
+            cpu_affinity=parse_cpu_list(os.environ.get("VAD_CPU_AFFINITY", "")),
+        )
+
+    def allocate(self):
+        """
+        Réserve les threads intra-opérateur d'une nouvelle session
+
+        Returns:
+            int: Threads accordés (au moins 1, même si le plafond est atteint)
+        """
+        with _lock:
+            threads = self.intra_op_threads
+            if self.process_cap:
+                threads = max(1, min(threads, self.process_cap - self.allocated))
+                if threads < self.intra_op_threads:
+                    logger.warning(
+                        f"Plafond de threads VAD atteint ({self.allocated}/{self.process_cap}): "
+                        f"session limitée à {threads} thread(s)"
+                    )
+            self.allocated += threads
+            self.sessions += 1
+        return threads
+
+    def release(self, threads):
+        """Rend les threads d'une session libérée"""
+        with _lock:
+            self.allocated -= threads
+            self.sessions -= 1
+
+    def apply_affinity(self):
+        """Restreint le processus courant aux cœurs configurés (Linux uniquement)"""
+        if not self.cpu_affinity:
+            return
+        if not hasattr(os, "sched_setaffinity"):
+            logger.warning("VAD_CPU_AFFINITY ignoré: affinité CPU non supportée sur ce système")
+            return
+        try:
+            os.sched_setaffinity(0, self.cpu_affinity)
+            logger.info(f"Processus restreint aux cœurs {sorted(self.cpu_affinity)}")
+        except OSError as e:
+            logger.warning(f"Impossible d'appliquer l'affinité CPU {sorted(self.cpu_affinity)}: {e}")
+
+    def stats(self):
+        return {
+            "intra_op_threads": self.intra_op_threads,
+            "process_cap": self.process_cap,
+            "sessions": self.sessions,
+            "allocated_threads": self.allocated,
+            "cpu_affinity": sorted(self.cpu_affinity) if self.cpu_affinity else None,
+        }
+
+
+def thread_budget():
+    """Budget de threads VAD unique du processus"""
+    global _thread_budget
+    with _lock:
+        if _thread_budget is None:
+            _thread_budget = ThreadBudget.from_env()
+    return _thread_budget
+
+
+def session_options(intra_op_threads=1, inter_op_threads=1):
+    """Options onnxruntime réduisant la mémoire privée et les threads de chaque session"""
+    opts = onnxruntime.SessionOptions()
+    opts.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    opts.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    opts.inter_op_num_threads = inter_op_threads
+    opts.intra_op_num_threads = intra_op_threads
+    opts.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    # L'arena CPU réserve des blocs par processus bien au-delà des besoins d'un modèle de 2 Mo
+    opts.enable_cpu_mem_arena = False
+    return opts
+
+
+def new_session():
+    """
+    Crée une session onnxruntime du modèle Silero dans le budget de threads du processus
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    budget = thread_budget()
+    threads = budget.allocate()
+    try:
+        session = onnxruntime.InferenceSession(
+            model_bytes(),
+            sess_options=session_options(threads, budget.inter_op_threads),
+            providers=["CPUExecutionProvider"],
+        )
+    except Exception:
+        budget.release(threads)
+        raise
+    # Les threads sont rendus au budget quand la session (et donc le VAD qui la porte) est libérée
+    weakref.finalize(session, budget.release, threads)
+    return session
+
+
+def shared_session():
+    """
+    Session onnxruntime unique du processus, partagée par tous les VAD et flux
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    global _shared_session
+    with _lock:
+        session = _shared_session
+    if session is None:
+        session = new_session()
+        with _lock:
+            if _shared_session is None:
+                _shared_session = session
+            session = _shared_session
+    return session
+
+
+def _vad_options(settings):
+    # Seuls les champs connus de la version installée du plugin sont renseignés
+    values = {"max_buffered_speech": 60.0, **settings}
+    fields = {field.name for field in dataclasses.fields(silero.vad._VADOptions)}
+    return silero.vad._VADOptions(**{name: value for name, value in values.items() if name in fields})
+
+
+def inference_stats():
+    """
+    Temps d'inférence VAD par fenêtre de 32 ms dans ce processus, avec le budget de threads
+
+    Returns:
+        dict: Percentiles en microsecondes et budget de threads appliqué
+    """
+    return {"inference_us": _inference_timings.percentiles(), "threads": thread_budget().stats()}
+
+
+def resident_memory_mb():
+    """Mémoire résidente du processus courant en Mo"""
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class _BatchRequest:
+    __slots__ = ("inputs", "submitted_at", "done", "probability", "error")
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.submitted_at = time.perf_counter()
+        self.done = threading.Event()
+        self.probability = None
+        self.error = None
+
+
+class VadBatchScheduler:
+    """
+    Regroupe les fenêtres audio de tous les appels du processus en une inférence par tick
+
+    Chaque flux VAD soumet sa fenêtre depuis son propre thread et attend le
+    résultat; le thread du planificateur attend au plus `max_wait_ms` après la
+    première fenêtre en attente (ou que le lot soit plein), empile les entrées,
+    lance une seule inférence ONNX puis redistribue à chaque appel sa
+    probabilité de parole.
+
+    Comme onnx_model.OnnxModel du plugin (qui repasse toujours son état
+    initial au modèle), l'état récurrent est nul à chaque fenêtre: seul le
+    contexte audio est propagé. Les probabilités sont ainsi celles du VAD
+    standard, sans état à transporter par flux.
+    """
+
+    def __init__(self, session, sample_rate=16000, max_batch=32, max_wait_ms=4.0):
+        """
+        Initialisation du planificateur
+
+        Args:
+            session: Session onnxruntime du modèle Silero
+            sample_rate: Fréquence d'échantillonnage commune aux flux
+            max_batch: Nombre maximal de fenêtres par inférence
+            max_wait_ms: Attente maximale ajoutée à la latence d'une fenêtre
+        """
+        self.session = session
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._sample_rate = np.array(sample_rate, dtype=np.int64)
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._counters = collections.Counter()
+        self._thread = threading.Thread(target=self._run, name="vad-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, session, sample_rate=16000):
+        """Construit le planificateur à partir des variables VAD_BATCH_*"""
+        return cls(
+            session,
+            sample_rate=sample_rate,
+            max_batch=int(os.environ.get("VAD_BATCH_MAX", "32")),
+            max_wait_ms=float(os.environ.get("VAD_BATCH_MAX_WAIT_MS", "4")),
+        )
+
+    def submit(self, inputs):
+        """
+        Soumet une fenêtre et attend son résultat (appelé depuis le thread d'un flux VAD)
+
+        Args:
+            inputs: Contexte + fenêtre audio, forme (1, context + window)
+
+        Returns:
+            float: Probabilité de parole
+        """
+        request = _BatchRequest(inputs)
+        with self._cond:
+            self._pending.append(request)
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.probability
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0].submitted_at + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._infer(batch)
+
+    def _infer(self, batch):
+        start = time.perf_counter()
+        try:
+            inputs = np.concatenate([request.inputs for request in batch], axis=0)
+            out, _ = self.session.run(
+                None, {"input": inputs, "state": np.zeros((2, len(batch), 128), dtype=np.float32), "sr": self._sample_rate}
+            )
+            for idx, request in enumerate(batch):
+                request.probability = float(out[idx].item())
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+        self._counters["batches"] += 1
+        self._counters["windows"] += len(batch)
+        self._counters["inference_us"] += int((time.perf_counter() - start) * 1_000_000)
+
+    def stats(self):
+        """Taille moyenne des lots et temps d'inférence par fenêtre"""
+        batches = self._counters["batches"]
+        windows = self._counters["windows"]
+        return {
+            "batches": batches,
+            "windows": windows,
+            "avg_batch_size": round(windows / batches, 2) if batches else 0.0,
+            "inference_us_per_window": round(self._counters["inference_us"] / windows, 1) if windows else 0.0,
+        }
+
+
+class BatchedOnnxModel:
+    """
+    Remplaçant de onnx_model.OnnxModel pour un flux VAD, qui passe par le planificateur
+
+    Conserve par flux le contexte audio; l'état récurrent n'est pas propagé,
+    comme dans le modèle du plugin (voir VadBatchScheduler).
+    """
+
+    def __init__(self, scheduler, sample_rate=16000):
+        self._scheduler = scheduler
+        self._sample_rate = sample_rate
+        self._context = np.zeros((1, CONTEXT_SIZE_SAMPLES), dtype=np.float32)
+        self._input_buffer = np.zeros((1, CONTEXT_SIZE_SAMPLES + WINDOW_SIZE_SAMPLES), dtype=np.float32)
+
+    @property
+    def sample_rate(self):
+        return self._sample_rate
+
+    @property
+    def window_size_samples(self):
+        return WINDOW_SIZE_SAMPLES
+
+    @property
+    def context_size(self):
+        return CONTEXT_SIZE_SAMPLES
+
+    def __call__(self, x):
+        self._input_buffer[:, :CONTEXT_SIZE_SAMPLES] = self._context
+        self._input_buffer[:, CONTEXT_SIZE_SAMPLES:] = x
+        probability = self._scheduler.submit(self._input_buffer.copy())
+        self._context = self._input_buffer[:, -CONTEXT_SIZE_SAMPLES:].copy()
+        return probability
+
+
+class _TimedModel:
+    """Mesure la durée de chaque inférence du modèle d'un flux VAD"""
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def __call__(self, x):
+        start = time.perf_counter()
+        try:
+            return self._model(x)
+        finally:
+            _inference_timings.record((time.perf_counter() - start) * 1_000_000)
+
+
+class TimedVAD(silero.VAD):
+    """VAD Silero dont chaque flux mesure le temps d'inférence par fenêtre"""
+
+    def _stream_model(self, stream):
+        return stream._model
+
+    def stream(self):
+        stream = super().stream()
+        # Le modèle n'est utilisé qu'à la première trame: on peut le remplacer ici
+        stream._model = _TimedModel(self._stream_model(stream))
+        return stream
+
+
+class BatchedVAD(TimedVAD):
+    """VAD Silero dont les flux partagent le planificateur d'inférence par lots du processus"""
+
+    def __init__(self, *, session, opts, scheduler):
+        super().__init__(session=session, opts=opts)
+        self._scheduler = scheduler
+
+    def _stream_model(self, stream):
+        # Le temps mesuré inclut l'attente du lot, c'est la latence vue par l'appel
+        return BatchedOnnxModel(self._scheduler, sample_rate=self._opts.sample_rate)
+
+
+def batch_scheduler(sample_rate=16000):
+    """Planificateur d'inférence par lots unique du processus"""
+    global _batch_scheduler
+    session = shared_session()
+    with _lock:
+        if _batch_scheduler is None:
+            _batch_scheduler = VadBatchScheduler.from_env(session, sample_rate=sample_rate)
+    return _batch_scheduler
+
+
+def load_vad(settings=None):
+    """
+    Charge le VAD Silero de l'agent
+
+    En mode partagé (VAD_SHARED_MODEL=1) la session est unique dans le
+    processus et servie à tous ses appels (exécuteur "thread"); avec
+    VAD_BATCHING=1 les flux de tous les appels du processus sont en plus
+    inférés par lots. Sinon chaque VAD a sa propre session. Dans tous les cas
+    les sessions respectent le budget de threads du processus (ThreadBudget)
+    et l'affinité CPU éventuelle est appliquée au processus.
+
+    Args:
+        settings: Paramètres du VAD (par défaut ceux de l'environnement)
+
+    Returns:
+        silero.VAD
+    """
+    settings = settings or vad_settings_from_env()
+    thread_budget().apply_affinity()
+    rss_before = resident_memory_mb()
+
+    # Les fenêtres du planificateur sont celles du modèle à 16 kHz
+    if batching_enabled() and settings["sample_rate"] == 16000:
+        mode = "lots"
+        vad = BatchedVAD(
+            session=shared_session(),
+            opts=_vad_options(settings),
+            scheduler=batch_scheduler(settings["sample_rate"]),
+        )
+    elif shared_model_enabled():
+        mode = "partagé"
+        vad = TimedVAD(session=shared_session(), opts=_vad_options(settings))
+    else:
+        mode = "standard"
+        vad = TimedVAD(session=new_session(), opts=_vad_options(settings))
+
+    logger.info(
+        f"VAD chargé (mode {mode}): RSS {rss_before:.1f} -> {resident_memory_mb():.1f} Mo, "
+        f"threads {thread_budget().stats()}"
+    )
+    return vad
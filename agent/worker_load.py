@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerLoadMonitor:
+    """
+    Calcule la charge réelle du worker pour le dispatch LiveKit
+
+    La charge est le maximum de trois ratios: CPU consommé par le worker et
+    ses processus de jobs (rapporté au nombre de cœurs), retard de la boucle
+    d'événements du worker, et nombre d'appels actifs rapporté au maximum
+    configuré. Au-delà du seuil, le worker se déclare plein et refuse les jobs.
+
+    La mesure n'est faite que par `get_load`, appelée périodiquement par
+    LiveKit depuis un thread de l'exécuteur; `should_accept` lit le dernier
+    relevé sans rééchantillonner.
+    """
+
+    def __init__(self, load_threshold=0.75, max_jobs=0, max_loop_lag_ms=200):
+        """
+        Initialisation du moniteur de charge
+
+        Args:
+            load_threshold: Charge (0-1) à partir de laquelle les nouveaux appels sont refusés
+            max_jobs: Nombre maximal d'appels simultanés (0 = pas de limite)
+            max_loop_lag_ms: Retard de boucle d'événements correspondant à une charge de 1
+        """
+        self.load_threshold = load_threshold
+        self.max_jobs = max_jobs
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.snapshot = {}
+        # get_load (thread de l'exécuteur) et should_accept (boucle du worker) partagent l'état
+        self._lock = threading.Lock()
+        self._accepted_since_snapshot = 0
+        self._process = psutil.Process()
+        self._tracked = {}
+        self._cpu_count = psutil.cpu_count() or 1
+        self._loop = None
+        self._loop_lag_ms = 0.0
+        self._active_jobs = 0
+
+    @classmethod
+    def from_env(cls):
+        """Construit le moniteur à partir des variables WORKER_*"""
+        return cls(
+            load_threshold=float(os.environ.get("WORKER_LOAD_THRESHOLD", "0.75")),
+            max_jobs=int(os.environ.get("WORKER_MAX_JOBS", "0")),
+            max_loop_lag_ms=float(os.environ.get("WORKER_MAX_LOOP_LAG_MS", "200")),
+        )
+
+    def get_load(self, worker=None):
+        """
+        Fonction de charge passée à WorkerOptions(load_fnc=...)
+
+        Args:
+            worker: Worker LiveKit (fournit le nombre de jobs actifs)
+
+        Returns:
+            float: Charge entre 0 et 1
+        """
+        self._probe_loop(worker)
+        with self._lock:
+            if worker is not None:
+                self._active_jobs = len(getattr(worker, "active_jobs", []))
+
+            cpu = self._process_tree_cpu()
+            lag = self._loop_lag_ms / self.max_loop_lag_ms if self.max_loop_lag_ms else 0.0
+            jobs = self._active_jobs / self.max_jobs if self.max_jobs else 0.0
+            load = min(1.0, max(cpu, lag, jobs))
+
+            self.snapshot = {
+                "load": round(load, 3),
+                "cpu": round(cpu, 3),
+                "loop_lag_ms": round(self._loop_lag_ms, 1),
+                "active_jobs": self._active_jobs,
+            }
+            # Les appels acceptés depuis sont désormais comptés dans active_jobs
+            self._accepted_since_snapshot = 0
+        return load
+
+    def should_accept(self):
+        """
+        Indique si un nouvel appel peut être accepté par ce worker
+
+        Décision prise sur le dernier relevé de `get_load`: pendant une rafale de
+        requêtes, les appels déjà acceptés depuis ce relevé comptent comme actifs.
+
+        Returns:
+            tuple: (bool, raison du refus ou None)
+        """
+        with self._lock:
+            load = self.snapshot.get("load", 0.0)
+            active = self._active_jobs + self._accepted_since_snapshot
+            if self.max_jobs and active >= self.max_jobs:
+                return False, f"{active} appels actifs ou acceptés (maximum {self.max_jobs})"
+            if load >= self.load_threshold:
+                return False, f"charge {load:.2f} >= seuil {self.load_threshold:.2f} ({self.snapshot})"
+            self._accepted_since_snapshot += 1
+        return True, None
+
+    def _process_tree_cpu(self):
+        # Appelé sous self._lock. cpu_percent() mesure depuis l'appel précédent:
+        # les objets Process sont conservés
+        processes = [self._process]
+        try:
+            processes += self._process.children(recursive=True)
+        except psutil.Error:
+            pass
+
+        alive = {}
+        total = 0.0
+        for proc in processes:
+            tracked = self._tracked.get(proc.pid, proc)
+            try:
+                total += tracked.cpu_percent(interval=None)
+                alive[proc.pid] = tracked
+            except psutil.Error:
+                continue
+        self._tracked = alive
+        return total / (100.0 * self._cpu_count)
+
+    def _probe_loop(self, worker):
+        # Mesure le délai d'exécution d'un callback posté sur la boucle du worker
+        if self._loop is None:
+            try:
+                self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._loop = getattr(worker, "_loop", None)
+            if self._loop is None:
+                return
+
+        sent_at = time.perf_counter()
+
+        def on_probe():
+            lag_ms = (time.perf_counter() - sent_at) * 1000
+            # Pic avec décroissance: un retard ponctuel reste visible quelques secondes
+            self._loop_lag_ms = max(lag_ms, self._loop_lag_ms * 0.8)
+
+        try:
+            self._loop.call_soon_threadsafe(on_probe)
+        except RuntimeError:
+            self._loop = None
@@ -5,18 +5,15 @@ import sys
 import logging
 from dotenv import load_dotenv
 
+# Configuration du logging partagée avec l'agent
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+from log_config import setup_logging
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('api.log')
-    ]
-)
+# Configuration du logging (file d'attente et thread d'écriture, voir agent/log_config.py)
+setup_logging('api.log')
 logger = logging.getLogger(__name__)
 
 # Initialisation de l'application Flask
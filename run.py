@@ -6,20 +6,15 @@ import signal
 import logging
 from dotenv import load_dotenv
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('run.log')
-    ]
-)
-logger = logging.getLogger(__name__)
+from agent.log_config import setup_logging
 
 # Charger les variables d'environnement
 load_dotenv()
 
+# Configuration du logging (file d'attente et thread d'écriture, voir agent/log_config.py)
+setup_logging('run.log')
+logger = logging.getLogger(__name__)
+
 # Variables globales pour les processus
 agent_process = None
 api_process = None
@@ -0,0 +1,93 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+from livekit.agents.llm import FunctionContext
+from livekit.plugins.openai._oai_api import build_oai_function_description
+
+from call_actions import CallActions
+from room_simulator import FakeLiveKitAPI, FakeParticipant
+
+# Les journaux par appel fausseraient la mesure
+logging.basicConfig(level=logging.WARNING)
+
+SIP_ATTRIBUTES = {"sip.from": "+33612345678", "sip.to": "+33187654321"}
+
+
+class UncachedCallActions(CallActions):
+    """Construction d'origine: FunctionContext réinspecte les fonctions à chaque appel"""
+
+    def __init__(self, api, participant, room, store=None):
+        FunctionContext.__init__(self)
+        self.api = api
+        self.room = room
+        self.store = store
+        self.participant = None
+        self.caller_number = "Inconnu"
+        self.called_number = "Inconnu"
+        if participant is not None:
+            self.bind_participant(participant)
+
+
+def _percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[int((len(ordered) - 1) * ratio)] if ordered else 0.0
+
+
+def measure(cls, calls, api, room, participant):
+    """
+    Returns:
+        dict: Durées (µs) de construction d'un CallActions par appel
+    """
+    durations = []
+    cpu_start = time.process_time()
+    for _ in range(calls):
+        start = time.perf_counter()
+        cls(api=api, participant=participant, room=room)
+        durations.append((time.perf_counter() - start) * 1_000_000)
+    cpu = time.process_time() - cpu_start
+    return {
+        "p50_us": round(_percentile(durations, 0.50), 1),
+        "p99_us": round(_percentile(durations, 0.99), 1),
+        "cpu_us": round(cpu / calls * 1_000_000, 1),
+    }
+
+
+def tool_schemas(actions):
+    """Descriptions JSON envoyées au LLM (format OpenAI)"""
+    return [build_oai_function_description(info) for info in actions.ai_functions.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesure le coût de construction des actions d\'appel (chemin de décroché)')
+    parser.add_argument('--calls', '-n', type=int, default=20000, help='Nombre de constructions mesurées (défaut: 20000)')
+    args = parser.parse_args()
+
+    api = FakeLiveKitAPI()
+    room = api.create_room("bench")
+    participant = FakeParticipant("sip_caller", SIP_ATTRIBUTES)
+
+    start = time.perf_counter()
+    CallActions.prepare_functions()
+    print(f"Descriptions des fonctions construites en {(time.perf_counter() - start) * 1000:.2f} ms (une fois par processus)")
+
+    # Les deux constructions doivent exposer exactement les mêmes outils au LLM
+    cached = CallActions(api=api, participant=participant, room=room)
+    uncached = UncachedCallActions(api=api, participant=participant, room=room)
+    if tool_schemas(cached) != tool_schemas(uncached):
+        raise SystemExit("Les descriptions des fonctions diffèrent de celles de FunctionContext")
+    if any(info.callable.__self__ is not cached for info in cached.ai_functions.values()):
+        raise SystemExit("Une fonction n'est pas rattachée à son instance")
+
+    for label, cls in (("FunctionContext (d'origine)", UncachedCallActions), ("descriptions en cache", CallActions)):
+        result = measure(cls, args.calls, api, room, participant)
+        print(f"{label}: p50 {result['p50_us']} µs, p99 {result['p99_us']} µs, CPU {result['cpu_us']} µs par appel")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+import psutil
+from dotenv import load_dotenv
+from livekit import api, rtc
+from livekit.agents.llm import ChatContext
+from livekit.agents.pipeline import VoicePipelineAgent
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+from call_metrics import CallLatencyRecorder, LatencyHistogram, ProcessLatencyStats
+from fake_plugins import FakeProviderConfig
+from pipeline_warmup import PipelineWarmer
+from vad_model import load_vad
+
+# Chargement des variables d'environnement
+load_dotenv()
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+# Niveau (RMS) au-delà duquel une trame reçue de l'agent est considérée comme de la voix
+AGENT_AUDIO_THRESHOLD = 0.01
+
+
+def synthetic_speech(duration, sample_rate=SAMPLE_RATE):
+    """
+    Signal voisé synthétique (harmoniques d'une fondamentale modulée en syllabes)
+
+    Returns:
+        np.ndarray: Échantillons int16
+    """
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    f0 = 120 + 15 * np.sin(2 * math.pi * 0.7 * t)
+    phase = 2 * math.pi * np.cumsum(f0) / sample_rate
+    # Harmoniques pondérées grossièrement comme les formants d'une voyelle ouverte
+    signal = sum(weight * np.sin(k * phase) for k, weight in ((1, 1.0), (2, 0.6), (3, 0.5), (6, 0.35), (9, 0.2)))
+    envelope = 0.55 + 0.45 * np.sin(2 * math.pi * 4 * t)
+    signal = signal / np.max(np.abs(signal)) * envelope
+    return (signal * 12000).astype(np.int16)
+
+
+def load_utterance(path, duration):
+    """Charge un fichier WAV mono 16 bits ou génère un énoncé synthétique"""
+    if not path:
+        return synthetic_speech(duration)
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: WAV mono 16 bits à {SAMPLE_RATE} Hz attendu")
+        return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+
+def _token(identity, room_name):
+    return (
+        api.AccessToken(os.environ.get("LIVEKIT_API_KEY", "devkey"), os.environ.get("LIVEKIT_API_SECRET", "secret"))
+        .with_identity(identity)
+        .with_grants(api.VideoGrants(room_join=True, room=room_name))
+        .to_jwt()
+    )
+
+
+def _rms(frame):
+    samples = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32) / 32768.0
+    return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+
+
+class SimulatedCall:
+    """Un appel simulé: un participant appelant et un VoicePipelineAgent avec les faux fournisseurs"""
+
+    def __init__(self, index, url, warmer, vad, utterance, turns, process_stats, latencies):
+        self.index = index
+        self.url = url
+        self.warmer = warmer
+        self.vad = vad
+        self.utterance = utterance
+        self.turns = turns
+        self.process_stats = process_stats
+        self.latencies = latencies
+        self.room_name = f"bench-{os.getpid()}-{index}"
+        self.caller_room = rtc.Room()
+        self.agent_room = rtc.Room()
+        self.agent = None
+        self.errors = 0
+        self._agent_audio = asyncio.Event()
+        self._listen_tasks = []
+
+    async def run(self):
+        await self.agent_room.connect(self.url, _token(f"agent-{self.index}", self.room_name))
+        await self.caller_room.connect(self.url, _token(f"caller-{self.index}", self.room_name))
+        self.caller_room.on("track_subscribed", self._on_track_subscribed)
+
+        # Côté appelant: piste micro alimentée par les énoncés
+        source = rtc.AudioSource(SAMPLE_RATE, 1)
+        track = rtc.LocalAudioTrack.create_audio_track("caller-mic", source)
+        await self.caller_room.local_participant.publish_track(
+            track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+        )
+
+        # Côté agent: même construction que l'entrypoint, fournisseurs simulés
+        self.agent = VoicePipelineAgent(
+            vad=self.vad,
+            stt=self.warmer.stt(),
+            llm=self.warmer.llm(),
+            tts=self.warmer.tts(),
+            chat_ctx=ChatContext().append(role="system", text="Vous êtes un assistant téléphonique."),
+            allow_interruptions=True,
+        )
+        CallLatencyRecorder(self.room_name, f"caller-{self.index}", self.process_stats).attach(self.agent)
+        self.agent.start(self.agent_room, f"caller-{self.index}")
+
+        for _ in range(self.turns):
+            await self._speak(source)
+            spoke_at = time.perf_counter()
+            self._agent_audio.clear()
+            try:
+                await asyncio.wait_for(self._agent_audio.wait(), timeout=10)
+                self.latencies.record((time.perf_counter() - spoke_at) * 1000)
+            except asyncio.TimeoutError:
+                self.errors += 1
+            # Laisse l'agent terminer sa réponse avant le tour suivant
+            await self._wait_agent_silence()
+
+    async def _speak(self, source):
+        frame_samples = SAMPLE_RATE * FRAME_MS // 1000
+        silence = np.zeros(frame_samples, dtype=np.int16)
+        padded = np.concatenate([self.utterance, np.zeros(SAMPLE_RATE // 2, dtype=np.int16)])
+        for start in range(0, len(padded), frame_samples):
+            chunk = padded[start:start + frame_samples]
+            if len(chunk) < frame_samples:
+                chunk = np.concatenate([chunk, silence[: frame_samples - len(chunk)]])
+            await source.capture_frame(rtc.AudioFrame(
+                data=chunk.tobytes(),
+                sample_rate=SAMPLE_RATE,
+                num_channels=1,
+                samples_per_channel=frame_samples,
+            ))
+
+    async def _wait_agent_silence(self, quiet=0.8):
+        while True:
+            self._agent_audio.clear()
+            try:
+                await asyncio.wait_for(self._agent_audio.wait(), timeout=quiet)
+            except asyncio.TimeoutError:
+                return
+
+    def _on_track_subscribed(self, track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            self._listen_tasks.append(asyncio.create_task(self._listen(track)))
+
+    async def _listen(self, track):
+        async for event in rtc.AudioStream(track):
+            if _rms(event.frame) >= AGENT_AUDIO_THRESHOLD:
+                self._agent_audio.set()
+
+    async def aclose(self):
+        for task in self._listen_tasks:
+            task.cancel()
+        await asyncio.gather(*self._listen_tasks, return_exceptions=True)
+        await self.caller_room.disconnect()
+        await self.agent_room.disconnect()
+
+
+async def run_benchmark(args):
+    url = os.environ.get("LIVEKIT_URL", "ws://localhost:7880")
+    config = FakeProviderConfig.from_env()
+    warmer = PipelineWarmer(warmup_requests=False, fake_config=config)
+    vad = load_vad()
+    utterance = load_utterance(args.audio, args.utterance_s)
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    process_stats = ProcessLatencyStats()
+    latencies = LatencyHistogram()
+    calls = [
+        SimulatedCall(i, url, warmer, vad, utterance, args.turns, process_stats, latencies)
+        for i in range(args.calls)
+    ]
+
+    print(f"{args.calls} appels simultanés, {args.turns} tours chacun, serveur {url}")
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    async def run_call(call, delay):
+        await asyncio.sleep(delay)
+        try:
+            await call.run()
+        except Exception as e:
+            call.errors += 1
+            print(f"Appel {call.index} en échec: {e}")
+
+    # Mesure mémoire pendant que tous les appels sont actifs
+    peak_rss = rss_before
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, process.memory_info().rss)
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample_memory())
+    await asyncio.gather(*(run_call(call, i * args.ramp_s) for i, call in enumerate(calls)))
+    sampler.cancel()
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    for call in calls:
+        await call.aclose()
+
+    mb = 1024 * 1024
+    report = {
+        "calls": args.calls,
+        "turns": latencies.count,
+        "errors": sum(call.errors for call in calls),
+        "response_ms": latencies.percentiles(),
+        "pipeline_ms": process_stats.snapshot(),
+        "memory_per_call_mb": round((peak_rss - rss_before) / mb / args.calls, 1),
+        "cpu_percent_per_call": round(cpu / wall / args.calls * 100, 1),
+        "wall_s": round(wall, 1),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark du pipeline vocal avec les faux fournisseurs (FAKE_*) sur un serveur LiveKit local'
+    )
+    parser.add_argument('--calls', '-c', type=int, default=4, help='Nombre d\'appels simultanés (défaut: 4)')
+    parser.add_argument('--turns', '-t', type=int, default=4, help='Tours de parole par appel (défaut: 4)')
+    parser.add_argument('--ramp-s', type=float, default=0.5, help='Délai entre deux débuts d\'appel (défaut: 0.5)')
+    parser.add_argument('--audio', help='Énoncé de l\'appelant (WAV mono 16 kHz), sinon signal synthétique')
+    parser.add_argument('--utterance-s', type=float, default=2.0, help='Durée de l\'énoncé synthétique (défaut: 2)')
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+import vad_model
+from livekit.plugins.silero import onnx_model
+
+# Durée d'une fenêtre d'inférence à 16 kHz
+WINDOW_DURATION = vad_model.WINDOW_SIZE_SAMPLES / 16000
+
+
+def _percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[int((len(ordered) - 1) * ratio)] if ordered else 0.0
+
+
+def parity(calls, windows):
+    """
+    Compare les probabilités du VAD par lots à celles du modèle du plugin
+
+    Chaque appel envoie la même séquence audio (bruit puis sinusoïde) aux deux
+    modèles; les flux par lots sont soumis en parallèle pour former de vrais lots.
+
+    Returns:
+        float: Écart maximal observé entre les probabilités
+    """
+    session = vad_model.shared_session()
+    scheduler = vad_model.VadBatchScheduler(session, max_batch=calls, max_wait_ms=4.0)
+    rng = np.random.default_rng(0)
+    t = np.arange(vad_model.WINDOW_SIZE_SAMPLES) / 16000
+    frames = [
+        (rng.standard_normal(vad_model.WINDOW_SIZE_SAMPLES) * 0.1 + (0.5 * np.sin(2 * np.pi * 220 * t) if i % 20 >= 10 else 0))
+        .astype(np.float32)
+        for i in range(windows)
+    ]
+    reference = onnx_model.OnnxModel(onnx_session=session, sample_rate=16000)
+    expected = [reference(frame) for frame in frames]
+
+    deviations = []
+    lock = threading.Lock()
+
+    def call():
+        model = vad_model.BatchedOnnxModel(scheduler)
+        deviation = max(abs(model(frame) - prob) for frame, prob in zip(frames, expected))
+        with lock:
+            deviations.append(deviation)
+
+    threads = [threading.Thread(target=call) for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return max(deviations)
+
+
+def run(calls, duration, batched, max_wait_ms):
+    """
+    Simule `calls` appels qui produisent chacun une fenêtre audio toutes les 32 ms
+
+    Args:
+        calls: Nombre d'appels simultanés dans le processus
+        duration: Durée audio simulée par appel, en secondes
+        batched: Passe par VadBatchScheduler au lieu d'une inférence par appel
+        max_wait_ms: Attente maximale du planificateur
+
+    Returns:
+        dict: Appels par cœur et latence d'inférence par fenêtre
+    """
+    session = vad_model.shared_session()
+    scheduler = vad_model.VadBatchScheduler(session, max_batch=calls, max_wait_ms=max_wait_ms) if batched else None
+    latencies = []
+    lock = threading.Lock()
+    windows = int(duration / WINDOW_DURATION)
+
+    def call():
+        if scheduler is not None:
+            model = vad_model.BatchedOnnxModel(scheduler)
+        else:
+            model = onnx_model.OnnxModel(onnx_session=session, sample_rate=16000)
+        rng = np.random.default_rng()
+        local = []
+        next_tick = time.perf_counter()
+        for _ in range(windows):
+            frame = rng.standard_normal(vad_model.WINDOW_SIZE_SAMPLES).astype(np.float32) * 0.1
+            start = time.perf_counter()
+            model(frame)
+            local.append((time.perf_counter() - start) * 1000)
+            # Cadence temps réel, comme l'audio d'un appel
+            next_tick += WINDOW_DURATION
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=call) for _ in range(calls)]
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu_start
+
+    return {
+        "calls_per_core": (calls * windows * WINDOW_DURATION) / cpu if cpu else float("inf"),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p99_ms": _percentile(latencies, 0.99),
+        "scheduler": scheduler.stats() if scheduler else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare l'inférence VAD par appel et par lots")
+    parser.add_argument('--calls', '-c', type=int, default=16, help='Appels simultanés dans le processus (défaut: 16)')
+    parser.add_argument('--duration', '-d', type=float, default=10.0, help='Secondes d\'audio par appel (défaut: 10)')
+    parser.add_argument('--max-wait-ms', type=float, default=4.0, help='Attente maximale du planificateur (défaut: 4)')
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='Écart de probabilité toléré avec le plugin')
+    args = parser.parse_args()
+
+    # Les lots doivent rendre les mêmes probabilités que le modèle du plugin
+    deviation = parity(args.calls, 100)
+    print(f"Écart maximal avec onnx_model.OnnxModel: {deviation:.2e} (toléré {args.tolerance:.0e})\n")
+
+    print(f"{args.calls} appels simultanés, {args.duration:.0f} s d'audio chacun\n")
+    print(f"{'Mode':<10} {'Appels/cœur':>12} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    results = {}
+    for label, batched in (("par appel", False), ("par lots", True)):
+        result = results[label] = run(args.calls, args.duration, batched, args.max_wait_ms)
+        print(f"{label:<10} {result['calls_per_core']:>12.1f} {result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f}")
+        if result["scheduler"]:
+            print(f"           planificateur: {result['scheduler']}")
+
+    # Compromis: le débit par cœur se paie en latence par fenêtre (attente du lot)
+    single, batched = results["par appel"], results["par lots"]
+    print(
+        f"\nCompromis: appels/cœur x{batched['calls_per_core'] / single['calls_per_core']:.2f}, "
+        f"latence p50 {single['p50_ms']:.2f} -> {batched['p50_ms']:.2f} ms "
+        f"(+{batched['p50_ms'] - single['p50_ms']:.2f} ms par fenêtre de {WINDOW_DURATION * 1000:.0f} ms)"
+    )
+
+    if deviation > args.tolerance:
+        print("ÉCART: les probabilités par lots diffèrent de celles du plugin")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
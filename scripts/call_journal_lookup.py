@@ -0,0 +1,34 @@
+import argparse
+import json
+import os
+import sys
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+from call_journal import find_calls, read_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recherche et affiche des appels du journal (CALL_JOURNAL_DIR)')
+    parser.add_argument('--dir', '-d', default=os.environ.get('CALL_JOURNAL_DIR', 'journal'), help='Répertoire du journal')
+    parser.add_argument('--room', '-r', help='Nom de la room')
+    parser.add_argument('--caller', '-c', help='Numéro de l\'appelant (sip.from)')
+    parser.add_argument('--events', '-e', action='store_true', help='Affiche les événements de chaque appel')
+    args = parser.parse_args()
+
+    calls = find_calls(args.dir, room=args.room, caller=args.caller)
+    if not calls:
+        print("Aucun appel trouvé")
+        return
+
+    for entry in calls:
+        print(f"{entry['room']}  appelant {entry['caller']}  ({os.path.basename(entry['path'])}, position {entry['offset']})")
+        if args.events:
+            for event in read_call(entry):
+                fields = {key: value for key, value in event.items() if key not in ("room", "caller", "event", "ts")}
+                print(f"    {event['event']:<18} {json.dumps(fields, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
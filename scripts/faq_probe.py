@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import sys
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+from faq import FaqFastPath, FaqIndex
+
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent'))
+
+# Questions de contrôle pour agent/faq.json: entrée attendue, ou None si la question
+# doit passer au LLM (hors sujet, ou proche d'une entrée sans lui correspondre)
+DEFAULT_PROBES = [
+    ("Quels sont vos horaires ?", "horaires"),
+    ("Vous êtes ouverts jusqu'à quelle heure ?", "horaires"),
+    ("Vous fermez à quelle heure ?", "horaires"),
+    ("Vous êtes ouverts quand ?", "horaires"),
+    ("Quelle est votre adresse s'il vous plaît", "adresse"),
+    ("Où en est mon ticket ?", "statut_ticket"),
+    ("Je voudrais suivre ma demande de support", "statut_ticket"),
+    ("Quel est le statut de ma demande ?", "statut_ticket"),
+    ("Je voudrais créer un ticket pour un problème", None),
+    ("Je voudrais créer un ticket", None),
+    ("Quelle heure est-il", None),
+    ("Il est quelle heure ?", None),
+    ("J'ai un problème avec ma facture, vous êtes ouverts le samedi ?", None),
+    ("Je voudrais changer mon adresse email", None),
+    ("Quelle est l'adresse du site web ?", None),
+    ("Quel est le prix de l'abonnement ?", None),
+    ("Je veux parler à un conseiller", None),
+]
+
+
+def load_probes(path):
+    """
+    Questions de contrôle d'un fichier JSON
+
+    Format: [{"question": "...", "expected": "id" ou null}, ...]
+    """
+    with open(path, encoding="utf-8") as f:
+        return [(probe["question"], probe.get("expected")) for probe in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Vérifie les réponses directes de la FAQ sur des questions de contrôle (code de sortie 1 en cas d\'écart)'
+    )
+    parser.add_argument('--faq', default=os.path.join(AGENT_DIR, 'faq.json'), help='Fichier FAQ (défaut: agent/faq.json)')
+    parser.add_argument('--probes', help='Questions de contrôle JSON (défaut: questions intégrées pour agent/faq.json)')
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('FAQ_THRESHOLD', '0.6')), help='Score cosinus minimal')
+    parser.add_argument('--min-coverage', type=float, default=float(os.environ.get('FAQ_MIN_COVERAGE', '0.8')),
+                        help='Part minimale des termes de la question présents dans l\'entrée')
+    args = parser.parse_args()
+
+    index = FaqIndex.load(args.faq)
+    fast_path = FaqFastPath(index, threshold=args.threshold, min_coverage=args.min_coverage)
+    probes = load_probes(args.probes) if args.probes else DEFAULT_PROBES
+
+    failures = 0
+    for question, expected in probes:
+        entry, score, coverage = index.search(question)
+        answered = fast_path.match(question) is not None
+        actual = entry.get("id") if answered else None
+        ok = actual == expected
+        failures += not ok
+        print(
+            f"{'ok ' if ok else 'ÉCART'} {question!r}: {actual or 'LLM'} (attendu: {expected or 'LLM'}, "
+            f"score {score:.2f}, couverture {coverage:.2f})"
+        )
+
+    print(f"\n{len(probes) - failures}/{len(probes)} questions conformes "
+          f"(seuil {args.threshold}, couverture minimale {args.min_coverage})")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
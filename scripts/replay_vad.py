@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+import vad_model
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+FRAME_MS = 10
+
+# Tolérance (s) autour des segments de référence pour rattacher un événement VAD
+MATCH_TOLERANCE = 0.3
+
+
+def read_audio(path):
+    """
+    Lit un fichier WAV (16 bits) ou FLAC et le réduit en mono
+
+    Returns:
+        tuple: (échantillons int16 mono, fréquence d'échantillonnage)
+    """
+    if path.lower().endswith(".flac"):
+        try:
+            import soundfile
+        except ImportError:
+            raise RuntimeError("La lecture des fichiers FLAC nécessite le paquet soundfile (pip install soundfile)")
+        samples, sample_rate = soundfile.read(path, dtype="int16", always_2d=True)
+    else:
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise RuntimeError(f"{path}: seuls les WAV 16 bits sont pris en charge")
+            sample_rate = wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+            samples = samples.reshape(-1, wav.getnchannels())
+    mono = samples.mean(axis=1).astype(np.int16) if samples.shape[1] > 1 else samples[:, 0]
+    return np.ascontiguousarray(mono), sample_rate
+
+
+def read_reference(path):
+    """
+    Segments de parole de référence d'un fichier (fichier <nom>.json voisin)
+
+    Format: {"speech": [[début, fin], ...]} en secondes
+
+    Returns:
+        list ou None si aucune référence n'existe
+    """
+    reference = os.path.splitext(path)[0] + ".json"
+    if not os.path.exists(reference):
+        return None
+    with open(reference, encoding="utf-8") as f:
+        return [tuple(segment) for segment in json.load(f)["speech"]]
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, name) for name in sorted(names) if name.lower().endswith(AUDIO_EXTENSIONS)]
+        elif path.lower().endswith(AUDIO_EXTENSIONS):
+            files.append(path)
+    return files
+
+
+async def _detect(vad, samples, sample_rate):
+    """Pousse tout le fichier dans un flux VAD (plus vite que le temps réel) et relève les événements"""
+    from livekit import rtc
+    from livekit.agents import vad as agents_vad
+
+    stream = vad.stream()
+    frame_samples = sample_rate * FRAME_MS // 1000
+    for start in range(0, len(samples) - frame_samples + 1, frame_samples):
+        chunk = samples[start:start + frame_samples]
+        stream.push_frame(rtc.AudioFrame(chunk.tobytes(), sample_rate, 1, frame_samples))
+    stream.end_input()
+
+    starts, ends = [], []
+    async for event in stream:
+        if event.type == agents_vad.VADEventType.START_OF_SPEECH:
+            # L'événement est émis après min_speech_duration de parole
+            starts.append(event.timestamp)
+        elif event.type == agents_vad.VADEventType.END_OF_SPEECH:
+            ends.append(event.timestamp)
+    await stream.aclose()
+    return starts, ends
+
+
+def evaluate(starts, ends, reference, min_endpointing_delay):
+    """
+    Compare les événements VAD aux segments de référence
+
+    Returns:
+        dict: Latences de fin de parole, fausses interruptions, fins prématurées, segments manqués
+    """
+    result = {"detected_segments": len(ends)}
+    if reference is None:
+        return result
+
+    eos_latencies = []
+    false_starts = 0
+    premature = 0
+    missed = 0
+    for start in starts:
+        # Début de parole hors de tout segment de référence: l'agent aurait été interrompu à tort
+        if not any(begin - MATCH_TOLERANCE <= start <= end + MATCH_TOLERANCE for begin, end in reference):
+            false_starts += 1
+    for index, (begin, end) in enumerate(reference):
+        # Une fin de parole appartient au segment jusqu'au début du suivant
+        limit = reference[index + 1][0] if index + 1 < len(reference) else float("inf")
+        matched = [eos for eos in ends if begin < eos <= min(end + MATCH_TOLERANCE + 2.0, limit)]
+        inside = [eos for eos in matched if eos < end]
+        after = [eos for eos in matched if eos >= end]
+        # Fin détectée avant la fin réelle: le tour aurait été validé au milieu de la phrase
+        premature += len(inside)
+        if after:
+            eos_latencies.append((after[0] - end) * 1000)
+        elif not inside:
+            missed += 1
+
+    result.update({
+        "reference_segments": len(reference),
+        "eos_latency_ms": eos_latencies,
+        "turn_latency_ms": [latency + min_endpointing_delay * 1000 for latency in eos_latencies],
+        "false_starts": false_starts,
+        "premature_eos": premature,
+        "missed_segments": missed,
+    })
+    return result
+
+
+def _replay_file(task):
+    path, settings_index, settings, min_endpointing_delay = task
+    # La session ONNX est partagée par toutes les tâches du processus
+    os.environ["VAD_SHARED_MODEL"] = "1"
+    os.environ["VAD_BATCHING"] = "0"
+    samples, sample_rate = read_audio(path)
+    vad = vad_model.load_vad(settings)
+
+    cpu_start = time.process_time()
+    starts, ends = asyncio.run(_detect(vad, samples, sample_rate))
+    cpu = time.process_time() - cpu_start
+
+    result = evaluate(starts, ends, read_reference(path), min_endpointing_delay)
+    result.update({
+        "file": path,
+        "settings_index": settings_index,
+        "audio_s": len(samples) / sample_rate,
+        "cpu_s": cpu,
+    })
+    return result
+
+
+def settings_grid(overrides):
+    """
+    Produit cartésien des valeurs passées par --set nom=v1,v2
+
+    Returns:
+        list: Réglages VAD (dict) avec le délai min_endpointing_delay
+    """
+    base = {**vad_model.vad_settings_from_env(), **vad_model.endpointing_settings_from_env()}
+    names = [name for name, _ in overrides]
+    grid = []
+    for values in itertools.product(*(values for _, values in overrides)):
+        settings = dict(base)
+        settings.update(zip(names, values))
+        grid.append(settings)
+    return grid or [base]
+
+
+def _percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[int((len(ordered) - 1) * ratio)] if ordered else float("nan")
+
+
+def summarize(grid, results):
+    rows = []
+    for index, settings in enumerate(grid):
+        items = [r for r in results if r["settings_index"] == index]
+        eos = [v for r in items for v in r.get("eos_latency_ms", [])]
+        turn = [v for r in items for v in r.get("turn_latency_ms", [])]
+        audio = sum(r["audio_s"] for r in items)
+        rows.append({
+            "settings": settings,
+            "files": len(items),
+            "audio_s": round(audio, 1),
+            "reference_segments": sum(r.get("reference_segments", 0) for r in items),
+            "detected_segments": sum(r["detected_segments"] for r in items),
+            "eos_p50_ms": round(_percentile(eos, 0.50), 1),
+            "eos_p95_ms": round(_percentile(eos, 0.95), 1),
+            "turn_p50_ms": round(_percentile(turn, 0.50), 1),
+            "false_starts": sum(r.get("false_starts", 0) for r in items),
+            "premature_eos": sum(r.get("premature_eos", 0) for r in items),
+            "missed_segments": sum(r.get("missed_segments", 0) for r in items),
+            "cpu_ms_per_audio_s": round(sum(r["cpu_s"] for r in items) / audio * 1000, 2) if audio else 0.0,
+        })
+    return rows
+
+
+def _parse_override(spec):
+    name, _, values = spec.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"Format attendu: nom=v1,v2 ({spec!r})")
+    return name.strip(), [float(value) for value in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Rejoue des enregistrements dans le VAD Silero de l\'agent et mesure la détection de fin de parole'
+    )
+    parser.add_argument('paths', nargs='+', help='Fichiers WAV/FLAC ou répertoires (références: <nom>.json)')
+    parser.add_argument('--set', dest='overrides', action='append', type=_parse_override, default=[],
+                        help='Valeurs à comparer, ex: --set min_silence_duration=0.3,0.55 (répétable)')
+    parser.add_argument('--processes', '-j', type=int, default=os.cpu_count(), help='Processus parallèles (défaut: nombre de cœurs)')
+    parser.add_argument('--json', help='Écrit le résumé JSON dans ce fichier')
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("Aucun fichier audio trouvé")
+        return
+
+    grid = settings_grid(args.overrides)
+    tasks = []
+    for index, settings in enumerate(grid):
+        vad_settings = {key: value for key, value in settings.items() if not key.endswith("endpointing_delay")}
+        vad_settings["sample_rate"] = int(vad_settings["sample_rate"])
+        for path in files:
+            tasks.append((path, index, vad_settings, settings["min_endpointing_delay"]))
+
+    print(f"{len(files)} fichiers x {len(grid)} réglages, {args.processes} processus")
+    wall_start = time.perf_counter()
+    # Le modèle est lu avant la création des processus (fork), qui en héritent
+    vad_model.model_bytes()
+    with multiprocessing.get_context("fork").Pool(args.processes) as pool:
+        results = pool.map(_replay_file, tasks, chunksize=max(1, len(tasks) // (args.processes * 4)))
+    wall = time.perf_counter() - wall_start
+
+    rows = summarize(grid, results)
+    audio_total = sum(r["audio_s"] for r in results)
+    print(f"{audio_total:.0f} s d'audio traitées en {wall:.1f} s ({audio_total / wall:.0f}x le temps réel)\n")
+    varying = [name for name, _ in args.overrides]
+    for row in rows:
+        label = ", ".join(f"{name}={row['settings'][name]}" for name in varying) or "réglages de l'environnement"
+        print(label)
+        print(
+            f"  fin de parole p50/p95: {row['eos_p50_ms']}/{row['eos_p95_ms']} ms, fin de tour p50: {row['turn_p50_ms']} ms"
+        )
+        print(
+            f"  segments détectés/référence: {row['detected_segments']}/{row['reference_segments']}, "
+            f"fausses interruptions: {row['false_starts']}, fins prématurées: {row['premature_eos']}, "
+            f"manqués: {row['missed_segments']}, CPU: {row['cpu_ms_per_audio_s']} ms par seconde d'audio"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+from call_actions import CallActions
+from inbound_handler import InboundCallHandler
+from room_simulator import FakeLiveKitAPI, FakeParticipant
+
+# Les journaux par appel fausseraient la mesure: seuls les avertissements sont affichés
+logging.basicConfig(level=logging.WARNING)
+
+SIP_ATTRIBUTES = {
+    "sip.from": "+33612345678",
+    "sip.to": "+33187654321",
+    "sip.callStatus": "active",
+}
+
+# Scénarios: étapes côté appelant (join, attributes, caller_hangup) et côté agent
+# (wait_sip, tool, wait_disconnect), exécutées dans l'ordre
+SCENARIOS = {
+    "appel_complet": [
+        ("join", SIP_ATTRIBUTES),
+        ("wait_sip",),
+        ("tool", "collect_customer_info", {"name": "Jean Dupont", "issue": "Colis non reçu"}),
+        ("tool", "create_support_ticket", {"issue": "Colis non reçu", "priority": 2}),
+        ("caller_hangup",),
+        ("wait_disconnect",),
+    ],
+    "raccrochage_agent": [
+        ("join", SIP_ATTRIBUTES),
+        ("wait_sip",),
+        ("tool", "end_call", {}),
+        ("wait_disconnect",),
+    ],
+    "attributs_tardifs": [
+        ("join", {}),
+        ("attributes", SIP_ATTRIBUTES),
+        ("wait_sip",),
+        ("caller_hangup",),
+        ("wait_disconnect",),
+    ],
+}
+
+
+async def run_call(livekit_api, index, steps):
+    """
+    Déroule le cycle de vie d'un appel simulé comme le fait l'entrypoint
+
+    Returns:
+        bool: True si le scénario est allé à son terme
+    """
+    loop = asyncio.get_running_loop()
+    room = livekit_api.create_room(f"sim-{index}")
+    identity = f"sip_caller_{index}"
+    handler = InboundCallHandler(livekit_api, room)
+    participant = None
+    actions = None
+
+    try:
+        for step in steps:
+            kind = step[0]
+            # Les actions de l'appelant arrivent comme des événements, pendant que l'agent attend
+            if kind == "join":
+                loop.call_soon(room.join, FakeParticipant(identity, step[1]))
+            elif kind == "attributes":
+                loop.call_soon(room.update_attributes, identity, step[1])
+            elif kind == "caller_hangup":
+                loop.call_soon(room.leave, identity)
+            elif kind == "wait_sip":
+                participant = await handler.wait_for_sip_participant(timeout=5)
+                if participant is None:
+                    return False
+                actions = CallActions(api=livekit_api, participant=participant, room=room)
+            elif kind == "tool":
+                await getattr(actions, step[1])(**step[2])
+            elif kind == "wait_disconnect":
+                await handler.wait_for_disconnect(participant)
+        return True
+    finally:
+        await room.disconnect()
+        await handler.aclose()
+        livekit_api.delete_room(room.name)
+
+
+async def simulate(scenario, calls, concurrency, trace_memory=False):
+    livekit_api = FakeLiveKitAPI()
+    steps = SCENARIOS[scenario]
+    semaphore = asyncio.Semaphore(concurrency)
+    completed = 0
+
+    async def bounded(index):
+        nonlocal completed
+        async with semaphore:
+            if await run_call(livekit_api, index, steps):
+                completed += 1
+
+    # tracemalloc ralentit fortement la simulation: la mesure mémoire est optionnelle
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    await asyncio.gather(*(bounded(i) for i in range(calls)))
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    # Un dernier passage par la boucle libère le futur de gather (et les tâches des appels)
+    await asyncio.sleep(0)
+    gc.collect()
+    memory_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    leftover_tasks = len(asyncio.all_tasks()) - 1
+    await livekit_api.aclose()
+
+    print(f"Scénario {scenario}: {completed}/{calls} appels menés à terme (concurrence {concurrency})")
+    print(f"  Débit:               {calls / wall:,.0f} cycles de vie/s")
+    print(f"  CPU par appel:       {cpu / calls * 1_000_000:,.0f} µs")
+    if trace_memory:
+        print(f"  Mémoire résiduelle:  {(memory_after - memory_before) / 1024:,.1f} Ko ({(memory_after - memory_before) / calls:,.0f} o/appel)")
+    print(f"  Tâches restantes:    {leftover_tasks}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simule des cycles de vie d\'appels entrants sans service LiveKit')
+    parser.add_argument('--scenario', '-s', choices=sorted(SCENARIOS), default='appel_complet', help='Scénario joué par chaque appel')
+    parser.add_argument('--calls', '-n', type=int, default=5000, help='Nombre d\'appels simulés (défaut: 5000)')
+    parser.add_argument('--concurrency', '-c', type=int, default=200, help='Appels simultanés (défaut: 200)')
+    parser.add_argument('--memory', action='store_true', help='Mesure la mémoire résiduelle par appel (tracemalloc, plus lent)')
+    args = parser.parse_args()
+
+    asyncio.run(simulate(args.scenario, args.calls, args.concurrency, trace_memory=args.memory))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,11 @@ import asyncio
 import os
 import logging
 import argparse
+import secrets
+import time
+import numpy as np
 from dotenv import load_dotenv
-from livekit import api
+from livekit import api, rtc
 from livekit.protocol.sip import CreateSIPParticipantRequest
 
 # Configuration du logging
@@ -39,7 +42,6 @@ async def simulate_inbound_call(phone_number=None):
         logger.info(f"Numéro d'appel simulé: {phone_number}")
         
         # Créer une room pour la simulation
-        import secrets
         room_name = f"test-inbound-{secrets.token_hex(4)}"
         
         logger.info(f"Room pour le test: {room_name}")
@@ -92,12 +94,165 @@ async def simulate_inbound_call(phone_number=None):
     finally:
         await livekit_api.aclose()
 
+# Niveau (RMS) au-delà duquel une trame reçue de l'agent est considérée comme de la voix
+AGENT_AUDIO_THRESHOLD = 0.01
+
+def _percentile(values, ratio):
+    ordered = sorted(values)
+    return ordered[int((len(ordered) - 1) * ratio)] if ordered else None
+
+async def _load_call(livekit_api, index, hold, phone_number, timings):
+    """
+    Un appel de la charge: participant porteur des attributs SIP, dispatch de
+    l'agent, puis mesure des temps de connexion, de première réponse et de fin
+    
+    Args:
+        livekit_api: Client API LiveKit
+        index: Numéro de l'appel
+        hold: Durée de l'appel une fois l'agent connecté (secondes)
+        phone_number: Numéro de l'appelant simulé
+        timings: Dictionnaire des mesures à compléter
+    """
+    room_name = f"load-inbound-{secrets.token_hex(4)}"
+    identity = f"sim_caller_{index}"
+    result = {"room": room_name}
+    timings.append(result)
+    
+    # Le participant porte les attributs qu'aurait posés le trunk SIP
+    token = (
+        api.AccessToken()
+        .with_identity(identity)
+        .with_attributes({
+            "sip.from": phone_number,
+            "sip.to": os.environ.get("TWILIO_PHONE_NUMBER", "+15105551234"),
+            "sip.callStatus": "active",
+        })
+        .with_grants(api.VideoGrants(room_join=True, room=room_name))
+        .to_jwt()
+    )
+    
+    room = rtc.Room()
+    agent_joined = asyncio.Event()
+    agent_audio = asyncio.Event()
+    listen_tasks = []
+    
+    async def listen(track):
+        async for event in rtc.AudioStream(track):
+            samples = np.frombuffer(event.frame.data, dtype=np.int16).astype(np.float32) / 32768.0
+            if samples.size and float(np.sqrt(np.mean(samples * samples))) >= AGENT_AUDIO_THRESHOLD:
+                agent_audio.set()
+                return
+    
+    def on_participant_connected(participant):
+        if participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_AGENT:
+            agent_joined.set()
+    
+    def on_track_subscribed(track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            listen_tasks.append(asyncio.create_task(listen(track)))
+    
+    room.on("participant_connected", on_participant_connected)
+    room.on("track_subscribed", on_track_subscribed)
+    
+    try:
+        start = time.perf_counter()
+        await room.connect(os.environ.get("LIVEKIT_URL", "ws://localhost:7880"), token)
+        await livekit_api.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(agent_name="inbound-agent", room=room_name)
+        )
+        
+        # Micro silencieux, comme une ligne téléphonique ouverte
+        source = rtc.AudioSource(16000, 1)
+        track = rtc.LocalAudioTrack.create_audio_track("caller-mic", source)
+        await room.local_participant.publish_track(
+            track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+        )
+        
+        async def feed_silence():
+            frame = rtc.AudioFrame.create(16000, 1, 320)
+            while True:
+                await source.capture_frame(frame)
+        
+        feeder = asyncio.create_task(feed_silence())
+        try:
+            await asyncio.wait_for(agent_joined.wait(), timeout=30)
+            result["agent_join_ms"] = (time.perf_counter() - start) * 1000
+            await asyncio.wait_for(agent_audio.wait(), timeout=30)
+            result["first_audio_ms"] = (time.perf_counter() - start) * 1000
+            await asyncio.sleep(hold)
+        finally:
+            feeder.cancel()
+        
+        # Fin d'appel: temps jusqu'au départ de l'agent de la room
+        hangup = time.perf_counter()
+        await room.disconnect()
+        deadline = hangup + 30
+        while time.perf_counter() < deadline:
+            participants = await livekit_api.room.list_participants(api.ListParticipantsRequest(room=room_name))
+            if not participants.participants:
+                result["teardown_ms"] = (time.perf_counter() - hangup) * 1000
+                break
+            await asyncio.sleep(0.2)
+    except asyncio.TimeoutError:
+        result["error"] = "délai dépassé"
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        for task in listen_tasks:
+            task.cancel()
+        await room.disconnect()
+
+async def run_load(calls, ramp, hold, phone_number):
+    """
+    Lance N appels simulés contre un serveur LiveKit local et affiche les percentiles
+    
+    Args:
+        calls: Nombre d'appels
+        ramp: Durée de montée en charge (les appels démarrent régulièrement sur cette durée)
+        hold: Durée de chaque appel une fois l'agent connecté
+        phone_number: Numéro de l'appelant simulé
+    """
+    livekit_api = api.LiveKitAPI()
+    timings = []
+    
+    logger.info(f"====== TEST DE CHARGE: {calls} appels, montée {ramp}s, maintien {hold}s ======")
+    
+    async def delayed(index):
+        await asyncio.sleep(ramp * index / max(1, calls))
+        await _load_call(livekit_api, index, hold, phone_number, timings)
+    
+    try:
+        await asyncio.gather(*(delayed(i) for i in range(calls)))
+    finally:
+        await livekit_api.aclose()
+    
+    errors = [t for t in timings if "error" in t]
+    print(f"\n{'Mesure':<22} {'n':>4} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'max (ms)':>10}")
+    for key, label in (("agent_join_ms", "Connexion de l'agent"), ("first_audio_ms", "Premier audio"), ("teardown_ms", "Fin d'appel")):
+        values = [t[key] for t in timings if key in t]
+        if not values:
+            print(f"{label:<22} {0:>4}")
+            continue
+        print(
+            f"{label:<22} {len(values):>4} {_percentile(values, 0.50):>10.0f} {_percentile(values, 0.95):>10.0f} "
+            f"{_percentile(values, 0.99):>10.0f} {max(values):>10.0f}"
+        )
+    print(f"\nAppels en échec: {len(errors)}/{calls}")
+    for t in errors:
+        print(f"  {t['room']}: {t['error']}")
+
 def main():
     parser = argparse.ArgumentParser(description='Simuler un appel entrant via SIP')
     parser.add_argument('--phone', '-p', help='Numéro de téléphone simulant l\'appel')
+    parser.add_argument('--load', '-n', type=int, help='Mode charge: nombre d\'appels simulés (serveur LiveKit local, sans trunk SIP)')
+    parser.add_argument('--ramp', type=float, default=10.0, help='Mode charge: durée de montée en charge en secondes (défaut: 10)')
+    parser.add_argument('--hold', type=float, default=20.0, help='Mode charge: durée de chaque appel en secondes (défaut: 20)')
     args = parser.parse_args()
     
-    asyncio.run(simulate_inbound_call(args.phone))
+    if args.load:
+        asyncio.run(run_load(args.load, args.ramp, args.hold, args.phone or "+15105550000"))
+    else:
+        asyncio.run(simulate_inbound_call(args.phone))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+from livekit.agents.llm import ChatContext
+from livekit.agents.pipeline.pipeline_agent import _DeferredReplyValidation
+
+from turn_detector import LexicalTurnDetector
+
+# Transcription finale de l'appelant et palier attendu du détecteur
+DEFAULT_CASES = [
+    ("Je voudrais connaître le statut de mon ticket.", "early"),
+    ("Je pense que oui", "normal"),
+    ("Je voudrais parler de mon problème avec", "long"),
+]
+
+
+class _AgentStub:
+    """Partie du VoicePipelineAgent lue par _DeferredReplyValidation"""
+
+    def __init__(self, text):
+        self._chat_ctx = ChatContext().append(role="assistant", text="Bonjour, comment puis-je vous aider ?")
+        self._transcribed_text = text
+
+
+def expected_delay(tier, detector, settings, text):
+    """
+    Délai total attendu entre la fin de parole et la validation du tour
+
+    Reprend le calcul de _DeferredReplyValidation: délai minimal (réduit si la
+    transcription finit par une ponctuation), remplacé par le délai maximal si le
+    détecteur juge la phrase inachevée, moins le temps passé dans le détecteur.
+    """
+    delay = settings["min_endpointing_delay"]
+    if text and text[-1] in _DeferredReplyValidation.PUNCTUATION:
+        delay *= _DeferredReplyValidation.PUNCTUATION_REDUCE_FACTOR
+    if tier == "long":
+        return settings["max_endpointing_delay"]
+    if tier == "normal":
+        # Le temps d'attente du détecteur est retranché du délai de l'agent
+        return max(delay, detector.normal_delay)
+    return delay
+
+
+async def measure(detector, settings, text):
+    """Délai (s) mesuré par la validation différée de LiveKit entre la fin de parole et la validation du tour"""
+    validated = asyncio.Event()
+    validator = _DeferredReplyValidation(
+        validate_fnc=validated.set,
+        min_endpointing_delay=settings["min_endpointing_delay"],
+        max_endpointing_delay=settings["max_endpointing_delay"],
+        turn_detector=detector,
+        agent=_AgentStub(text),
+    )
+    validator.on_human_start_of_speech(None)
+    validator.on_human_final_transcript(text, "fr")
+    start = time.perf_counter()
+    validator.on_human_end_of_speech(None)
+    await validated.wait()
+    elapsed = time.perf_counter() - start
+    await validator.aclose()
+    return elapsed
+
+
+async def run(args):
+    detector = LexicalTurnDetector(normal_delay=args.normal_delay, early_delay=args.early_delay)
+    settings = detector.endpointing_settings(
+        {"min_endpointing_delay": args.normal_delay, "max_endpointing_delay": args.max_delay}, language="fr"
+    )
+
+    failures = 0
+    for text, tier in DEFAULT_CASES:
+        before = detector.stats()
+        elapsed = await measure(detector, settings, text)
+        after = detector.stats()
+        actual_tier = next((t for t in ("early", "normal", "long") if after[t]["count"] > before[t]["count"]), None)
+        expected = expected_delay(tier, detector, settings, text)
+        ok = actual_tier == tier and abs(elapsed - expected) <= args.tolerance
+        failures += not ok
+        print(
+            f"{'ok ' if ok else 'ÉCART'} {text!r}: palier {actual_tier} (attendu {tier}), "
+            f"délai {elapsed * 1000:.0f} ms (attendu {expected * 1000:.0f} ms)"
+        )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Vérifie le délai total de fin de tour de chaque palier du détecteur, mesuré avec la validation '
+                    'différée de VoicePipelineAgent (code de sortie 1 en cas d\'écart)'
+    )
+    parser.add_argument('--normal-delay', type=float, default=0.5, help='MIN_ENDPOINTING_DELAY d\'origine (s)')
+    parser.add_argument('--early-delay', type=float, default=0.2, help='TURN_DETECTOR_EARLY_DELAY (s)')
+    parser.add_argument('--max-delay', type=float, default=1.5, help='MAX_ENDPOINTING_DELAY (s, réduit pour un test rapide)')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='Écart toléré (s)')
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    print(f"\n{len(DEFAULT_CASES) - failures}/{len(DEFAULT_CASES)} paliers conformes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+import psutil
+
+# Les modules de l'agent sont importés comme dans agent/main.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent')))
+
+import vad_model
+
+
+def _job_process(shared, calls, ready, done):
+    """Simule un processus de job: charge un VAD par appel puis attend la mesure"""
+    os.environ["VAD_SHARED_MODEL"] = "1" if shared else "0"
+    vads = [vad_model.load_vad() for _ in range(calls)]
+
+    async def hold_streams():
+        # Un flux force la création de l'état d'inférence comme pendant un appel
+        streams = [vad.stream() for vad in vads]
+        ready.set()
+        await asyncio.get_running_loop().run_in_executor(None, done.wait)
+        for stream in streams:
+            await stream.aclose()
+
+    asyncio.run(hold_streams())
+
+
+def measure(shared, processes, calls):
+    """
+    Lance N processus de jobs et mesure leur mémoire
+
+    Args:
+        shared: Utilise le mode VAD_SHARED_MODEL
+        processes: Nombre de processus simultanés
+        calls: Appels par processus (plusieurs en mode AGENT_JOB_EXECUTOR=thread)
+
+    Returns:
+        dict: Moyennes RSS/USS/PSS en Mo par processus
+    """
+    # Comme LiveKit: processus de jobs démarrés par "spawn", sans rien hériter du parent
+    ctx = multiprocessing.get_context("spawn")
+
+    done = ctx.Event()
+    workers = []
+    for _ in range(processes):
+        ready = ctx.Event()
+        proc = ctx.Process(target=_job_process, args=(shared, calls, ready, done))
+        proc.start()
+        workers.append((proc, ready))
+
+    for _, ready in workers:
+        ready.wait(timeout=60)
+    time.sleep(0.5)
+
+    samples = []
+    for proc, _ in workers:
+        info = psutil.Process(proc.pid).memory_full_info()
+        samples.append((info.rss, info.uss, getattr(info, "pss", 0)))
+
+    done.set()
+    for proc, _ in workers:
+        proc.join()
+
+    mb = 1024 * 1024
+    return {
+        "rss": sum(s[0] for s in samples) / len(samples) / mb,
+        "uss": sum(s[1] for s in samples) / len(samples) / mb,
+        "pss": sum(s[2] for s in samples) / len(samples) / mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mesure la mémoire par processus du VAD Silero (session par appel vs session partagée du processus)')
+    parser.add_argument('--processes', '-n', type=int, default=4, help='Nombre de processus de jobs simulés (défaut: 4)')
+    parser.add_argument('--calls', '-c', type=int, default=1,
+                        help='Appels par processus (défaut: 1, comme l\'exécuteur "process"; >1 pour le mode "thread")')
+    args = parser.parse_args()
+
+    print(f"Mesure de la mémoire pour {args.processes} processus de jobs, {args.calls} appel(s) chacun...")
+    results = {
+        "standard": measure(False, args.processes, args.calls),
+        "partagé": measure(True, args.processes, args.calls),
+    }
+
+    print(f"\n{'Mode':<10} {'RSS (Mo)':>10} {'USS (Mo)':>10} {'PSS (Mo)':>10}")
+    for mode, values in results.items():
+        print(f"{mode:<10} {values['rss']:>10.1f} {values['uss']:>10.1f} {values['pss']:>10.1f}")
+
+    saved = results["standard"]["uss"] - results["partagé"]["uss"]
+    print(f"\nMémoire privée économisée par processus: {saved:.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()